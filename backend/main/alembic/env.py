@@ -20,7 +20,7 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 
 from app.db.base import Base
-from app.core.config import settings
+from app.db.shard import get_shard_urls
 
 target_metadata = Base.metadata
 
@@ -30,8 +30,23 @@ target_metadata = Base.metadata
 # ... etc.
 
 
-def get_url():
-    return settings.db.DATABASE_CONNECTION_URL
+def get_urls():
+    # Every shard has the same schema; "-x shard=N" migrates a single one
+    urls = get_shard_urls()
+    shard = context.get_x_argument(as_dictionary=True).get("shard")
+    if shard is not None:
+        return [urls[int(shard)]]
+    return urls
+
+
+# Full-text search objects are managed by hand, see app/db/search.py
+SEARCH_OBJECTS = {"search_vector", "ix_task_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if name in SEARCH_OBJECTS or (name or "").startswith("task_fts"):
+        return False
+    return True
 
 
 def run_migrations_offline() -> None:
@@ -46,16 +61,17 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = get_url()
-    context.configure(
-        url=url,
-        target_metadata=target_metadata,
-        literal_binds=True,
-        dialect_opts={"paramstyle": "named"},
-    )
+    for url in get_urls():
+        context.configure(
+            url=url,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            literal_binds=True,
+            dialect_opts={"paramstyle": "named"},
+        )
 
-    with context.begin_transaction():
-        context.run_migrations()
+        with context.begin_transaction():
+            context.run_migrations()
 
 
 def run_migrations_online() -> None:
@@ -65,19 +81,24 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = get_url()
-    connectable = engine_from_config(
-        configuration,
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-
-        with context.begin_transaction():
-            context.run_migrations()
+    for url in get_urls():
+        configuration = config.get_section(config.config_ini_section)
+        configuration["sqlalchemy.url"] = url
+        connectable = engine_from_config(
+            configuration,
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
+        )
+
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                include_object=include_object,
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
 
 
 if context.is_offline_mode():
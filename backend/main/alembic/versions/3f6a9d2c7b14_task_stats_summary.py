@@ -0,0 +1,61 @@
+"""task stats summary
+
+Revision ID: 3f6a9d2c7b14
+Revises: 8c1f0e7d5a2b
+Create Date: 2026-10-18 21:12:40.207815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f6a9d2c7b14"
+down_revision = "8c1f0e7d5a2b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_stat",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("dimension", sa.String(length=16), nullable=False),
+        sa.Column("value", sa.String(length=64), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "dimension", "value", name="task_stat_unique"),
+    )
+    op.create_index(op.f("ix_task_stat_id"), "task_stat", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_task_stat_user_id"), "task_stat", ["user_id"], unique=False
+    )
+
+    # Backfill from existing tasks, same as app/db/rebuild_task_stats.py
+    op.execute(
+        """
+        INSERT INTO task_stat (user_id, dimension, value, count)
+        SELECT user_id, 'status', CAST(status AS VARCHAR(64)), COUNT(id)
+        FROM task GROUP BY user_id, status
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO task_stat (user_id, dimension, value, count)
+        SELECT tag.user_id, 'tag', CAST(task_tag.tag_id AS VARCHAR(64)),
+            COUNT(task_tag.id)
+        FROM task_tag JOIN tag ON tag.id = task_tag.tag_id
+        GROUP BY tag.user_id, task_tag.tag_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_task_stat_user_id"), table_name="task_stat")
+    op.drop_index(op.f("ix_task_stat_id"), table_name="task_stat")
+    op.drop_table("task_stat")
@@ -0,0 +1,37 @@
+"""user data version
+
+Revision ID: 5b2e8c41d9a7
+Revises: 3f6a9d2c7b14
+Create Date: 2026-10-18 22:03:18.552906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b2e8c41d9a7"
+down_revision = "3f6a9d2c7b14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_version",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.create_index(op.f("ix_user_version_id"), "user_version", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_user_version_id"), table_name="user_version")
+    op.drop_table("user_version")
@@ -0,0 +1,35 @@
+"""task full text search
+
+Revision ID: 8c1f0e7d5a2b
+Revises: 2dbdcc3b4578
+Create Date: 2026-10-18 20:05:12.418339
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.search import SEARCH_DDL
+
+
+# revision identifiers, used by Alembic.
+revision = "8c1f0e7d5a2b"
+down_revision = "2dbdcc3b4578"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for statement in SEARCH_DDL.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.drop_index("ix_task_search_vector", table_name="task")
+        op.drop_column("task", "search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER task_fts_au")
+        op.execute("DROP TRIGGER task_fts_ad")
+        op.execute("DROP TRIGGER task_fts_ai")
+        op.execute("DROP TABLE task_fts")
@@ -0,0 +1,53 @@
+"""change log
+
+Revision ID: 9d4c7a1e3f60
+Revises: 5b2e8c41d9a7
+Create Date: 2026-10-18 22:41:05.118243
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9d4c7a1e3f60"
+down_revision = "5b2e8c41d9a7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "change_log",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("entity", sa.String(length=16), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=16), nullable=False),
+        sa.Column("date_created", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_change_log_date_created"), "change_log", ["date_created"], unique=False
+    )
+    op.create_index(op.f("ix_change_log_id"), "change_log", ["id"], unique=False)
+    op.create_index(
+        "ix_change_log_user_id_id", "change_log", ["user_id", "id"], unique=False
+    )
+    op.add_column(
+        "user_version",
+        sa.Column("sync_floor", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("user_version") as batch_op:
+        batch_op.drop_column("sync_floor")
+    op.drop_index("ix_change_log_user_id_id", table_name="change_log")
+    op.drop_index(op.f("ix_change_log_id"), table_name="change_log")
+    op.drop_index(op.f("ix_change_log_date_created"), table_name="change_log")
+    op.drop_table("change_log")
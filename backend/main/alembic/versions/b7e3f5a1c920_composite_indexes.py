@@ -0,0 +1,77 @@
+"""composite indexes
+
+Revision ID: b7e3f5a1c920
+Revises: 9d4c7a1e3f60
+Create Date: 2026-10-18 23:37:52.204816
+
+Indexes are built and dropped CONCURRENTLY on PostgreSQL, so the tables
+stay writable. If a concurrent build fails it leaves an INVALID index
+behind; drop it and run the upgrade again.
+"""
+from contextlib import nullcontext
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b7e3f5a1c920"
+down_revision = "9d4c7a1e3f60"
+branch_labels = None
+depends_on = None
+
+# Composite indexes matching the listing filters and keyset order
+COMPOSITE_INDEXES = [
+    ("ix_task_user_id_date_created_id", "task", ["user_id", "date_created", "id"]),
+    (
+        "ix_task_user_id_status_date_created_id",
+        "task",
+        ["user_id", "status", "date_created", "id"],
+    ),
+    ("ix_task_user_id_id", "task", ["user_id", "id"]),
+    ("ix_task_tag_tag_id_task_id", "task_tag", ["tag_id", "task_id"]),
+]
+
+# Indexes on primary keys, or prefixes of a composite index or constraint
+REDUNDANT_INDEXES = [
+    ("ix_user_id", "user", ["id"]),
+    ("ix_tag_id", "tag", ["id"]),
+    ("ix_tag_name", "tag", ["name"]),
+    ("ix_task_id", "task", ["id"]),
+    ("ix_task_user_id", "task", ["user_id"]),
+    ("ix_task_status", "task", ["status"]),
+    ("ix_task_tag_id", "task_tag", ["id"]),
+    ("ix_task_tag_task_id", "task_tag", ["task_id"]),
+    ("ix_task_tag_tag_id", "task_tag", ["tag_id"]),
+    ("ix_task_stat_id", "task_stat", ["id"]),
+    ("ix_task_stat_user_id", "task_stat", ["user_id"]),
+    ("ix_user_version_id", "user_version", ["id"]),
+    ("ix_change_log_id", "change_log", ["id"]),
+]
+
+
+def concurrently():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    if op.get_bind().dialect.name == "postgresql":
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    with concurrently():
+        for name, table, columns in COMPOSITE_INDEXES:
+            op.create_index(
+                name, table, columns, unique=False, postgresql_concurrently=True
+            )
+        for name, table, columns in REDUNDANT_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with concurrently():
+        for name, table, columns in REDUNDANT_INDEXES:
+            op.create_index(
+                name, table, columns, unique=False, postgresql_concurrently=True
+            )
+        for name, table, columns in COMPOSITE_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
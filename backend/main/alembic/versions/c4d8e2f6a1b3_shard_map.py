@@ -0,0 +1,59 @@
+"""shard map
+
+Revision ID: c4d8e2f6a1b3
+Revises: b7e3f5a1c920
+Create Date: 2026-10-18 23:58:06.413270
+
+Every existing user is put on the first shard, under their current id.
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision = "c4d8e2f6a1b3"
+down_revision = "b7e3f5a1c920"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    user_shard = op.create_table(
+        "user_shard",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "email", sqlalchemy_utils.types.email.EmailType(length=255), nullable=False
+        ),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("target_shard", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+    op.create_table(
+        "id_block",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("next_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+
+    user = sa.table("user", sa.column("id"), sa.column("email"))
+    op.execute(
+        user_shard.insert().from_select(
+            ["id", "email", "shard"],
+            sa.select(user.c.id, user.c.email, sa.literal(0)),
+        )
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        # New users must not reuse the copied ids
+        op.execute(
+            "SELECT setval(pg_get_serial_sequence('user_shard', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM user_shard), 0) + 1, false)"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("id_block")
+    op.drop_table("user_shard")
@@ -0,0 +1,35 @@
+"""user session secret
+
+Revision ID: e5a9c3d71b06
+Revises: c4d8e2f6a1b3
+Create Date: 2026-10-18 14:12:37.504118
+
+Session keys used to derive from the password hash. Existing users get that
+hash as their session secret, so the keys of their live sessions stay the
+same; their next password change replaces it with a random one.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e5a9c3d71b06"
+down_revision = "c4d8e2f6a1b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user", sa.Column("session_secret", sa.String(length=256), nullable=True)
+    )
+    op.execute('UPDATE "user" SET session_secret = hashed_password')
+    with op.batch_alter_table("user") as batch_op:
+        batch_op.alter_column(
+            "session_secret", existing_type=sa.String(length=256), nullable=False
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("user") as batch_op:
+        batch_op.drop_column("session_secret")
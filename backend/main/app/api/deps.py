@@ -1,18 +1,44 @@
 """ Contains API dependency functions, such as Response Classes,
     DB Sessions, Injection Decorators, etc. """
 
-import json
+import hashlib
+import math
+from datetime import datetime
 from http import HTTPStatus
-from typing import Any, Generator
+from typing import Any, Generator, Iterable, Iterator, List, Optional
 
-from app.core.crypt import encrypt_data_aes, generate_determinstic_aes_key
-from app.db.base import User
-from app.db.session import SessionLocal
-from app.strings import GeneralStrings
-from flask import Response, request
+from app import crud
+from app.core import json_backend
+from app.core.compression import compress_data, negotiate_encoding
+from app.core.config import settings
+from app.core.crypt import encrypt_data_aes, encrypt_data_aes_bytes
+from app.core.serialization import (
+    JSON,
+    OCTET_STREAM,
+    Codec,
+    get_codec,
+    negotiate_mimetype,
+)
+from app.core.security import PasswordHasherBusy
+from app.core.session_key import get_session_aes_key
+from app.db.async_session import async_replica_engines, run_in_async_session
+from app.db.replica import reads_from_replica, record_write, replica_engines
+from app.db.shard import get_async_shard_engine, get_shard_engine, get_user_shard
+from app.db.session import (
+    SessionLocal,
+    begin_unit_of_work,
+    commit_unit_of_work,
+    route_reads,
+)
+from app.schemas.serializer import get_output_serializer
+from app.strings import AuthStrings, GeneralStrings
+from app.utils.constants import EXPORT_CHUNK_SIZE, LAST_WRITE_COOKIE
+from flask import Response, g, request, stream_with_context
 from flask_jwt_extended import get_jwt, get_jwt_identity
 from marshmallow import Schema
 from marshmallow.exceptions import ValidationError
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 from werkzeug.exceptions import BadRequest
 
 
@@ -20,7 +46,12 @@ class BaseResponse(dict):
     """Base API Response Class"""
 
     def __init__(
-        self, message: str, status: int, data: Any = None, error: bool = False
+        self,
+        message: str,
+        status: int,
+        data: Any = None,
+        error: bool = False,
+        **extra: Any,
     ):
         if data is None:
             data = {}
@@ -28,7 +59,7 @@ class BaseResponse(dict):
             data = data.__dict__
         self.status = status
         self.error = error
-        super().__init__(msg=message, data=data)
+        super().__init__(msg=message, data=data, **extra)
 
     def dict(self):
         """Returns the response as a dictionary
@@ -44,17 +75,44 @@ class BaseResponse(dict):
         Returns:
             str: The response as a JSON string
         """
-        return json.dumps(self)
+        return json_backend.dumps_str(self)
 
+    def encode(self, codec: Codec = JSON) -> bytes:
+        """Returns the response encoded with a codec
 
-def get_db() -> Generator:
+        Args:
+            codec (Codec, optional): The codec. Defaults to JSON.
+
+        Returns:
+            bytes: The encoded response
+        """
+        return codec.dumps(self)
+
+    def to_response(self, codec: Codec = JSON) -> Response:
+        """Returns the response as a Flask response encoded with a codec
+
+        Args:
+            codec (Codec, optional): The codec. Defaults to JSON.
+
+        Returns:
+            Response: The response object
+        """
+        return Response(self.encode(codec), status=self.status, mimetype=codec.mimetype)
+
+
+def get_db(user_id: Optional[int] = None) -> Generator:
     """Get a database session.
 
+    Args:
+        user_id (Optional[int], optional): Bind the session to this user's
+            shard. Defaults to None, the first shard.
+
     Yields:
         Generator: A database session.
     """
 
-    db_object = SessionLocal()
+    shard, _ = get_user_shard(user_id)
+    db_object = SessionLocal(bind=get_shard_engine(shard))
     db_object.current_user_id = None
     try:
         yield db_object
@@ -62,24 +120,303 @@ def get_db() -> Generator:
         db_object.close()
 
 
+def get_request_db(replica: bool = False, shard: Optional[int] = None) -> Session:
+    """Get the database session of the current request, opening it on first use.
+
+    The session is closed by close_request_db when the app context is torn
+    down, whichever way the request ends.
+
+    Args:
+        replica (bool, optional): Read from the next read replica, if any are
+            configured and the session is not open yet. Defaults to False.
+        shard (Optional[int], optional): The shard to open the session on.
+            Defaults to None, the shard of the JWT identity.
+
+    Returns:
+        Session: A database session.
+    """
+    if "db" not in g:
+        if shard is None:
+            shard, _ = get_user_shard(get_request_user_id())
+        g.db = SessionLocal(bind=get_shard_engine(shard))
+        g.db.current_user_id = None
+        if replica:
+            route_caught_up_reads(g.db, replica_engines.next(), get_request_user_id())
+    return g.db
+
+
+def route_caught_up_reads(
+    db: Session, replica: Optional[Engine], user_id: Optional[int]
+) -> None:
+    """Send the reads of a session to a replica that has the user's writes.
+
+    Every write of a user bumps their data version, so a replica holding the
+    primary's version has every row the user wrote, whichever worker served
+    the write; a lagging one leaves the session on the primary. This costs
+    one primary key lookup on each.
+
+    Args:
+        db (Session): The database session, not used yet.
+        replica (Optional[Engine]): The replica engine, None if there are no
+            replicas.
+        user_id (Optional[int]): The id of the user, None for anonymous
+            requests, which read from the replica.
+    """
+    if replica is None:
+        return
+    if user_id is None:
+        route_reads(db, replica)
+        return
+    version = crud.user_version.get_version(db, user_id=user_id)
+    # Give the primary connection back for the rest of the request
+    db.rollback()
+    route_reads(db, replica)
+    if crud.user_version.get_version(db, user_id=user_id) < version:
+        route_reads(db, None)
+
+
+def get_request_user_id() -> Optional[int]:
+    """Get the JWT identity of the current request
+
+    Returns:
+        Optional[int]: The id of the user, or None on unprotected routes.
+    """
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def close_request_db(exception: Optional[BaseException] = None) -> None:
+    """Roll back and close the database session of the current request.
+
+    Registered with app.teardown_appcontext, so it runs on every exit path,
+    including unhandled exceptions.
+
+    Args:
+        exception (Optional[BaseException], optional): The unhandled exception,
+            if any. Defaults to None.
+    """
+    db_object = g.pop("db", None)
+    if db_object is None:
+        return
+    try:
+        # Discard anything the view did not commit
+        db_object.rollback()
+    finally:
+        db_object.close()
+
+
+def get_etag(db: Session, user_id: int, salt: str) -> str:
+    """Get the weak ETag of a user's data as seen by the current session.
+
+    The tag changes with the user's data version, bumped on every task and
+    tag mutation, and with the session salt, since responses are encrypted
+    with a per-session key.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The id of the user.
+        salt (str): The salt, from the JWT claims.
+
+    Returns:
+        str: The unquoted ETag.
+    """
+    version = crud.user_version.get_version(db, user_id=user_id)
+    return "%d-%s" % (version, hashlib.md5(salt.encode("utf-8")).hexdigest()[:8])
+
+
+def session_expired() -> BaseResponse:
+    """Answer 401 to a session started before the password changed.
+
+    Its key was derived from the previous password hash, so it could not
+    decrypt anything the API sends now.
+
+    Returns:
+        BaseResponse: The response object.
+    """
+    return BaseResponse(
+        message=AuthStrings.session_expired(),
+        status=HTTPStatus.UNAUTHORIZED,
+        error=True,
+    )
+
+
+def shard_moving() -> Response:
+    """Answer 503 to writes of a user whose data moves to another shard.
+
+    Returned by request_inject instead of raised, since flask-restful routes
+    do not reach the app's error handlers. Reads keep being served from the
+    old shard until the move completes.
+
+    Returns:
+        Response: The response object.
+    """
+    base_response = BaseResponse(
+        message=GeneralStrings.data_moving(),
+        status=HTTPStatus.SERVICE_UNAVAILABLE,
+        error=True,
+    )
+    return Response(
+        base_response.json(),
+        status=base_response.status,
+        mimetype="application/json",
+        headers={"Retry-After": str(math.ceil(settings.db.DATABASE_SHARD_MAP_TTL))},
+    )
+
+
+def password_hasher_busy(exception: PasswordHasherBusy) -> Response:
+    """Answer 503 when the password hashing queue is full.
+
+    Views hashing or verifying passwords fail fast instead of queueing behind
+    a login storm. Returned by request_inject for flask-restful routes, which
+    do not reach the app's error handlers, and registered with
+    app.register_error_handler for the others.
+
+    Args:
+        exception (PasswordHasherBusy): The raised exception.
+
+    Returns:
+        Response: The response object.
+    """
+    base_response = BaseResponse(
+        message=GeneralStrings.service_busy(),
+        status=HTTPStatus.SERVICE_UNAVAILABLE,
+        error=True,
+    )
+    return Response(
+        base_response.json(),
+        status=base_response.status,
+        mimetype="application/json",
+        headers={"Retry-After": "1"},
+    )
+
+
+def stream_response(
+    items: Iterable[Any],
+    output_schema: Schema,
+    format: str = "ndjson",
+    key: Optional[bytes] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Response:
+    """Stream serialized items as NDJSON or as a JSON array.
+
+    Items are serialized and sent chunk_size at a time. When a key is given,
+    every chunk is encrypted on its own and sent as one base64 frame per
+    line; frame i authenticates the associated data str(i), and a final
+    empty frame authenticated with "end" marks a complete stream.
+
+    Args:
+        items (Iterable[Any]): The models or dictionaries to serialize.
+        output_schema (Schema): The output schema class.
+        format (str, optional): "ndjson" or "json". Defaults to "ndjson".
+        key (Optional[bytes], optional): The AES key. Defaults to None.
+        chunk_size (int, optional): Items per chunk. Defaults to EXPORT_CHUNK_SIZE.
+
+    Returns:
+        Response: The streaming response.
+    """
+    serializer = get_output_serializer(output_schema)
+
+    def join(batch: List[str], sent: int) -> str:
+        if format == "ndjson":
+            return "".join([document + "\n" for document in batch])
+        return ("," if sent else "") + ",".join(batch)
+
+    def chunks() -> Iterator[str]:
+        if format == "json":
+            yield "["
+        batch = []
+        sent = 0
+        for item in items:
+            batch.append(json_backend.dumps_str(serializer.one(item)))
+            if len(batch) == chunk_size:
+                yield join(batch, sent)
+                sent += len(batch)
+                batch = []
+        if batch:
+            yield join(batch, sent)
+        if format == "json":
+            yield "]"
+
+    def frames() -> Iterator[str]:
+        for index, chunk in enumerate(chunks()):
+            yield encrypt_data_aes(
+                key=key, data=chunk.encode("utf-8"), associated_data=b"%d" % index
+            ) + "\n"
+        yield encrypt_data_aes(key=key, data=b"", associated_data=b"end") + "\n"
+
+    if key is not None:
+        return Response(stream_with_context(frames()), mimetype="text/plain")
+    return Response(
+        stream_with_context(chunks()),
+        mimetype="application/x-ndjson" if format == "ndjson" else "application/json",
+    )
+
+
 def request_inject(
     input_schema: Schema,
     output_schema: Schema,
     encrypt_response: bool = True,
+    query_schema: Schema = None,
+    conditional: bool = False,
 ) -> Any:
     """Validate and deserialize request data.
 
     Args:
         schema (Any): A marshmallow schema.
         **kwargs (Any): Keyword arguments to pass to schema.load.
+        query_schema (Schema, optional): A marshmallow schema for the query
+            string. Its result is passed to the view as query_data.
+        conditional (bool, optional): Send ETag and Last-Modified headers
+            and answer a matching If-None-Match with 304 before the view
+            runs. Defaults to False.
 
     Returns:
         Any: A decorator.
     """
 
     def decorator(func: Any) -> Any:
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
-            db_object = next(get_db())
+        def handle(db_object: Session, *args: Any, **kwargs: Any) -> Any:
+            if settings.db.DATABASE_UNIT_OF_WORK:
+                # CRUD calls only flush, the response commits once below
+                begin_unit_of_work(db_object)
+            mimetype = negotiate_mimetype(request.accept_mimetypes)
+            codec = get_codec(mimetype)
+            if encrypt_response:
+                claims = get_jwt()
+                key = get_session_aes_key(
+                    db=db_object,
+                    user_id=get_jwt_identity(),
+                    salt=claims["salt"],
+                    password_version=claims.get("pwv"),
+                )
+                if key is None:
+                    return session_expired().to_response(codec)
+            etag = None
+            if conditional and request.method == "GET":
+                # Rows updated during this second are sent again next time
+                last_modified = datetime.utcnow().replace(microsecond=0)
+                etag = get_etag(
+                    db=db_object, user_id=get_jwt_identity(), salt=get_jwt()["salt"]
+                )
+                if request.if_none_match.contains_weak(etag):
+                    response = Response(status=HTTPStatus.NOT_MODIFIED)
+                    response.set_etag(etag, weak=True)
+                    return response
+
+            if query_schema is not None:
+                # Validate and deserialize query string
+                try:
+                    kwargs["query_data"] = query_schema().load(request.args.to_dict())
+                except ValidationError as err:
+                    base_response = BaseResponse(
+                        message=GeneralStrings.invalid_request_data(),
+                        status=HTTPStatus.BAD_REQUEST,
+                        data=err,
+                        error=True,
+                    )
+                    return base_response.to_response(codec)
 
             if input_schema is not None:
                 try:
@@ -90,11 +427,7 @@ def request_inject(
                         status=HTTPStatus.BAD_REQUEST,
                         error=True,
                     )
-                    return Response(
-                        response=base_response.json(),
-                        status=base_response.status,
-                        mimetype="application/json",
-                    )
+                    return base_response.to_response(codec)
                 # Validate and deserialize input
                 try:
                     data_schema = input_schema()
@@ -106,21 +439,13 @@ def request_inject(
                         data=err,
                         error=True,
                     )
-                    return Response(
-                        response=base_response.json(),
-                        status=base_response.status,
-                        mimetype="application/json",
-                    )
+                    return base_response.to_response(codec)
                 base_response = func(request_data=data, db=db_object, *args, **kwargs)
             else:
                 base_response = func(db=db_object, *args, **kwargs)
 
             if base_response.error:
-                return Response(
-                    base_response.json(),
-                    status=base_response.status,
-                    mimetype="application/json",
-                )
+                return base_response.to_response(codec)
 
             # Validate and serialize output
             try:
@@ -134,12 +459,7 @@ def request_inject(
 
                 # Serialize data
                 if mid_data:
-                    data_schema = output_schema(many=True)
-                    if not isinstance(mid_data[0], dict):
-                        mid_data = [item.dict() for item in mid_data]
-
-                    data = data_schema.load(mid_data)
-                    data = data_schema.dump(data)
+                    data = get_output_serializer(output_schema).many(mid_data)
 
                     # Convert back
                     if is_list:
@@ -147,34 +467,100 @@ def request_inject(
                     else:
                         base_response["data"] = data[0]
 
-                # Encrypt response
+                body = None
+                data_encoding = None
+                # Compress, then encrypt response
                 if encrypt_response:
-                    salt = get_jwt()["salt"]
-                    key = generate_determinstic_aes_key(
-                        password=db_object.query(User)
-                        .get(get_jwt_identity())
-                        .hashed_password,
-                        salt=salt,
+                    encoding = negotiate_encoding(
+                        accept=request.headers.get("Accept-Data-Encoding"),
+                        claim=claims.get("data_encoding"),
                     )
-                    data = json.dumps(base_response["data"]).encode("utf-8")
-                    base_response["data"] = encrypt_data_aes(data=data, key=key)
+                    if mimetype == OCTET_STREAM:
+                        # Whole envelope as raw nonce, tag and ciphertext
+                        data, data_encoding = compress_data(
+                            base_response.encode(), encoding
+                        )
+                        body = encrypt_data_aes_bytes(data=data, key=key)
+                    else:
+                        data, data_encoding = compress_data(
+                            codec.dumps(base_response["data"]), encoding
+                        )
+                        if codec.binary:
+                            data = encrypt_data_aes_bytes(data=data, key=key)
+                        else:
+                            data = encrypt_data_aes(data=data, key=key)
+                        base_response["data"] = data
+
+                # Everything is serialized, objects may expire now
+                commit_unit_of_work(db_object)
 
-                return Response(
-                    base_response.json(),
+                response = Response(
+                    body if body is not None else base_response.encode(codec),
                     status=base_response.status,
-                    mimetype="application/json",
+                    mimetype=OCTET_STREAM if body is not None else codec.mimetype,
                 )
+                response.vary.add("Accept")
+                if encrypt_response:
+                    response.vary.add("Accept-Data-Encoding")
+                if data_encoding is not None:
+                    response.headers["Data-Encoding"] = data_encoding
+                if etag is not None:
+                    response.set_etag(etag, weak=True)
+                    response.last_modified = last_modified
+                return response
             except ValidationError:
                 base_response = BaseResponse(
                     message=GeneralStrings.invalid_response_data(),
                     status=HTTPStatus.INTERNAL_SERVER_ERROR,
                     error=True,
                 )
-                return Response(
-                    base_response.json(),
-                    status=base_response.status,
-                    mimetype="application/json",
+                return base_response.to_response(codec)
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            user_id = get_request_user_id()
+            shard, moving = get_user_shard(user_id)
+            if request.method != "GET":
+                if moving:
+                    return shard_moving()
+                response = run(False, shard, *args, **kwargs)
+                # Keep the client's next reads, e.g. after a login, on the primary
+                record_write(response)
+                return response
+            # Replicas are replicas of the first shard, users of the other
+            # shards always read from their shard's primary
+            replica = shard == 0 and reads_from_replica(
+                request.cookies.get(LAST_WRITE_COOKIE)
+            )
+            return run(replica, shard, *args, **kwargs)
+
+        def run(replica: bool, shard: int, *args: Any, **kwargs: Any) -> Any:
+            try:
+                if settings.db.DATABASE_ASYNC:
+                    # Query through the worker's event loop and asyncio engine
+                    return run_in_async_session(
+                        lambda db_object: run_async(
+                            db_object, replica, *args, **kwargs
+                        ),
+                        bind=get_async_shard_engine(shard),
+                    )
+                return handle(
+                    get_request_db(replica=replica, shard=shard), *args, **kwargs
+                )
+            except PasswordHasherBusy as exception:
+                # Raised by signups and password changes
+                return password_hasher_busy(exception)
+
+        def run_async(
+            db_object: Session, replica: bool, *args: Any, **kwargs: Any
+        ) -> Any:
+            if replica:
+                replica_engine = async_replica_engines.next()
+                route_caught_up_reads(
+                    db_object,
+                    replica_engine.sync_engine if replica_engine else None,
+                    get_request_user_id(),
                 )
+            return handle(db_object, *args, **kwargs)
 
         return wrapper
 
@@ -6,6 +6,7 @@ from app import crud, schemas
 from app.api.deps import BaseResponse, get_db, request_inject
 from app.core.auth import authenticate
 from app.core.crypt import generate_aes_key
+from app.core.session_key import get_password_version
 from app.db.session import SessionLocal
 from app.strings import AuthStrings, GeneralStrings
 from flask import Blueprint, Response, request
@@ -45,13 +46,14 @@ def login_user(request_data: dict, db: Session) -> BaseResponse:
         )
 
     # Generate a unique AES key
-    key, salt = generate_aes_key(user.hashed_password)
+    key, salt = generate_aes_key(user.session_secret)
 
     # Generate access and refresh tokens
-    # Add salt to access token
-    access_token = create_access_token(
-        identity=user.id, additional_claims={"salt": salt}
-    )
+    # Add salt, password version and the preferred data encoding to access token
+    claims = {"salt": salt, "pwv": get_password_version(user.session_secret)}
+    if request_data.get("data_encoding"):
+        claims["data_encoding"] = request_data["data_encoding"]
+    access_token = create_access_token(identity=user.id, additional_claims=claims)
     refresh_token = create_refresh_token(identity=user.id)
 
     # Return
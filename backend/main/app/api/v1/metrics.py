@@ -0,0 +1,59 @@
+""" Metrics API """
+
+import hmac
+import os
+from http import HTTPStatus
+
+from app.api.deps import BaseResponse
+from app.core.config import settings
+from app.core.security import hash_stats
+from app.core.session_key import aes_key_cache
+from app.db.session import pool_status
+from app.strings import MetricsStrings
+from flask import Blueprint, Response, request
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+
+@metrics_blueprint.route("/metrics", methods=["GET"], endpoint="metrics")
+def get_metrics() -> Response:
+    """Get the metrics of the worker process serving the request.
+
+    Only served when METRICS_TOKEN is set, to requests sending it in the
+    Metrics-Token header, since the pid, pool and cache internals are not
+    for the API's users.
+
+    Returns:
+        Response: The response object.
+    """
+    if not settings.METRICS_TOKEN:
+        base_response = BaseResponse(
+            message=MetricsStrings.disabled(),
+            status=HTTPStatus.NOT_FOUND,
+            error=True,
+        )
+    elif not hmac.compare_digest(
+        request.headers.get("Metrics-Token", "").encode("utf-8"),
+        settings.METRICS_TOKEN.encode("utf-8"),
+    ):
+        base_response = BaseResponse(
+            message=MetricsStrings.invalid_token(),
+            status=HTTPStatus.UNAUTHORIZED,
+            error=True,
+        )
+    else:
+        base_response = BaseResponse(
+            message=MetricsStrings.get_success(),
+            status=HTTPStatus.OK,
+            data={
+                "pid": os.getpid(),
+                "db_pool": pool_status(),
+                "aes_key_cache": aes_key_cache.stats(),
+                "password_hashing": hash_stats.dict(),
+            },
+        )
+    return Response(
+        base_response.json(),
+        status=base_response.status,
+        mimetype="application/json",
+    )
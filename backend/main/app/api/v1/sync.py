@@ -0,0 +1,45 @@
+""" Sync API """
+
+from http import HTTPStatus
+
+from app import crud, schemas
+from app.api.deps import BaseResponse, request_inject
+from app.strings import SyncStrings
+from flask import Blueprint
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from flask_restful import Api, Resource
+from sqlalchemy.orm import Session
+
+sync_blueprint = Blueprint("sync", __name__)
+sync_api = Api(sync_blueprint)
+
+
+class Sync(Resource):
+    """Sync API"""
+
+    method_decorators = [jwt_required()]
+
+    @request_inject(
+        input_schema=None, output_schema=schemas.Sync, query_schema=schemas.SyncQuery
+    )
+    def get(self, db: Session, query_data: dict) -> BaseResponse:
+        """Get the tasks, tags and task tag sets changed since a sequence.
+
+        Args:
+            db (Session): The database session.
+            query_data (dict): The sync query data.
+
+        Returns:
+            BaseResponse: The response object.
+        """
+        user_id = get_jwt_identity()
+        changes = crud.change_log.get_changes(db=db, user_id=user_id, **query_data)
+
+        return BaseResponse(
+            message=SyncStrings.get_success(),
+            status=HTTPStatus.OK,
+            data=changes,
+        )
+
+
+sync_api.add_resource(Sync, "/sync")
@@ -52,18 +52,29 @@ class Tag(Resource):
             data=tag,
         )
 
-    @request_inject(input_schema=None, output_schema=schemas.Tag)
-    def get(self, db: Session) -> BaseResponse:
+    @request_inject(
+        input_schema=None,
+        output_schema=schemas.Tag,
+        query_schema=schemas.TagListQuery,
+        conditional=True,
+    )
+    def get(self, db: Session, query_data: dict) -> BaseResponse:
         """Get all tags.
 
         Args:
             db (Session): The database session.
+            query_data (dict): The fieldset and delta query data.
 
         Returns:
             BaseResponse: The response object.
         """
         user_id = get_jwt_identity()
-        tags = crud.tag.get_multi(db=db, user_id=user_id)
+        tags = crud.tag.get_multi(
+            db=db,
+            user_id=user_id,
+            modified_since=query_data["modified_since"],
+            fields=query_data["fields"],
+        )
 
         return BaseResponse(
             message=TagStrings.get_success(),
@@ -77,7 +88,7 @@ class TagById(Resource):
 
     method_decorators = [jwt_required()]
 
-    @request_inject(input_schema=None, output_schema=schemas.Tag)
+    @request_inject(input_schema=None, output_schema=schemas.Tag, conditional=True)
     def get(self, db: Session, tag_id: int) -> BaseResponse:
         """Get a tag by ID.
 
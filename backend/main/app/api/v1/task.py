@@ -3,11 +3,20 @@
 from http import HTTPStatus
 
 from app import crud, schemas
-from app.api.deps import BaseResponse, get_db, request_inject
-from app.strings import TaskStrings, TagStrings
-from flask import Blueprint
-from flask_jwt_extended import get_jwt_identity, jwt_required
+from app.api.deps import (
+    BaseResponse,
+    get_db,
+    get_request_db,
+    request_inject,
+    session_expired,
+    stream_response,
+)
+from app.core.session_key import get_session_aes_key
+from app.strings import GeneralStrings, TaskStrings, TagStrings
+from flask import Blueprint, Response, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
 from flask_restful import Api, Resource
+from marshmallow.exceptions import ValidationError
 from sqlalchemy.orm import Session
 
 task_blueprint = Blueprint("task", __name__)
@@ -55,7 +64,7 @@ class Task(Resource):
         task = crud.task.create(db=db, obj_in=request_data)
 
         # Add tags to task
-        crud.task_tag.create_multi(db=db, obj_in=tags, task_id=task.id)
+        crud.task_tag.create_multi(db=db, obj_in=tags, task_id=task.id, user_id=user_id)
         # Add tags to task
         task = task.dict()
         task["tags"] = tags_data
@@ -67,23 +76,30 @@ class Task(Resource):
             data=task,
         )
 
-    @request_inject(input_schema=None, output_schema=schemas.Task)
-    def get(self, db: Session) -> BaseResponse:
-        """Get all tasks.
+    @request_inject(
+        input_schema=None,
+        output_schema=schemas.Task,
+        query_schema=schemas.TaskListQuery,
+        conditional=True,
+    )
+    def get(self, db: Session, query_data: dict) -> BaseResponse:
+        """Get a page of tasks.
 
         Args:
             db (Session): The database session.
+            query_data (dict): The pagination, fieldset and delta query data.
 
         Returns:
             BaseResponse: The response object.
         """
         user_id = get_jwt_identity()
-        tasks = crud.task.get_multi(db=db, user_id=user_id)
+        tasks, next_cursor = crud.task.get_multi(db=db, user_id=user_id, **query_data)
 
         return BaseResponse(
             message=TaskStrings.get_success(),
             status=HTTPStatus.OK,
             data=tasks,
+            next_cursor=next_cursor,
         )
 
 
@@ -92,7 +108,7 @@ class TaskById(Resource):
 
     method_decorators = [jwt_required()]
 
-    @request_inject(input_schema=None, output_schema=schemas.Task)
+    @request_inject(input_schema=None, output_schema=schemas.Task, conditional=True)
     def get(self, db: Session, task_id: int) -> BaseResponse:
         """Get a task by id.
 
@@ -113,14 +129,6 @@ class TaskById(Resource):
                 error=True,
             )
 
-        # Get task tags
-        tags = crud.task_tag.get_multi(db=db, task_id=task_id)
-        tags = [tag.tag.dict() for tag in tags]
-
-        # Add tags to task
-        task = task.dict()
-        task["tags"] = tags
-
         return BaseResponse(
             message=TaskStrings.get_success(),
             status=HTTPStatus.OK,
@@ -150,58 +158,25 @@ class TaskById(Resource):
             )
 
         tags = None
-        tags_data = []
         if request_data.get("tags"):
-            # Verify that all tags provided exist
-            tags = crud.tag.get_multi_id(
-                db=db, ids=request_data["tags"], user_id=user_id
-            )
-            if len(tags) != len(request_data["tags"]):
-                return BaseResponse(
-                    message=TagStrings.not_found(),
-                    status=HTTPStatus.NOT_FOUND,
-                    error=True,
-                )
-
-            # Remove tags from request data
-            tags_data = [tag.dict() for tag in tags]
-            tags = request_data.pop("tags")
-        else:
-            # Get task tags
-            task_tags = crud.task_tag.get_multi(db=db, task_id=task_id)
-            current_tags = [tag.tag_id for tag in task_tags]
-            tags_data = crud.tag.get_multi_id(db=db, ids=current_tags, user_id=user_id)
-            tags_data = [tag.dict() for tag in tags_data]
-
-        # Update task
-        if (request_data.get("title") and task.title != request_data.get("title")) or (
-            request_data.get("description")
-            and task.description != request_data.get("description")
-            or (
-                request_data.get("status") and task.status != request_data.get("status")
-            )
-        ):
-            task = crud.task.update(db=db, db_obj=task, obj_in=request_data)
-
-        # Update tags
-        if tags:
-            # Get current task tags
-            task_tags = crud.task_tag.get_multi(db=db, task_id=task_id)
-            current_tags = set([tag.tag_id for tag in task_tags])
-            # Get tags from request
-            request_tags = set(tags)
-            # Delete tags that are in current_tags but not in request_tags
-            tags_to_delete = current_tags - request_tags
-            crud.task_tag.delete_multi(db=db, task_id=task_id, tag_ids=tags_to_delete)
-            # Create tags that are in request_tags but not in current_tags
-            tags_to_create = request_tags - current_tags
-            new_tags = crud.task_tag.create_multi(
-                db=db, obj_in=tags_to_create, task_id=task_id
-            )
-
-        # Add tags to task
-        task = task.dict()
-        task["tags"] = tags_data
+            # Tags are loaded along with the task, only look up new ones
+            tag_ids = list(dict.fromkeys(request_data.pop("tags")))
+            by_id = {tag.id: tag for tag in task.tags}
+            missing = [tag_id for tag_id in tag_ids if tag_id not in by_id]
+            if missing:
+                # Verify that all tags provided exist
+                found = crud.tag.get_multi_id(db=db, ids=missing, user_id=user_id)
+                if len(found) != len(missing):
+                    return BaseResponse(
+                        message=TagStrings.not_found(),
+                        status=HTTPStatus.NOT_FOUND,
+                        error=True,
+                    )
+                by_id.update({tag.id: tag for tag in found})
+            tags = [by_id[tag_id] for tag_id in tag_ids]
+
+        # Update the task and its tags in one transaction
+        task = crud.task.patch(db=db, db_obj=task, obj_in=request_data, tags=tags)
 
         return BaseResponse(
             message=TaskStrings.update_success(),
@@ -242,24 +217,33 @@ class TaskByStatus(Resource):
 
     method_decorators = [jwt_required()]
 
-    @request_inject(input_schema=None, output_schema=schemas.Task)
-    def get(self, db: Session, status: str) -> BaseResponse:
-        """Get a task by status.
+    @request_inject(
+        input_schema=None,
+        output_schema=schemas.Task,
+        query_schema=schemas.TaskListQuery,
+        conditional=True,
+    )
+    def get(self, db: Session, query_data: dict, status: str) -> BaseResponse:
+        """Get a page of tasks by status.
 
         Args:
             db (Session): The database session.
+            query_data (dict): The pagination, fieldset and delta query data.
             status (str): The task status.
 
         Returns:
             BaseResponse: The response object.
         """
         user_id = get_jwt_identity()
-        tasks = crud.task.get_multi_by_status(db=db, user_id=user_id, status=status)
+        tasks, next_cursor = crud.task.get_multi_by_status(
+            db=db, user_id=user_id, status=status, **query_data
+        )
 
         return BaseResponse(
             message=TaskStrings.get_success(),
             status=HTTPStatus.OK,
             data=tasks,
+            next_cursor=next_cursor,
         )
 
 
@@ -268,28 +252,252 @@ class TaskByTag(Resource):
 
     method_decorators = [jwt_required()]
 
-    @request_inject(input_schema=None, output_schema=schemas.Task)
-    def get(self, db: Session, tag_id: int) -> BaseResponse:
-        """Get a task by tag.
+    @request_inject(
+        input_schema=None,
+        output_schema=schemas.Task,
+        query_schema=schemas.TaskListQuery,
+        conditional=True,
+    )
+    def get(self, db: Session, query_data: dict, tag_id: int) -> BaseResponse:
+        """Get a page of tasks by tag.
 
         Args:
             db (Session): The database session.
+            query_data (dict): The pagination, fieldset and delta query data.
             tag_id (int): The tag id.
 
         Returns:
             BaseResponse: The response object.
         """
         user_id = get_jwt_identity()
-        tasks = crud.task.get_multi_by_tag(db=db, user_id=user_id, tag_id=tag_id)
+        tasks, next_cursor = crud.task.get_multi_by_tag(
+            db=db, user_id=user_id, tag_id=tag_id, **query_data
+        )
+
+        return BaseResponse(
+            message=TaskStrings.get_success(),
+            status=HTTPStatus.OK,
+            data=tasks,
+            next_cursor=next_cursor,
+        )
+
+
+class TaskBatch(Resource):
+    """Task batch API"""
+
+    method_decorators = [jwt_required()]
+
+    @request_inject(
+        input_schema=schemas.TaskBatch, output_schema=schemas.TaskBatchResult
+    )
+    def post(self, request_data: dict, db: Session) -> BaseResponse:
+        """Create, update and delete tasks in a single transaction.
+
+        Args:
+            request_data (dict): The request data.
+            db (Session): The database session.
+
+        Returns:
+            BaseResponse: The response object with a result per operation.
+        """
+        user_id = get_jwt_identity()
+        operations = request_data["operations"]
+
+        # Verify all tags and tasks referenced by the batch at once
+        tag_ids = set()
+        task_ids = set()
+        for operation in operations:
+            tag_ids.update(operation.get("data", {}).get("tags") or [])
+            if operation["op"] != "create":
+                task_ids.add(operation["id"])
+        tags = {
+            tag.id: tag.dict()
+            for tag in crud.tag.get_multi_id(db=db, ids=list(tag_ids), user_id=user_id)
+        }
+        owned_ids = crud.task.get_owned_ids(db=db, ids=list(task_ids), user_id=user_id)
+
+        results = []
+        creates = []
+        patches = {}
+        deletes = []
+        for index, operation in enumerate(operations):
+            result = {"index": index, "op": operation["op"], "id": operation.get("id")}
+            results.append(result)
+            data = operation.get("data", {})
+
+            if operation["op"] != "create":
+                if operation["id"] not in owned_ids:
+                    result["status"] = HTTPStatus.NOT_FOUND
+                    result["msg"] = TaskStrings.not_found()
+                    continue
+                if operation["id"] in patches or operation["id"] in deletes:
+                    result["status"] = HTTPStatus.CONFLICT
+                    result["msg"] = TaskStrings.batch_duplicate()
+                    continue
+            if any(tag_id not in tags for tag_id in data.get("tags") or []):
+                result["status"] = HTTPStatus.NOT_FOUND
+                result["msg"] = TagStrings.not_found()
+                continue
+
+            if operation["op"] == "create":
+                creates.append(data)
+            elif operation["op"] == "patch":
+                patches[operation["id"]] = data
+            else:
+                deletes.append(operation["id"])
+
+        created, patched = crud.task.apply_batch(
+            db=db, user_id=user_id, creates=creates, patches=patches, deletes=deletes
+        )
+
+        # Fill in the results of the applied operations
+        created = iter(zip(created, creates))
+        patched = {task.id: task for task in patched}
+        for result in results:
+            if "status" in result:
+                continue
+            if result["op"] == "create":
+                task, data = next(created)
+                task["tags"] = [
+                    tags[tag_id] for tag_id in dict.fromkeys(data.get("tags") or [])
+                ]
+                result.update(
+                    id=task["id"],
+                    status=HTTPStatus.CREATED,
+                    msg=TaskStrings.create_success(),
+                    data=task,
+                )
+            elif result["op"] == "patch":
+                result.update(
+                    status=HTTPStatus.OK,
+                    msg=TaskStrings.update_success(),
+                    data=patched[result["id"]],
+                )
+            else:
+                result.update(status=HTTPStatus.OK, msg=TaskStrings.delete_success())
+
+        return BaseResponse(
+            message=TaskStrings.batch_success(),
+            status=HTTPStatus.OK,
+            data=results,
+        )
+
+
+class TaskStats(Resource):
+    """Task stats API"""
+
+    method_decorators = [jwt_required()]
+
+    @request_inject(
+        input_schema=None, output_schema=schemas.TaskStats, conditional=True
+    )
+    def get(self, db: Session) -> BaseResponse:
+        """Get the number of tasks per status and per tag.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            BaseResponse: The response object.
+        """
+        user_id = get_jwt_identity()
+        stats = crud.task_stat.get_counts(db=db, user_id=user_id)
+
+        return BaseResponse(
+            message=TaskStrings.stats_success(),
+            status=HTTPStatus.OK,
+            data=stats,
+        )
+
+
+class TaskSearch(Resource):
+    """Task search API"""
+
+    method_decorators = [jwt_required()]
+
+    @request_inject(
+        input_schema=None,
+        output_schema=schemas.Task,
+        query_schema=schemas.SearchPagination,
+        conditional=True,
+    )
+    def get(self, db: Session, query_data: dict) -> BaseResponse:
+        """Search tasks by title and description.
+
+        Args:
+            db (Session): The database session.
+            query_data (dict): The search and pagination query data.
+
+        Returns:
+            BaseResponse: The response object, best matches first.
+        """
+        user_id = get_jwt_identity()
+        tasks, next_cursor = crud.task.search(db=db, user_id=user_id, **query_data)
 
         return BaseResponse(
             message=TaskStrings.get_success(),
             status=HTTPStatus.OK,
             data=tasks,
+            next_cursor=next_cursor,
+        )
+
+
+class TaskExport(Resource):
+    """Task export API"""
+
+    method_decorators = [jwt_required()]
+
+    def get(self) -> Response:
+        """Stream all tasks as NDJSON or as a JSON array.
+
+        Returns:
+            Response: The streaming response, encrypted frame by frame.
+        """
+        try:
+            query_data = schemas.TaskExport().load(request.args.to_dict())
+        except ValidationError as err:
+            base_response = BaseResponse(
+                message=GeneralStrings.invalid_request_data(),
+                status=HTTPStatus.BAD_REQUEST,
+                data=err,
+                error=True,
+            )
+            return Response(
+                base_response.json(),
+                status=base_response.status,
+                mimetype="application/json",
+            )
+
+        user_id = get_jwt_identity()
+        db = get_request_db()
+        claims = get_jwt()
+        key = get_session_aes_key(
+            db=db,
+            user_id=user_id,
+            salt=claims["salt"],
+            password_version=claims.get("pwv"),
+        )
+        if key is None:
+            base_response = session_expired()
+            return Response(
+                base_response.json(),
+                status=base_response.status,
+                mimetype="application/json",
+            )
+
+        return stream_response(
+            crud.task.stream_multi(db=db, user_id=user_id),
+            output_schema=schemas.Task,
+            format=query_data["format"],
+            key=key,
         )
 
 
 task_api.add_resource(Task, "/task")
+task_api.add_resource(TaskExport, "/task/export")
+task_api.add_resource(TaskSearch, "/task/search")
+task_api.add_resource(TaskStats, "/task/stats")
+task_api.add_resource(TaskBatch, "/task/batch")
 task_api.add_resource(TaskById, "/task/<int:task_id>")
 task_api.add_resource(TaskByStatus, "/task/status/<string:status>")
 task_api.add_resource(TaskByTag, "/task/tag/<int:tag_id>")
@@ -33,8 +33,8 @@ class User(Resource):
             BaseResponse: The response object.
         """
         # Check if user already exists
-        user = crud.user.get_by_email(db=db, email=request_data["email"])
-        if user:
+        entry = crud.user_shard.get_by_email(db=db, email=request_data["email"])
+        if entry:
             return BaseResponse(
                 message=UserStrings.user_already_exists(),
                 status=HTTPStatus.CONFLICT,
@@ -3,8 +3,9 @@
 from typing import Optional
 
 from app import crud
-from app.core.security import verify_password
+from app.core.security import verify_and_update_password
 from app.db.base import User
+from app.db.shard import shard_session
 from sqlalchemy.orm import Session
 
 
@@ -14,14 +15,29 @@ def authenticate(email: str, password: str, db: Session) -> Optional[User]:
     Args:
         email (str): The user's email.
         password (str): The user's password.
-        db (Session): The database session.
+        db (Session): A session on the first shard, holding the shard map.
 
     Returns:
         Optional[User]: The user object if authenticated, else None.
     """
-    user = crud.user.get_by_email(db=db, email=email)
-    if not user:
-        return None
-    if not verify_password(password, user.hashed_password):
+    entry = crud.user_shard.get_by_email(db=db, email=email)
+    if not entry:
         return None
+    with shard_session(entry.shard, db) as shard_db:
+        user = crud.user.get(db=shard_db, id=entry.id)
+        if not user:
+            return None
+        verified, new_hash = verify_and_update_password(password, user.hashed_password)
+        if not verified:
+            return None
+        if new_hash:
+            # The hash uses an outdated cost, replace it while the password is
+            # known. The session secret stays, so the user's sessions do too.
+            # A move would copy the rows without the write, leave it to a
+            # later login then; re-read as the move may have started meanwhile
+            db.refresh(entry)
+            if entry.target_shard is None:
+                user = crud.user.update(
+                    db=shard_db, db_obj=user, obj_in={"hashed_password": new_hash}
+                )
     return user
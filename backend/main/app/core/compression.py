@@ -0,0 +1,87 @@
+""" Compression of response data ahead of encryption.
+
+Ciphertext does not compress, so response data is compressed before it is
+encrypted. zstd is offered when the zstandard package is installed, gzip
+always.
+"""
+
+import gzip
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Compressors by encoding name, in order of server preference
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {}
+DECOMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = zstandard.ZstdCompressor(level=3).compress
+    DECOMPRESSORS["zstd"] = lambda data: zstandard.ZstdDecompressor().decompress(data)
+COMPRESSORS["gzip"] = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+DECOMPRESSORS["gzip"] = gzip.decompress
+
+ENCODINGS: List[str] = list(COMPRESSORS)
+
+
+def negotiate_encoding(
+    accept: Optional[str] = None, claim: Optional[str] = None
+) -> Optional[str]:
+    """Pick the data encoding of a response
+
+    Args:
+        accept (Optional[str], optional): The Accept-Data-Encoding header,
+            in Accept-Encoding syntax. Defaults to None.
+        claim (Optional[str], optional): The data_encoding claim of the JWT,
+            used when the header is missing. Defaults to None.
+
+    Returns:
+        Optional[str]: The encoding, or None to leave the data uncompressed.
+    """
+    if accept:
+        accepted: Accept = parse_accept_header(accept)
+        best = accepted.best_match(ENCODINGS)
+        return best if best and accepted[best] > 0 else None
+    return claim if claim in COMPRESSORS else None
+
+
+def compress_data(
+    data: bytes, encoding: Optional[str], min_size: Optional[int] = None
+) -> Tuple[bytes, Optional[str]]:
+    """Compress data unless it is smaller than the threshold
+
+    Args:
+        data (bytes): The data to compress.
+        encoding (Optional[str]): The negotiated encoding, None to skip.
+        min_size (Optional[int], optional): The smallest size worth
+            compressing. Defaults to RESPONSE_COMPRESSION_MIN_SIZE.
+
+    Returns:
+        Tuple[bytes, Optional[str]]: The data and the encoding applied, None
+            if it was left uncompressed.
+    """
+    if min_size is None:
+        min_size = settings.RESPONSE_COMPRESSION_MIN_SIZE
+    if encoding is None or len(data) < min_size:
+        return data, None
+    return COMPRESSORS[encoding](data), encoding
+
+
+def decompress_data(data: bytes, encoding: Optional[str]) -> bytes:
+    """Decompress data compressed by compress_data
+
+    Args:
+        data (bytes): The data.
+        encoding (Optional[str]): The encoding applied, None if none was.
+
+    Returns:
+        bytes: The decompressed data.
+    """
+    if encoding is None:
+        return data
+    return DECOMPRESSORS[encoding](data)
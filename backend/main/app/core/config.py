@@ -1,6 +1,7 @@
 """ Fetch configuration from environment variables. """
 
 from datetime import timedelta
+from typing import Literal
 
 from pydantic import BaseSettings
 
@@ -15,6 +16,29 @@ class DBSettings(BaseSettings):
     DATABASE_PASSWORD: str = ""
     DATABASE_NAME: str = ""
 
+    # Connection pool, per gunicorn worker
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: int = 30
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_POOL_RECYCLE: int = 1800
+    # Statement timeout in milliseconds (PostgreSQL only), 0 disables it
+    DATABASE_STATEMENT_TIMEOUT: int = 0
+    # Serve requests over the asyncio engine (asyncpg, aiosqlite)
+    DATABASE_ASYNC: bool = False
+    # CRUD calls only flush and each request commits once
+    DATABASE_UNIT_OF_WORK: bool = False
+    # Comma separated read replica URLs serving GET requests, empty disables
+    DATABASE_REPLICA_URLS: str = ""
+    # Seconds the GET requests of a client sending back its last_write cookie
+    # stay on the primary after a mutation
+    DATABASE_REPLICA_STICKY_SECONDS: float = 5
+    # Comma separated URLs of the shards after the first one, which is
+    # DATABASE_CONNECTION_URL and holds the shard map, empty disables sharding
+    DATABASE_SHARD_URLS: str = ""
+    # Seconds a worker caches the shard of a user
+    DATABASE_SHARD_MAP_TTL: float = 5
+
 
 class JWTSettings(BaseSettings):
     """JWT settings"""
@@ -28,8 +52,27 @@ class Settings(BaseSettings):
     """Main settings"""
 
     API_V1_STR: str = "/api/v1"
+    # Derived AES keys cached per worker, keyed by (user_id, salt, password version)
+    AES_KEY_CACHE_SIZE: int = 10000
+    AES_KEY_CACHE_TTL: int = 300
+    # bcrypt cost factor, existing hashes are upgraded on the next login
+    PASSWORD_HASH_ROUNDS: int = 12
+    # Hashing processes per worker, 0 hashes inline in the worker
+    PASSWORD_HASH_WORKERS: int = 2
+    # Calls allowed to wait for a hashing process before answering 503
+    PASSWORD_HASH_QUEUE_DEPTH: int = 8
+    # Days of changes kept for incremental sync, older tokens get a snapshot
+    CHANGE_LOG_RETENTION_DAYS: int = 30
+    # Encrypted response data smaller than this (bytes of JSON) is not compressed
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+    # JSON encoder, "auto" uses orjson when installed, else "stdlib"
+    JSON_BACKEND: Literal["auto", "orjson", "stdlib"] = "auto"
+    # Sent in the Metrics-Token header by GET /metrics, empty disables it
+    METRICS_TOKEN: str = ""
     db = DBSettings()
     db.DATABASE_CONNECTION_URL = db.DATABASE_CONNECTION_URL.format(**db.dict())
+    db.DATABASE_REPLICA_URLS = db.DATABASE_REPLICA_URLS.format(**db.dict())
+    db.DATABASE_SHARD_URLS = db.DATABASE_SHARD_URLS.format(**db.dict())
 
     jwt = JWTSettings()
 
@@ -46,22 +46,44 @@ def generate_determinstic_aes_key(password: str, salt: str) -> bytes:
     return key.encode("utf-8")
 
 
-def encrypt_data_aes(key: bytes, data: bytes) -> str:
-    """Encrypt data using AES
+def encrypt_data_aes_bytes(
+    key: bytes, data: bytes, associated_data: bytes = None
+) -> bytes:
+    """Encrypt data using AES, without the Base64 encoding
 
     Args:
         key (bytes): The key to use to encrypt the data.
         data (bytes): The data to encrypt.
+        associated_data (bytes, optional): Data authenticated along with the
+            ciphertext but not encrypted. Defaults to None.
 
     Returns:
-        str: The encrypted data.
+        bytes: The nonce, tag and ciphertext.
     """
     cipher = AES.new(key, AES.MODE_EAX)
+    if associated_data is not None:
+        cipher.update(associated_data)
     ciphertext, tag = cipher.encrypt_and_digest(data)
     encrypted_data = BytesIO()
     for obj in (cipher.nonce, tag, ciphertext):
         encrypted_data.write(obj)
-    encrypted_data.seek(0)
+    return encrypted_data.getvalue()
+
+
+def encrypt_data_aes(key: bytes, data: bytes, associated_data: bytes = None) -> str:
+    """Encrypt data using AES
+
+    Args:
+        key (bytes): The key to use to encrypt the data.
+        data (bytes): The data to encrypt.
+        associated_data (bytes, optional): Data authenticated along with the
+            ciphertext but not encrypted. Defaults to None.
+
+    Returns:
+        str: The encrypted data.
+    """
+    encrypted_data = encrypt_data_aes_bytes(
+        key=key, data=data, associated_data=associated_data
+    )
     # Convert encrypted data to Base64 string
-    encrypted_data = base64.b64encode(encrypted_data.read())
-    return encrypted_data.decode("utf-8")
+    return base64.b64encode(encrypted_data).decode("utf-8")
@@ -0,0 +1,101 @@
+""" JSON encoding backend.
+
+orjson is used when installed, the standard library otherwise; JSON_BACKEND
+forces one. Both encode datetimes as ISO 8601 strings and enums by value,
+so models can be serialized without converting them first, and both emit
+the same compact UTF-8 output.
+"""
+
+import json
+from datetime import date
+from enum import Enum
+from typing import Any, Callable
+
+from app.core.config import settings
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Encode the types the standard library does not know natively"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    # Validation errors key list items by index
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+if settings.JSON_BACKEND == "stdlib" or (
+    settings.JSON_BACKEND == "auto" and orjson is None
+):
+    BACKEND = "stdlib"
+    _dumps: Callable[[Any], bytes] = _stdlib_dumps
+    _loads: Callable[[Any], Any] = json.loads
+elif orjson is not None:
+    BACKEND = "orjson"
+    _dumps = _orjson_dumps
+    _loads = orjson.loads
+else:
+    raise ImportError("JSON_BACKEND is orjson, but orjson is not installed")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object as JSON
+
+    Args:
+        obj (Any): The object to encode.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+    """
+    return _dumps(obj)
+
+
+def dumps_str(obj: Any) -> str:
+    """Encode an object as a JSON string
+
+    Args:
+        obj (Any): The object to encode.
+
+    Returns:
+        str: The JSON string.
+    """
+    return _dumps(obj).decode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """Decode JSON
+
+    Args:
+        data (Any): The JSON, as bytes or str.
+
+    Returns:
+        Any: The decoded object.
+    """
+    return _loads(data)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider using the configured backend, for request.get_json
+    and jsonify"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps_str(obj)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return loads(s)
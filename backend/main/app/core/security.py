@@ -1,8 +1,190 @@
-""" Password hashing and verification. """
+""" Password hashing and verification.
 
+bcrypt runs in a small per-worker process pool so a burst of logins does not
+hold the GIL of the worker serving task traffic. Calls beyond the pool size
+plus PASSWORD_HASH_QUEUE_DEPTH are rejected with PasswordHasherBusy instead of
+queueing without bound.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from app.core.config import settings
 from passlib.context import CryptContext
 
-PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PWD_CONTEXT = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_HASH_ROUNDS,
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+class HashStats:
+    """Password hashing statistics of the current process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset all counters"""
+        self.calls = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_hash = 0.0
+        self.max_hash = 0.0
+
+    def record_call(self, wait: float, hash_time: float) -> None:
+        """Record a completed hashing call
+
+        Args:
+            wait (float): Seconds spent queued before a process picked it up.
+            hash_time (float): Seconds spent hashing.
+        """
+        with self._lock:
+            self.calls += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_hash += hash_time
+            self.max_hash = max(self.max_hash, hash_time)
+
+    def dict(self) -> dict:
+        """Returns the statistics as a dictionary
+
+        Returns:
+            dict: The statistics as a dictionary
+        """
+        with self._lock:
+            return {
+                "rounds": settings.PASSWORD_HASH_ROUNDS,
+                "workers": settings.PASSWORD_HASH_WORKERS,
+                "queue_depth": settings.PASSWORD_HASH_QUEUE_DEPTH,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "wait_seconds_total": self.total_wait,
+                "wait_seconds_max": self.max_wait,
+                "wait_seconds_avg": self.total_wait / self.calls if self.calls else 0.0,
+                "hash_seconds_total": self.total_hash,
+                "hash_seconds_max": self.max_hash,
+                "hash_seconds_avg": self.total_hash / self.calls if self.calls else 0.0,
+            }
+
+
+hash_stats = HashStats()
+
+
+def _hash(password: str) -> str:
+    return PWD_CONTEXT.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return PWD_CONTEXT.verify(plain_password, hashed_password)
+
+
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return PWD_CONTEXT.verify_and_update(plain_password, hashed_password)
+
+
+def _timed(func: Callable, submitted: float, *args) -> Tuple[object, float, float]:
+    """Run func in a pool process and time it
+
+    Args:
+        func (Callable): The function to run.
+        submitted (float): The wall clock time the call was submitted.
+        *args: The arguments of func.
+
+    Returns:
+        Tuple[object, float, float]: The result, the queue wait and the
+            hashing time in seconds.
+    """
+    started = time.time()
+    result = func(*args)
+    return result, started - submitted, time.time() - started
+
+
+class PasswordHasher:
+    """Bounded process pool running PWD_CONTEXT calls, created lazily per
+    worker process so it is never shared across a fork"""
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.limit = workers + queue_depth
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Get the pool of the current process, creating it on first use
+
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        if self._pid != os.getpid():
+            # Spawned processes do not inherit the worker's threads or locks
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            hash_stats.in_flight -= 1
+
+    def run(self, func: Callable, *args) -> object:
+        """Run a hashing function in the pool and wait for its result
+
+        Args:
+            func (Callable): The module level function to run.
+            *args: The arguments of func.
+
+        Raises:
+            PasswordHasherBusy: If the pool and its queue are full.
+
+        Returns:
+            object: The result of func.
+        """
+        if not self.workers:
+            started = time.time()
+            result = func(*args)
+            hash_stats.record_call(0.0, time.time() - started)
+            return result
+
+        with self._lock:
+            if hash_stats.in_flight >= self.limit:
+                hash_stats.rejected += 1
+                raise PasswordHasherBusy()
+            hash_stats.in_flight += 1
+            try:
+                future = self._get_executor().submit(_timed, func, time.time(), *args)
+            except BaseException:
+                hash_stats.in_flight -= 1
+                raise
+        future.add_done_callback(self._release)
+
+        result, wait, hash_time = future.result()
+        hash_stats.record_call(wait, hash_time)
+        return result
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_depth=settings.PASSWORD_HASH_QUEUE_DEPTH,
+)
 
 
 def get_password_hash(password) -> str:
@@ -11,10 +193,13 @@ def get_password_hash(password) -> str:
     Args:
         password (str): The password to hash.
 
+    Raises:
+        PasswordHasherBusy: If the hashing queue is full.
+
     Returns:
         str: The hashed password.
     """
-    return PWD_CONTEXT.hash(password)
+    return password_hasher.run(_hash, password)
 
 
 def verify_password(plain_password, hashed_password) -> bool:
@@ -24,7 +209,29 @@ def verify_password(plain_password, hashed_password) -> bool:
         plain_password (str): The password to verify.
         hashed_password (str): The hashed password.
 
+    Raises:
+        PasswordHasherBusy: If the hashing queue is full.
+
     Returns:
         bool: True if the password is correct, else False.
     """
-    return PWD_CONTEXT.verify(plain_password, hashed_password)
+    return password_hasher.run(_verify, plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password, hashed_password
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password and rehash it if its hash uses outdated settings.
+
+    Args:
+        plain_password (str): The password to verify.
+        hashed_password (str): The hashed password.
+
+    Raises:
+        PasswordHasherBusy: If the hashing queue is full.
+
+    Returns:
+        Tuple[bool, Optional[str]]: True if the password is correct, else
+            False, and the new hash if the stored one should be replaced.
+    """
+    return password_hasher.run(_verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,92 @@
+""" Response body encodings negotiated through the Accept header.
+
+JSON is always available. MessagePack and CBOR are offered when the msgpack
+and cbor2 packages are installed; both carry the encrypted data as a byte
+string, so it needs no Base64.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core import json_backend
+from werkzeug.datastructures import MIMEAccept
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+
+class Codec:
+    """An encoding of response bodies"""
+
+    def __init__(
+        self,
+        mimetype: str,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[bytes], Any],
+        binary: bool,
+    ):
+        self.mimetype = mimetype
+        self.dumps = dumps
+        self.loads = loads
+        # Whether bytes can be embedded as they are, without Base64
+        self.binary = binary
+
+
+JSON = Codec(
+    mimetype="application/json",
+    dumps=json_backend.dumps,
+    loads=json_backend.loads,
+    binary=False,
+)
+
+# Codecs by mimetype, JSON first so it wins ties such as */*
+CODECS: Dict[str, Codec] = {JSON.mimetype: JSON}
+if msgpack is not None:
+    CODECS["application/msgpack"] = Codec(
+        mimetype="application/msgpack",
+        dumps=msgpack.packb,
+        loads=msgpack.unpackb,
+        binary=True,
+    )
+if cbor2 is not None:
+    CODECS["application/cbor"] = Codec(
+        mimetype="application/cbor",
+        dumps=cbor2.dumps,
+        loads=cbor2.loads,
+        binary=True,
+    )
+
+# Raw nonce, tag and ciphertext of a JSON envelope, see request_inject
+OCTET_STREAM = "application/octet-stream"
+
+MIMETYPES: List[str] = list(CODECS) + [OCTET_STREAM]
+
+
+def negotiate_mimetype(accept: MIMEAccept) -> str:
+    """Pick the response mimetype of a request
+
+    Args:
+        accept (MIMEAccept): The parsed Accept header of the request.
+
+    Returns:
+        str: One of MIMETYPES, application/json when nothing matches.
+    """
+    return accept.best_match(MIMETYPES) or JSON.mimetype
+
+
+def get_codec(mimetype: Optional[str]) -> Codec:
+    """Get the codec of a mimetype
+
+    Args:
+        mimetype (Optional[str]): The mimetype.
+
+    Returns:
+        Codec: Its codec, JSON for application/octet-stream and unknown types.
+    """
+    return CODECS.get(mimetype, JSON)
@@ -0,0 +1,63 @@
+""" Per-session AES key derivation with a process-local cache """
+
+import hashlib
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.crypt import generate_determinstic_aes_key
+from app.db.base import User
+from sqlalchemy.orm import Session
+
+aes_key_cache = TTLCache(
+    maxsize=settings.AES_KEY_CACHE_SIZE, ttl=settings.AES_KEY_CACHE_TTL
+)
+
+
+def get_password_version(session_secret: str) -> str:
+    """Get the version of a user's password, sent as the pwv JWT claim
+
+    Args:
+        session_secret (str): The user's session secret, which changes with
+            the password but not when its hash is upgraded.
+
+    Returns:
+        str: A short fingerprint of the secret.
+    """
+    return hashlib.md5(session_secret.encode("utf-8")).hexdigest()[:8]
+
+
+def get_session_aes_key(
+    db: Session, user_id: int, salt: str, password_version: Optional[str]
+) -> Optional[bytes]:
+    """Get the AES key of a session, deriving it only on a cache miss
+
+    The password version is part of the cache key, so no worker serves a key
+    cached for another version of the password. A session started before
+    the password changed gets no key once its cached one expires.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The id of the user, from the JWT identity.
+        salt (str): The salt, from the JWT claims.
+        password_version (Optional[str]): The password version, from the JWT
+            claims, None for tokens issued without one.
+
+    Returns:
+        Optional[bytes]: The key, or None if the password changed since the
+            session started.
+    """
+    cache_key = (user_id, salt, password_version)
+    key = aes_key_cache.get(cache_key)
+    if key is None:
+        session_secret = (
+            db.query(User.session_secret).filter(User.id == user_id).scalar()
+        )
+        if session_secret is None or (
+            password_version is not None
+            and password_version != get_password_version(session_secret)
+        ):
+            return None
+        key = generate_determinstic_aes_key(password=session_secret, salt=salt)
+        aes_key_cache.set(cache_key, key)
+    return key
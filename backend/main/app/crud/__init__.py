@@ -1,6 +1,10 @@
 """ CRUD Operations for the database. """
 
+from .change_log import change_log
 from .tag import tag
 from .task import task
+from .task_stat import task_stat
 from .task_tag import task_tag
 from .user import user
+from .user_shard import user_shard
+from .user_version import user_version
@@ -1,21 +1,73 @@
 """ Base CRUD class """
 
-from typing import Any, Generic, List, Optional, Type, TypeVar
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, Type, TypeVar
 
 from app.db.base_class import Base
-from sqlalchemy.orm import Session
+from app.db.session import defer_commit, in_unit_of_work
+from app.db.shard import id_allocator, sharding_enabled
+from app.utils.pagination import encode_cursor
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Query, Session
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=dict)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=dict)
 
+# Dialects supporting INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Columns every projected listing selects, for identity and keyset pagination
+PROJECTION_COLUMNS = ("id", "date_created")
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """Base CRUD class"""
 
+    # Allocate ids unique across shards, for rows that keep their id when
+    # their user moves to another shard
+    global_ids = False
+
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
+    def assign_ids(self, db: Session, rows: Sequence[dict]) -> None:
+        """Set ids unique across shards on the column values of new rows,
+        when sharding is enabled and the model has global ids
+
+        Args:
+            db (Session): The database session.
+            rows (Sequence[dict]): The column values of each new row.
+        """
+        if not self.global_ids or not sharding_enabled():
+            return
+        ids = id_allocator.allocate(self.model.__table__, len(rows), db)
+        for row, id in zip(rows, ids):
+            row["id"] = id
+
+    def assign_serial_ids(self, db: Session, rows: Sequence[dict]) -> None:
+        """Set ids drawn from the table's PostgreSQL id sequence on the column
+        values of new rows without one, in a single query, so the rows of a
+        multi-row INSERT ... RETURNING, which come back in no guaranteed
+        order, can be matched to them
+
+        Args:
+            db (Session): The database session.
+            rows (Sequence[dict]): The column values of each new row.
+        """
+        missing = [row for row in rows if "id" not in row]
+        if not missing:
+            return
+        sequence = func.pg_get_serial_sequence(self.model.__tablename__, "id")
+        ids = db.execute(
+            select(func.nextval(sequence)).select_from(
+                func.generate_series(1, len(missing))
+            )
+        ).scalars()
+        for row, id in zip(missing, ids):
+            row["id"] = id
+
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         """Get a single object by id
 
@@ -45,6 +97,98 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.query(self.model).order_by(self.model.id).offset(skip).limit(limit).all()
         )
 
+    def query_fields(self, db: Session, fields: Sequence[str]) -> Query:
+        """Query only the columns of the given fields, without loading models
+
+        The id and keyset columns are always selected. Convert the rows with
+        rows_to_fields.
+
+        Args:
+            db (Session): The database session.
+            fields (Sequence[str]): The selected fields.
+
+        Returns:
+            Query: The column only query.
+        """
+        return db.query(
+            *[
+                getattr(self.model, key)
+                for key in self.model.column_keys()
+                if key in fields or key in PROJECTION_COLUMNS
+            ]
+        )
+
+    def rows_to_fields(self, rows: Sequence[Any], fields: Sequence[str]) -> List[dict]:
+        """Convert the rows of query_fields to dictionaries of the given
+        fields and the id
+
+        Args:
+            rows (Sequence[Any]): The rows.
+            fields (Sequence[str]): The selected fields.
+
+        Returns:
+            List[dict]: The rows as dictionaries.
+        """
+        items = self.model.rows_to_dicts(rows)
+        unselected = [key for key in PROJECTION_COLUMNS[1:] if key not in fields]
+        for item in items:
+            for key in unselected:
+                del item[key]
+        return items
+
+    def paginate(
+        self,
+        query: Query,
+        *,
+        limit: int,
+        cursor: Optional[Tuple[datetime, int]] = None,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """Apply keyset pagination on (date_created, id) to a query
+
+        Args:
+            query (Query): The filtered query to paginate.
+            limit (int): The maximum number of objects to return.
+            cursor (Optional[Tuple[datetime, int]], optional): The decoded
+                position to continue after. Defaults to None.
+
+        Returns:
+            Tuple[List[ModelType], Optional[str]]: The page of objects and the
+                cursor of the next page, or None if this is the last page.
+        """
+        if cursor is not None:
+            query = query.filter(
+                tuple_(self.model.date_created, self.model.id) > tuple_(*cursor)
+            )
+        items = (
+            query.order_by(self.model.date_created, self.model.id)
+            .limit(limit + 1)
+            .all()
+        )
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].date_created, items[-1].id)
+        return items, next_cursor
+
+    def commit(self, db: Session, *refresh: ModelType) -> None:
+        """Commit the session and reload the given objects, or only flush it
+        when the session is in a unit of work.
+
+        Flushed objects do not expire, and server generated values come back
+        through RETURNING (eager_defaults), so they need no reload.
+
+        Args:
+            db (Session): The database session.
+            *refresh (ModelType): The objects to reload after a commit.
+        """
+        if in_unit_of_work(db):
+            defer_commit(db)
+            return
+        db.commit()
+        for db_obj in refresh:
+            db.refresh(db_obj)
+
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         """Create a new object
 
@@ -57,8 +201,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         db_obj = self.model(**obj_in)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self.commit(db, db_obj)
         return db_obj
 
     def update(
@@ -74,13 +217,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         Returns:
             ModelType: The updated object.
         """
-        obj_data = db_obj.dict()
-        for field in obj_data:
+        for field in self.model.column_keys():
             if field in obj_in:
                 setattr(db_obj, field, obj_in[field])
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self.commit(db, db_obj)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> ModelType:
@@ -95,5 +236,5 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         obj = db.query(self.model).get(id)
         db.delete(obj)
-        db.commit()
+        self.commit(db)
         return obj
@@ -0,0 +1,276 @@
+""" CRUD operations for the Change Log. """
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple, TypeVar
+
+from app.crud.base import CRUDBase
+from app.crud.user_version import user_version
+from app.db.base import ChangeLog, Tag, Task, TaskTag, UserVersion
+from app.models.change_log import ChangeEntity, ChangeOp
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+ChangeLogCreate = TypeVar("ChangeLogCreate", bound=dict)
+ChangeLogUpdate = TypeVar("ChangeLogUpdate", bound=dict)
+
+
+class CRUDChangeLog(CRUDBase[ChangeLog, ChangeLogCreate, ChangeLogUpdate]):
+    def record(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        entity: ChangeEntity,
+        ids: Iterable[int],
+        op: ChangeOp = ChangeOp.upsert,
+    ) -> None:
+        """Append changes to the log and bump the user's data version. Does
+        not commit, so the change is part of the caller's transaction.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            entity (ChangeEntity): The kind of the changed rows.
+            ids (Iterable[int]): The ids of the changed rows.
+            op (ChangeOp, optional): The operation. Defaults to ChangeOp.upsert.
+        """
+        self.record_entries(
+            db, user_id=user_id, entries=[(entity, id) for id in ids], op=op
+        )
+
+    def record_entries(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        entries: Iterable[Tuple[ChangeEntity, int]],
+        op: ChangeOp = ChangeOp.upsert,
+    ) -> None:
+        """Append changes of several kinds of rows to the log with a single
+        version bump. Does not commit, so the change is part of the caller's
+        transaction.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            entries (Iterable[Tuple[ChangeEntity, int]]): The kind and id of
+                every changed row.
+            op (ChangeOp, optional): The operation. Defaults to ChangeOp.upsert.
+        """
+        entries = list(dict.fromkeys(entries))
+        if not entries:
+            return
+        # Bumping first takes the lock on the user's version row, so the
+        # user's sequence numbers are allocated, and committed, in order and
+        # a client never syncs past a change that has yet to commit
+        user_version.bump(db, user_id=user_id)
+        now = datetime.utcnow()
+        db.execute(
+            insert(ChangeLog).values(
+                [
+                    {
+                        "user_id": user_id,
+                        "entity": entity,
+                        "entity_id": id,
+                        "op": op,
+                        "date_created": now,
+                    }
+                    for entity, id in entries
+                ]
+            )
+        )
+
+    def get_task_tags(
+        self, db: Session, *, task_ids: List[int], user_id: int
+    ) -> List[dict]:
+        """Get the tag sets of tasks
+
+        Args:
+            db (Session): The database session.
+            task_ids (List[int]): The ids of the tasks.
+            user_id (int): The id of the user.
+
+        Returns:
+            List[dict]: The task_id and tag ids of every task.
+        """
+        if not task_ids:
+            return []
+        tag_sets = {task_id: [] for task_id in task_ids}
+        rows = (
+            db.query(TaskTag.task_id, TaskTag.tag_id)
+            .join(Task, Task.id == TaskTag.task_id)
+            .filter(TaskTag.task_id.in_(task_ids), Task.user_id == user_id)
+            .order_by(TaskTag.task_id, TaskTag.tag_id)
+        )
+        for row in rows:
+            tag_sets[row.task_id].append(row.tag_id)
+        return [{"task_id": id, "tags": tags} for id, tags in tag_sets.items()]
+
+    def get_snapshot(self, db: Session, *, user_id: int, floor: int = 0) -> dict:
+        """Get every task, tag and task tag set of a user
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            floor (int, optional): The user's sync floor. Defaults to 0.
+
+        Returns:
+            dict: The sync data, with reset set.
+        """
+        # Read the sequence first, changes racing the snapshot are sent again
+        last = (
+            db.query(func.max(ChangeLog.id))
+            .filter(ChangeLog.user_id == user_id)
+            .scalar()
+        )
+        tasks = db.query(Task).filter(Task.user_id == user_id).order_by(Task.id).all()
+        tags = db.query(Tag).filter(Tag.user_id == user_id).order_by(Tag.id).all()
+        tag_sets = [
+            tag_set
+            for tag_set in self.get_task_tags(
+                db, task_ids=[task.id for task in tasks], user_id=user_id
+            )
+            if tag_set["tags"]
+        ]
+        return {
+            "next": max(last or 0, floor),
+            "has_more": False,
+            "reset": True,
+            "tasks": tasks,
+            "tags": tags,
+            "task_tags": tag_sets,
+        }
+
+    def get_changes(self, db: Session, *, user_id: int, since: int, limit: int) -> dict:
+        """Get the tasks, tags and task tag sets changed after a sequence
+
+        Falls back to a full snapshot when since is 0 or older than the
+        changes kept by compaction.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            since (int): The last sequence the client has seen.
+            limit (int): The maximum number of log entries to read.
+
+        Returns:
+            dict: The sync data.
+        """
+        floor = (
+            db.query(UserVersion.sync_floor)
+            .filter(UserVersion.user_id == user_id)
+            .scalar()
+        ) or 0
+        if not since or since < floor:
+            return self.get_snapshot(db, user_id=user_id, floor=floor)
+
+        entries = (
+            db.query(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+            .filter(ChangeLog.user_id == user_id, ChangeLog.id > since)
+            .order_by(ChangeLog.id)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        if not entries:
+            # Up to date, nothing but the sequence is sent back
+            return {"next": since, "has_more": False, "reset": False}
+
+        # Only the last operation on each row matters
+        latest = {}
+        for entry in entries:
+            latest[(entry.entity, entry.entity_id)] = entry.op
+        changed: Dict[tuple, List[int]] = {
+            (entity, op): [] for entity in ChangeEntity for op in ChangeOp
+        }
+        for (entity, id), op in latest.items():
+            changed[(entity, op)].append(id)
+
+        task_ids = changed[(ChangeEntity.task, ChangeOp.upsert)]
+        tag_ids = changed[(ChangeEntity.tag, ChangeOp.upsert)]
+        deleted_task_ids = changed[(ChangeEntity.task, ChangeOp.delete)]
+        deleted_tag_ids = changed[(ChangeEntity.tag, ChangeOp.delete)]
+        tag_set_ids = [
+            id
+            for id in changed[(ChangeEntity.task_tags, ChangeOp.upsert)]
+            if id not in deleted_task_ids
+        ]
+
+        tasks = []
+        if task_ids:
+            tasks = (
+                db.query(Task)
+                .filter(Task.id.in_(task_ids), Task.user_id == user_id)
+                .order_by(Task.id)
+                .all()
+            )
+        tags = []
+        if tag_ids:
+            tags = (
+                db.query(Tag)
+                .filter(Tag.id.in_(tag_ids), Tag.user_id == user_id)
+                .order_by(Tag.id)
+                .all()
+            )
+        deleted = None
+        if deleted_task_ids or deleted_tag_ids:
+            deleted = {
+                "tasks": sorted(deleted_task_ids) or None,
+                "tags": sorted(deleted_tag_ids) or None,
+            }
+
+        return {
+            "next": entries[-1].id,
+            "has_more": has_more,
+            "reset": False,
+            "tasks": tasks or None,
+            "tags": tags or None,
+            "task_tags": self.get_task_tags(db, task_ids=tag_set_ids, user_id=user_id)
+            or None,
+            "deleted": deleted,
+        }
+
+    def compact(self, db: Session, *, before: datetime) -> int:
+        """Prune the change log
+
+        Entries superseded by a later change of the same row are removed at
+        any age. Entries older than before are removed too, raising the sync
+        floor of their users so older tokens get a full snapshot instead.
+
+        Args:
+            db (Session): The database session.
+            before (datetime): The oldest entry time to keep.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        latest = select(func.max(ChangeLog.id)).group_by(
+            ChangeLog.user_id, ChangeLog.entity, ChangeLog.entity_id
+        )
+        removed = (
+            db.query(ChangeLog)
+            .filter(ChangeLog.id.notin_(latest))
+            .delete(synchronize_session=False)
+        )
+
+        floors = (
+            db.query(ChangeLog.user_id, func.max(ChangeLog.id).label("floor"))
+            .filter(ChangeLog.date_created < before)
+            .group_by(ChangeLog.user_id)
+            .all()
+        )
+        for row in floors:
+            db.query(UserVersion).filter(
+                UserVersion.user_id == row.user_id, UserVersion.sync_floor < row.floor
+            ).update({UserVersion.sync_floor: row.floor}, synchronize_session=False)
+        removed += (
+            db.query(ChangeLog)
+            .filter(ChangeLog.date_created < before)
+            .delete(synchronize_session=False)
+        )
+        self.commit(db)
+        return removed
+
+
+change_log = CRUDChangeLog(ChangeLog)
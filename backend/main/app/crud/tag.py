@@ -1,11 +1,15 @@
 """ CRUD operations for Tags. """
 
 from copy import deepcopy
-from typing import List, Optional, TypeVar
+from datetime import datetime
+from typing import List, Optional, Sequence, TypeVar, Union
 
 from app.core.security import get_password_hash
 from app.crud.base import CRUDBase
+from app.crud.task_stat import task_stat
+from app.crud.change_log import change_log
 from app.db.base import Tag
+from app.models.change_log import ChangeEntity, ChangeOp
 from sqlalchemy.orm import Session
 
 TagCreate = TypeVar("TagCreate", bound=dict)
@@ -13,6 +17,45 @@ TagUpdate = TypeVar("TagUpdate", bound=dict)
 
 
 class CRUDTag(CRUDBase[Tag, TagCreate, TagUpdate]):
+    global_ids = True
+
+    def create(self, db: Session, *, obj_in: TagCreate) -> Tag:
+        """Create a new tag
+
+        Args:
+            db (Session): The database session.
+            obj_in (TagCreate): The tag to create.
+
+        Returns:
+            Tag: The created tag.
+        """
+        obj_in = dict(obj_in)
+        self.assign_ids(db, [obj_in])
+        db_obj = Tag(**obj_in)
+        db.add(db_obj)
+        db.flush()
+        change_log.record(
+            db, user_id=db_obj.user_id, entity=ChangeEntity.tag, ids=[db_obj.id]
+        )
+        self.commit(db, db_obj)
+        return db_obj
+
+    def update(self, db: Session, *, db_obj: Tag, obj_in: TagUpdate) -> Tag:
+        """Update a tag
+
+        Args:
+            db (Session): The database session.
+            db_obj (Tag): The tag to update.
+            obj_in (TagUpdate): The updated tag.
+
+        Returns:
+            Tag: The updated tag.
+        """
+        change_log.record(
+            db, user_id=db_obj.user_id, entity=ChangeEntity.tag, ids=[db_obj.id]
+        )
+        return super().update(db, db_obj=db_obj, obj_in=obj_in)
+
     def get(self, db: Session, id: int, user_id: int) -> Optional[Tag]:
         """Get a single object by id
 
@@ -39,17 +82,38 @@ class CRUDTag(CRUDBase[Tag, TagCreate, TagUpdate]):
         """
         return db.query(Tag).filter(Tag.name == name, Tag.user_id == user_id).first()
 
-    def get_multi(self, db: Session, *, user_id: int) -> List[Optional[Tag]]:
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        modified_since: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Union[Tag, dict]]:
         """Get all tags for a user
 
         Args:
             db (Session): The database session.
             user_id (int): The id of the user.
+            modified_since (Optional[datetime], optional): Only return tags
+                updated at or after this time. Defaults to None.
+            fields (Optional[Sequence[str]], optional): Select only these
+                fields and return dictionaries instead of models. Defaults
+                to None.
 
         Returns:
-            List[Optional[Tag]]: The list of tags.
+            List[Union[Tag, dict]]: The list of tags.
         """
-        return db.query(Tag).filter(Tag.user_id == user_id).all()
+        if fields is None:
+            query = db.query(Tag)
+        else:
+            query = self.query_fields(db, fields)
+        query = query.filter(Tag.user_id == user_id)
+        if modified_since is not None:
+            query = query.filter(Tag.date_updated >= modified_since)
+        if fields is None:
+            return query.all()
+        return self.rows_to_fields(query.all(), fields)
 
     def get_multi_id(
         self, db: Session, *, ids: List[int], user_id: int
@@ -80,8 +144,12 @@ class CRUDTag(CRUDBase[Tag, TagCreate, TagUpdate]):
         obj = db.query(Tag).filter(Tag.id == id, Tag.user_id == user_id).first()
         if not obj:
             return None
+        task_stat.remove_tag(db, user_id=user_id, tag_id=id)
+        change_log.record(
+            db, user_id=user_id, entity=ChangeEntity.tag, ids=[id], op=ChangeOp.delete
+        )
         db.delete(obj)
-        db.commit()
+        self.commit(db)
         return obj
 
 
@@ -1,18 +1,184 @@
 """ CRUD Operations for Tasks """
 
+from collections import Counter
 from copy import deepcopy
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from app.core.security import get_password_hash
 from app.crud.base import CRUDBase
+from app.crud.task_stat import task_stat
+from app.crud.task_tag import task_tag
+from app.crud.change_log import change_log
 from app.db.base import Tag, Task, TaskTag
-from sqlalchemy.orm import Session
+from app.db.search import task_search
+from app.models.change_log import ChangeEntity, ChangeOp
+from app.models.task import TaskStatus
+from app.utils.constants import DEFAULT_PAGE_SIZE, EXPORT_CHUNK_SIZE
+from app.utils.pagination import encode_rank_cursor
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Query, Session, selectinload
 
 TaskCreate = TypeVar("TaskCreate", bound=dict)
 TaskUpdate = TypeVar("TaskUpdate", bound=dict)
 
 
 class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
+    global_ids = True
+
+    # Task columns a TaskUpdate can change
+    patch_fields = ("title", "description", "status")
+
+    def patch_values(self, obj_in: TaskUpdate) -> dict:
+        """Get the columns a TaskUpdate sets, every field present in it
+
+        Used by patch and apply_batch alike, so a payload changes the same
+        columns on both paths.
+
+        Args:
+            obj_in (TaskUpdate): The updated fields.
+
+        Returns:
+            dict: The new column values by column name.
+        """
+        return {key: obj_in[key] for key in self.patch_fields if key in obj_in}
+
+    def create(self, db: Session, *, obj_in: TaskCreate) -> Task:
+        """Create a new task and count it in the user's stats
+
+        Args:
+            db (Session): The database session.
+            obj_in (TaskCreate): The task to create.
+
+        Returns:
+            Task: The created task.
+        """
+        obj_in = dict(obj_in)
+        self.assign_ids(db, [obj_in])
+        db_obj = Task(**obj_in)
+        db.add(db_obj)
+        db.flush()
+        status = db_obj.status or TaskStatus.pending
+        task_stat.adjust(db, user_id=db_obj.user_id, statuses={status: 1})
+        change_log.record(
+            db, user_id=db_obj.user_id, entity=ChangeEntity.task, ids=[db_obj.id]
+        )
+        self.commit(db, db_obj)
+        return db_obj
+
+    def update(self, db: Session, *, db_obj: Task, obj_in: TaskUpdate) -> Task:
+        """Update a task and move it between status counters
+
+        Args:
+            db (Session): The database session.
+            db_obj (Task): The task to update.
+            obj_in (TaskUpdate): The updated task.
+
+        Returns:
+            Task: The updated task.
+        """
+        status = obj_in.get("status")
+        if status and status != db_obj.status:
+            task_stat.adjust(
+                db, user_id=db_obj.user_id, statuses={db_obj.status: -1, status: 1}
+            )
+        change_log.record(
+            db, user_id=db_obj.user_id, entity=ChangeEntity.task, ids=[db_obj.id]
+        )
+        return super().update(db, db_obj=db_obj, obj_in=obj_in)
+
+    def patch(
+        self,
+        db: Session,
+        *,
+        db_obj: Task,
+        obj_in: TaskUpdate,
+        tags: Optional[List[Tag]] = None,
+    ) -> dict:
+        """Update the fields of a task and replace its tags in a single
+        transaction
+
+        The task must have been loaded with its tags. Only the fields that
+        differ are written, in one UPDATE that also marks the task updated,
+        and the tags are replaced with one DELETE and one INSERT. Commits
+        once, or not at all if nothing changed.
+
+        Args:
+            db (Session): The database session.
+            db_obj (Task): The task, with its tags loaded.
+            obj_in (TaskUpdate): The updated fields.
+            tags (Optional[List[Tag]], optional): The new tags of the task,
+                owned by its user. Defaults to None, keeping the tags.
+
+        Returns:
+            dict: The updated task with its tags, built without reloading it.
+        """
+        user_id = db_obj.user_id
+        values = {
+            key: value
+            for key, value in self.patch_values(obj_in).items()
+            if value != getattr(db_obj, key)
+        }
+        current = {tag.id: tag for tag in db_obj.tags}
+        new_tags = current if tags is None else {tag.id: tag for tag in tags}
+
+        removed, added = [], []
+        if new_tags.keys() != current.keys():
+            removed, added = task_tag.replace(
+                db, task_id=db_obj.id, tag_ids=list(new_tags), current=list(current)
+            )
+
+        entries = []
+        if values:
+            entries.append((ChangeEntity.task, db_obj.id))
+        if removed or added:
+            entries.append((ChangeEntity.task_tags, db_obj.id))
+        if entries:
+            statuses = None
+            if "status" in values:
+                statuses = {db_obj.status: -1, values["status"]: 1}
+            tag_deltas = Counter(added)
+            tag_deltas.subtract(removed)
+            task_stat.adjust(db, user_id=user_id, statuses=statuses, tags=tag_deltas)
+            change_log.record_entries(db, user_id=user_id, entries=entries)
+            values["date_updated"] = datetime.utcnow()
+            for key, value in values.items():
+                setattr(db_obj, key, value)
+
+        data = db_obj.dict()
+        data["tags"] = [tag.dict() for _, tag in sorted(new_tags.items())]
+        if entries:
+            self.commit(db)
+        return data
+
+    def query_with_tags(self, db: Session) -> Query:
+        """Query tasks with their tags batch loaded
+
+        Tags of every task in the result are fetched in one additional
+        SELECT ... WHERE task_id IN (...), so the number of queries does not
+        grow with the number of tasks.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            Query: The task query.
+        """
+        return db.query(Task).options(selectinload(Task.tags))
+
     def get_by_id(self, db: Session, *, id: int, user_id: int) -> Optional[Task]:
         """Get a single object by id
 
@@ -24,59 +190,193 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
         Returns:
             Optional[ModelType]: The object if found, else None.
         """
-        return db.query(Task).filter(Task.id == id, Task.user_id == user_id).first()
+        return (
+            self.query_with_tags(db)
+            .filter(Task.id == id, Task.user_id == user_id)
+            .first()
+        )
+
+    def query_listing(self, db: Session, fields: Optional[Sequence[str]]) -> Query:
+        """Query tasks for a listing, as models with their tags or, when
+        fields are selected, as rows of only the columns needed
+
+        Args:
+            db (Session): The database session.
+            fields (Optional[Sequence[str]]): The selected fields, None for
+                models.
+
+        Returns:
+            Query: The task query.
+        """
+        if fields is None:
+            return self.query_with_tags(db)
+        return self.query_fields(db, fields)
+
+    def load_listing(
+        self, db: Session, items: List[Any], fields: Optional[Sequence[str]]
+    ) -> List[Union[Task, dict]]:
+        """Convert the rows of query_listing to dictionaries of the selected
+        fields, loading the tags if they are selected
+
+        Args:
+            db (Session): The database session.
+            items (List[Any]): The models or rows.
+            fields (Optional[Sequence[str]]): The selected fields, None for
+                models.
+
+        Returns:
+            List[Union[Task, dict]]: The models, or the rows as dictionaries.
+        """
+        if fields is None:
+            return items
+        tasks = self.rows_to_fields(items, fields)
+        if "tags" in fields:
+            tags = self.get_tags_by_task(db, task_ids=[task["id"] for task in tasks])
+            for task in tasks:
+                task["tags"] = tags.get(task["id"], [])
+        return tasks
+
+    def get_tags_by_task(
+        self, db: Session, *, task_ids: List[int]
+    ) -> Dict[int, List[dict]]:
+        """Get the tags of tasks as dictionaries, in one query
+
+        Args:
+            db (Session): The database session.
+            task_ids (List[int]): The ids of the tasks.
+
+        Returns:
+            Dict[int, List[dict]]: The tags of every task that has any, by
+                task id, ordered by tag id.
+        """
+        if not task_ids:
+            return {}
+        rows = (
+            db.query(TaskTag.task_id, *Tag.columns())
+            .join(Tag, Tag.id == TaskTag.tag_id)
+            .filter(TaskTag.task_id.in_(task_ids))
+            .order_by(Tag.id)
+            .all()
+        )
+        tags: Dict[int, List[dict]] = {}
+        for tag in Tag.rows_to_dicts(rows):
+            tags.setdefault(tag.pop("task_id"), []).append(tag)
+        return tags
 
-    def get_multi(self, db: Session, *, user_id: int) -> List[Optional[Task]]:
-        """Get all tasks for a user
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        modified_since: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Union[Task, dict]], Optional[str]]:
+        """Get a page of tasks for a user
 
         Args:
             db (Session): The database session.
             user_id (int): The id of the user.
+            limit (int, optional): The page size. Defaults to DEFAULT_PAGE_SIZE.
+            cursor (Optional[Tuple[datetime, int]], optional): The decoded
+                position to continue after. Defaults to None.
+            modified_since (Optional[datetime], optional): Only return tasks
+                updated at or after this time. Defaults to None.
+            fields (Optional[Sequence[str]], optional): Select only these
+                fields and return dictionaries instead of models. Defaults
+                to None.
 
         Returns:
-            List[Optional[Task]]: The list of tasks.
+            Tuple[List[Union[Task, dict]], Optional[str]]: The list of tasks
+                and the cursor of the next page.
         """
-        return db.query(Task).filter(Task.user_id == user_id).all()
+        query = self.query_listing(db, fields).filter(Task.user_id == user_id)
+        if modified_since is not None:
+            query = query.filter(Task.date_updated >= modified_since)
+        items, next_cursor = self.paginate(query, limit=limit, cursor=cursor)
+        return self.load_listing(db, items, fields), next_cursor
 
     def get_multi_by_status(
-        self, db: Session, *, status: str, user_id: int
-    ) -> List[Optional[Task]]:
-        """Get all tasks for a user by status
+        self,
+        db: Session,
+        *,
+        status: str,
+        user_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        modified_since: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Union[Task, dict]], Optional[str]]:
+        """Get a page of tasks for a user by status
 
         Args:
             db (Session): The database session.
             status (str): The status of the task.
             user_id (int): The id of the user.
+            limit (int, optional): The page size. Defaults to DEFAULT_PAGE_SIZE.
+            cursor (Optional[Tuple[datetime, int]], optional): The decoded
+                position to continue after. Defaults to None.
+            modified_since (Optional[datetime], optional): Only return tasks
+                updated at or after this time. Defaults to None.
+            fields (Optional[Sequence[str]], optional): Select only these
+                fields and return dictionaries instead of models. Defaults
+                to None.
 
         Returns:
-            List[Optional[Task]]: The list of tasks.
+            Tuple[List[Union[Task, dict]], Optional[str]]: The list of tasks
+                and the cursor of the next page.
         """
-        return (
-            db.query(Task).filter(Task.status == status, Task.user_id == user_id).all()
+        query = self.query_listing(db, fields).filter(
+            Task.status == status, Task.user_id == user_id
         )
+        if modified_since is not None:
+            query = query.filter(Task.date_updated >= modified_since)
+        items, next_cursor = self.paginate(query, limit=limit, cursor=cursor)
+        return self.load_listing(db, items, fields), next_cursor
 
     def get_multi_by_tag(
-        self, db: Session, *, tag_id: int, user_id: int
-    ) -> List[Optional[Task]]:
-        """Get all tasks for a user by tag
+        self,
+        db: Session,
+        *,
+        tag_id: int,
+        user_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        modified_since: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Union[Task, dict]], Optional[str]]:
+        """Get a page of tasks for a user by tag
 
         Args:
             db (Session): The database session.
             tag_id (int): The id of the tag.
             user_id (int): The id of the user.
+            limit (int, optional): The page size. Defaults to DEFAULT_PAGE_SIZE.
+            cursor (Optional[Tuple[datetime, int]], optional): The decoded
+                position to continue after. Defaults to None.
+            modified_since (Optional[datetime], optional): Only return tasks
+                updated at or after this time. Defaults to None.
+            fields (Optional[Sequence[str]], optional): Select only these
+                fields and return dictionaries instead of models. Defaults
+                to None.
 
         Returns:
-            List[Optional[Task]]: The list of tasks.
+            Tuple[List[Union[Task, dict]], Optional[str]]: The list of tasks
+                and the cursor of the next page.
         """
-        return (
-            db.query(Task)
+        query = (
+            self.query_listing(db, fields)
             .filter(Task.user_id == user_id)
             .join(TaskTag)
             .filter(TaskTag.tag_id == tag_id)
             .join(Tag)
             .filter(Tag.user_id == user_id, Tag.id == tag_id)
-            .all()
         )
+        if modified_since is not None:
+            query = query.filter(Task.date_updated >= modified_since)
+        items, next_cursor = self.paginate(query, limit=limit, cursor=cursor)
+        return self.load_listing(db, items, fields), next_cursor
 
     def remove(self, db: Session, *, id: int, user_id: int) -> Task:
         """Remove a task
@@ -92,9 +392,287 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
         obj = db.query(Task).filter(Task.id == id, Task.user_id == user_id).first()
         if not obj:
             return None
+        tag_ids = db.query(TaskTag.tag_id).filter(TaskTag.task_id == id)
+        task_stat.adjust(
+            db,
+            user_id=user_id,
+            statuses={obj.status: -1},
+            tags={row.tag_id: -1 for row in tag_ids},
+        )
+        change_log.record(
+            db, user_id=user_id, entity=ChangeEntity.task, ids=[id], op=ChangeOp.delete
+        )
         db.delete(obj)
-        db.commit()
+        self.commit(db)
         return obj
 
+    def search(
+        self,
+        db: Session,
+        *,
+        q: str,
+        user_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Tuple[float, int]] = None,
+    ) -> Tuple[List[Optional[Task]], Optional[str]]:
+        """Full-text search the title and description of a user's tasks
+
+        Results are ordered by rank, best first, and paginated on (rank, id).
+
+        Args:
+            db (Session): The database session.
+            q (str): The search string.
+            user_id (int): The id of the user.
+            limit (int, optional): The page size. Defaults to DEFAULT_PAGE_SIZE.
+            cursor (Optional[Tuple[float, int]], optional): The decoded
+                position to continue after. Defaults to None.
+
+        Returns:
+            Tuple[List[Optional[Task]], Optional[str]]: The list of tasks and the
+                cursor of the next page.
+        """
+        matches = task_search(db.get_bind().dialect.name, q=q, user_id=user_id)
+        query = (
+            self.query_with_tags(db)
+            .join(matches, matches.c.id == Task.id)
+            .add_columns(matches.c.rank)
+            .filter(Task.user_id == user_id)
+        )
+        if cursor is not None:
+            rank, id = cursor
+            query = query.filter(
+                or_(matches.c.rank < rank, and_(matches.c.rank == rank, Task.id > id))
+            )
+        rows = query.order_by(matches.c.rank.desc(), Task.id).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_rank_cursor(rows[-1].rank, rows[-1].Task.id)
+        return [row.Task for row in rows], next_cursor
+
+    def stream_multi(
+        self, db: Session, *, user_id: int, chunk_size: int = EXPORT_CHUNK_SIZE
+    ) -> Iterator[Task]:
+        """Stream all tasks of a user through a server-side cursor
+
+        Rows are fetched chunk_size at a time, with the tags of each chunk
+        batch loaded, so memory does not grow with the number of tasks.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            chunk_size (int, optional): The rows fetched per round trip.
+                Defaults to EXPORT_CHUNK_SIZE.
+
+        Returns:
+            Iterator[Task]: The tasks ordered by (date_created, id).
+        """
+        return (
+            self.query_with_tags(db)
+            .filter(Task.user_id == user_id)
+            .order_by(Task.date_created, Task.id)
+            .yield_per(chunk_size)
+        )
+
+    def get_owned_ids(self, db: Session, *, ids: List[int], user_id: int) -> Set[int]:
+        """Get the ids among the given ones that belong to a user
+
+        Args:
+            db (Session): The database session.
+            ids (List[int]): The list of task ids.
+            user_id (int): The id of the user.
+
+        Returns:
+            Set[int]: The ids of the user's tasks.
+        """
+        if not ids:
+            return set()
+        rows = db.query(Task.id).filter(Task.id.in_(ids), Task.user_id == user_id)
+        return set([row.id for row in rows])
+
+    def insert_multi(self, db: Session, *, rows: List[dict]) -> List[dict]:
+        """Insert tasks with a single multi-row INSERT ... RETURNING
+
+        Every row gets its id before the INSERT, since RETURNING does not
+        keep the order of the VALUES. Does not commit.
+
+        Args:
+            db (Session): The database session.
+            rows (List[dict]): The column values of each task.
+
+        Returns:
+            List[dict]: The inserted tasks, in the order of rows.
+        """
+        self.assign_ids(db, rows)
+        if db.get_bind().dialect.name == "postgresql":
+            self.assign_serial_ids(db, rows)
+            result = db.execute(
+                insert(Task).values(rows).returning(*Task.__table__.columns)
+            )
+            inserted = {row.id: dict(row._mapping) for row in result}
+            return [inserted[row["id"]] for row in rows]
+
+        # Other dialects insert through the unit of work, which sets each
+        # object's own id
+        db_objs = [Task(**row) for row in rows]
+        db.add_all(db_objs)
+        db.flush()
+        return [dict(row, id=db_obj.id) for row, db_obj in zip(rows, db_objs)]
+
+    def apply_batch(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        creates: List[dict],
+        patches: Dict[int, dict],
+        deletes: List[int],
+    ) -> Tuple[List[dict], List[Task]]:
+        """Create, update and delete tasks in one transaction. Creates are one
+        multi-row INSERT and deletes set-based DELETEs; updates go through
+        bulk_update_mappings, which runs an executemany UPDATE per distinct
+        set of changed columns rather than a single set-based UPDATE. Task
+        ownership and tags must be validated by the caller.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            creates (List[dict]): The TaskCreate data of each new task.
+            patches (Dict[int, dict]): The TaskUpdate data by task id.
+            deletes (List[int]): The ids of the tasks to delete.
+
+        Returns:
+            Tuple[List[dict], List[Task]]: The created tasks, in the order of
+                creates, and the updated tasks with their tags.
+        """
+        now = datetime.utcnow()
+        links = []
+        statuses = Counter()
+        tags = Counter()
+
+        # Current status and tag links of the tasks being changed
+        tag_sets = {
+            id: set(data["tags"]) for id, data in patches.items() if data.get("tags")
+        }
+        old_statuses = {}
+        existing = set()
+        if patches or deletes:
+            rows = db.query(Task.id, Task.status).filter(
+                Task.id.in_(list(patches) + deletes), Task.user_id == user_id
+            )
+            old_statuses = {row.id: row.status for row in rows}
+        if tag_sets or deletes:
+            rows = db.query(TaskTag.task_id, TaskTag.tag_id).filter(
+                TaskTag.task_id.in_(list(tag_sets) + deletes)
+            )
+            existing = set([(row.task_id, row.tag_id) for row in rows])
+
+        # One multi-row INSERT for every new task
+        created = []
+        if creates:
+            created = self.insert_multi(
+                db,
+                rows=[
+                    {
+                        "title": data["title"],
+                        "description": data["description"],
+                        "status": TaskStatus.pending,
+                        "user_id": user_id,
+                        "date_created": now,
+                        "date_updated": now,
+                    }
+                    for data in creates
+                ],
+            )
+            statuses[TaskStatus.pending] += len(created)
+            for task, data in zip(created, creates):
+                links += [
+                    {"task_id": task["id"], "tag_id": tag_id, "date_created": now}
+                    for tag_id in dict.fromkeys(data.get("tags") or [])
+                ]
+
+        # One executemany UPDATE per distinct set of changed columns
+        mappings = []
+        for id, data in patches.items():
+            values = self.patch_values(data)
+            if values or data.get("tags"):
+                mappings.append(dict(values, id=id, date_updated=now))
+            if "status" in values and values["status"] != old_statuses[id]:
+                statuses[old_statuses[id]] -= 1
+                statuses[values["status"]] += 1
+        if mappings:
+            db.bulk_update_mappings(Task, mappings)
+
+        # Replace the tags of patched tasks that provide them
+        if tag_sets:
+            removed = [
+                (id, tag_id)
+                for id, tag_id in existing
+                if id in tag_sets and tag_id not in tag_sets[id]
+            ]
+            if removed:
+                db.query(TaskTag).filter(
+                    or_(
+                        *[
+                            and_(TaskTag.task_id == id, TaskTag.tag_id == tag_id)
+                            for id, tag_id in removed
+                        ]
+                    )
+                ).delete(synchronize_session=False)
+            tags.subtract([tag_id for _, tag_id in removed])
+            links += [
+                {"task_id": id, "tag_id": tag_id, "date_created": now}
+                for id, tag_ids in tag_sets.items()
+                for tag_id in tag_ids
+                if (id, tag_id) not in existing
+            ]
+
+        if links:
+            db.execute(insert(TaskTag).values(links))
+            tags.update([link["tag_id"] for link in links])
+
+        if deletes:
+            db.query(TaskTag).filter(TaskTag.task_id.in_(deletes)).delete(
+                synchronize_session=False
+            )
+            db.query(Task).filter(Task.id.in_(deletes), Task.user_id == user_id).delete(
+                synchronize_session=False
+            )
+            statuses.subtract([old_statuses[id] for id in deletes])
+            tags.subtract([tag_id for id, tag_id in existing if id in deletes])
+
+        task_stat.adjust(db, user_id=user_id, statuses=statuses, tags=tags)
+        change_log.record(
+            db,
+            user_id=user_id,
+            entity=ChangeEntity.task,
+            ids=[task["id"] for task in created] + list(patches),
+        )
+        change_log.record(
+            db,
+            user_id=user_id,
+            entity=ChangeEntity.task_tags,
+            ids=[task["id"] for task, data in zip(created, creates) if data.get("tags")]
+            + list(tag_sets),
+        )
+        change_log.record(
+            db,
+            user_id=user_id,
+            entity=ChangeEntity.task,
+            ids=deletes,
+            op=ChangeOp.delete,
+        )
+        self.commit(db)
+
+        patched = []
+        if patches:
+            patched = (
+                self.query_with_tags(db)
+                .filter(Task.id.in_(list(patches)), Task.user_id == user_id)
+                .all()
+            )
+        return created, patched
+
 
 task = CRUDTask(Task)
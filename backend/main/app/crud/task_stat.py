@@ -0,0 +1,164 @@
+""" CRUD operations for Task Stats. """
+
+from typing import Dict, Optional, TypeVar
+
+from app.crud.base import UPSERT_DIALECTS, CRUDBase
+from app.db.base import Tag, Task, TaskStat, TaskTag
+from app.models.task import TaskStatus
+from sqlalchemy import String, cast, func, insert, literal
+from sqlalchemy.orm import Session
+
+TaskStatCreate = TypeVar("TaskStatCreate", bound=dict)
+TaskStatUpdate = TypeVar("TaskStatUpdate", bound=dict)
+
+
+class CRUDTaskStat(CRUDBase[TaskStat, TaskStatCreate, TaskStatUpdate]):
+    def adjust(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        statuses: Optional[Dict[str, int]] = None,
+        tags: Optional[Dict[int, int]] = None,
+    ) -> None:
+        """Add deltas to a user's counters. Does not commit, so the change
+        is part of the caller's transaction.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            statuses (Optional[Dict[str, int]], optional): Deltas by status.
+            tags (Optional[Dict[int, int]], optional): Deltas by tag id.
+        """
+        rows = [
+            {
+                "user_id": user_id,
+                "dimension": "status",
+                "value": str(key),
+                "count": delta,
+            }
+            for key, delta in (statuses or {}).items()
+            if delta
+        ] + [
+            {"user_id": user_id, "dimension": "tag", "value": str(key), "count": delta}
+            for key, delta in (tags or {}).items()
+            if delta
+        ]
+        if not rows:
+            return
+
+        upsert = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+        if upsert is not None:
+            stmt = upsert(TaskStat).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "dimension", "value"],
+                set_={"count": TaskStat.count + stmt.excluded["count"]},
+            )
+            db.execute(stmt)
+            return
+
+        for row in rows:
+            updated = (
+                db.query(TaskStat)
+                .filter(
+                    TaskStat.user_id == row["user_id"],
+                    TaskStat.dimension == row["dimension"],
+                    TaskStat.value == row["value"],
+                )
+                .update(
+                    {TaskStat.count: TaskStat.count + row["count"]},
+                    synchronize_session=False,
+                )
+            )
+            if not updated:
+                db.execute(insert(TaskStat).values(row))
+
+    def remove_tag(self, db: Session, *, user_id: int, tag_id: int) -> None:
+        """Drop the counter of a deleted tag. Does not commit.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+            tag_id (int): The id of the tag.
+        """
+        db.query(TaskStat).filter(
+            TaskStat.user_id == user_id,
+            TaskStat.dimension == "tag",
+            TaskStat.value == str(tag_id),
+        ).delete(synchronize_session=False)
+
+    def get_counts(self, db: Session, *, user_id: int) -> dict:
+        """Get a user's task counts per status and per tag
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+
+        Returns:
+            dict: The total, the counts by status and the counts by tag.
+        """
+        statuses = {status.value: 0 for status in TaskStatus}
+        for stat in db.query(TaskStat).filter(
+            TaskStat.user_id == user_id, TaskStat.dimension == "status"
+        ):
+            statuses[stat.value] = stat.count
+
+        tags = (
+            db.query(Tag.id, Tag.name, TaskStat.count)
+            .join(TaskStat, TaskStat.value == cast(Tag.id, String))
+            .filter(
+                TaskStat.user_id == user_id,
+                TaskStat.dimension == "tag",
+                Tag.user_id == user_id,
+                TaskStat.count > 0,
+            )
+            .order_by(Tag.id)
+        )
+        return {
+            "total": sum(statuses.values()),
+            "status": statuses,
+            "tags": [
+                {"tag_id": tag.id, "name": tag.name, "count": tag.count} for tag in tags
+            ],
+        }
+
+    def rebuild(self, db: Session, *, user_id: Optional[int] = None) -> None:
+        """Recompute the counters from the task and task_tag tables
+
+        Args:
+            db (Session): The database session.
+            user_id (Optional[int], optional): Only rebuild this user's
+                counters. Defaults to None, rebuilding every user.
+        """
+        stats = db.query(TaskStat)
+        if user_id is not None:
+            stats = stats.filter(TaskStat.user_id == user_id)
+        stats.delete(synchronize_session=False)
+
+        columns = ["user_id", "dimension", "value", "count"]
+        by_status = db.query(
+            Task.user_id,
+            literal("status"),
+            cast(Task.status, String),
+            func.count(Task.id),
+        ).group_by(Task.user_id, Task.status)
+        by_tag = (
+            db.query(
+                Tag.user_id,
+                literal("tag"),
+                cast(TaskTag.tag_id, String),
+                func.count(TaskTag.id),
+            )
+            .join(Tag, Tag.id == TaskTag.tag_id)
+            .group_by(Tag.user_id, TaskTag.tag_id)
+        )
+        if user_id is not None:
+            by_status = by_status.filter(Task.user_id == user_id)
+            by_tag = by_tag.filter(Tag.user_id == user_id)
+
+        db.execute(insert(TaskStat).from_select(columns, by_status))
+        db.execute(insert(TaskStat).from_select(columns, by_tag))
+        self.commit(db)
+
+
+task_stat = CRUDTaskStat(TaskStat)
@@ -1,11 +1,16 @@
 """ CRUD operations for Task Tags. """
 
 from copy import deepcopy
-from typing import List, TypeVar
+from datetime import datetime
+from typing import Collection, List, Tuple, TypeVar
 
 from app.core.security import get_password_hash
-from app.crud.base import CRUDBase
-from app.db.base import TaskTag
+from app.crud.base import UPSERT_DIALECTS, CRUDBase
+from app.crud.task_stat import task_stat
+from app.crud.change_log import change_log
+from app.db.base import Task, TaskTag
+from app.models.change_log import ChangeEntity
+from sqlalchemy import delete, insert
 from sqlalchemy.orm import Session
 
 TaskTagCreate = TypeVar("TaskTagCreate", bound=dict)
@@ -14,7 +19,7 @@ TaskTagUpdate = TypeVar("TaskTagUpdate", bound=dict)
 
 class CRUDTaskTag(CRUDBase[TaskTag, TaskTagCreate, TaskTagUpdate]):
     def create_multi(
-        self, db: Session, *, obj_in: List[int], task_id: int
+        self, db: Session, *, obj_in: List[int], task_id: int, user_id: int
     ) -> List[TaskTag]:
         """Create multiple task tags.
 
@@ -22,6 +27,7 @@ class CRUDTaskTag(CRUDBase[TaskTag, TaskTagCreate, TaskTagUpdate]):
             db (Session): The database session.
             obj_in (List[int]): The list of tag ids.
             task_id (int): The id of the task.
+            user_id (int): The id of the user owning the task.
 
         Returns:
             List[TaskTag]: The list of task tags.
@@ -31,7 +37,85 @@ class CRUDTaskTag(CRUDBase[TaskTag, TaskTagCreate, TaskTagUpdate]):
         obj_in = [{"tag_id": tag_id, "task_id": task_id} for tag_id in obj_in]
         db_objs = [self.model(**obj_in_item) for obj_in_item in obj_in]
         db.bulk_save_objects(db_objs)
-        db.commit()
+        task_stat.adjust(
+            db, user_id=user_id, tags={item["tag_id"]: 1 for item in obj_in}
+        )
+        self.touch_task(db, task_id=task_id, user_id=user_id)
+        self.commit(db)
+
+    def touch_task(self, db: Session, *, task_id: int, user_id: int) -> None:
+        """Mark a task as updated after its tags changed. Does not commit.
+
+        Args:
+            db (Session): The database session.
+            task_id (int): The id of the task.
+            user_id (int): The id of the user owning the task.
+        """
+        # Also set on a loaded task, which a unit of work does not expire
+        db.query(Task).filter(Task.id == task_id).update(
+            {Task.date_updated: datetime.utcnow()}, synchronize_session="evaluate"
+        )
+        change_log.record(
+            db, user_id=user_id, entity=ChangeEntity.task_tags, ids=[task_id]
+        )
+
+    def replace(
+        self,
+        db: Session,
+        *,
+        task_id: int,
+        tag_ids: Collection[int],
+        current: Collection[int],
+    ) -> Tuple[List[int], List[int]]:
+        """Replace the tags of a task with one DELETE of the links outside
+        tag_ids and one INSERT ... ON CONFLICT DO NOTHING of the missing
+        ones. Does not commit, count or record the change.
+
+        Args:
+            db (Session): The database session.
+            task_id (int): The id of the task.
+            tag_ids (Collection[int]): The new tag ids.
+            current (Collection[int]): The tag ids currently linked, as last
+                read by the caller. A statement is skipped when it has
+                nothing to do.
+
+        Returns:
+            Tuple[List[int], List[int]]: The removed and the added tag ids,
+                as reported by RETURNING where the dialect supports it.
+        """
+        dialect = db.get_bind().dialect
+        removed = [tag_id for tag_id in current if tag_id not in tag_ids]
+        added = [tag_id for tag_id in tag_ids if tag_id not in current]
+
+        if removed:
+            stmt = delete(TaskTag).where(
+                TaskTag.task_id == task_id, TaskTag.tag_id.notin_(list(tag_ids))
+            )
+            if dialect.full_returning:
+                result = db.execute(stmt.returning(TaskTag.tag_id))
+                removed = [row.tag_id for row in result]
+            else:
+                db.execute(stmt)
+
+        if added:
+            now = datetime.utcnow()
+            rows = [
+                {"task_id": task_id, "tag_id": tag_id, "date_created": now}
+                for tag_id in added
+            ]
+            upsert = UPSERT_DIALECTS.get(dialect.name)
+            if upsert is None:
+                db.execute(insert(TaskTag).values(rows))
+                return removed, added
+            # Links added concurrently are left alone, on task_tag_unique
+            stmt = upsert(TaskTag).values(rows)
+            stmt = stmt.on_conflict_do_nothing(index_elements=["task_id", "tag_id"])
+            if dialect.full_returning:
+                result = db.execute(stmt.returning(TaskTag.tag_id))
+                added = [row.tag_id for row in result]
+            else:
+                db.execute(stmt)
+        return removed, added
 
     def get_multi(self, db: Session, *, task_id: int) -> List[TaskTag]:
         """Get all task tags for a task.
@@ -46,7 +130,7 @@ class CRUDTaskTag(CRUDBase[TaskTag, TaskTagCreate, TaskTagUpdate]):
         return db.query(TaskTag).filter(TaskTag.task_id == task_id).all()
 
     def delete_multi(
-        self, db: Session, *, task_id: int, tag_ids: List[int]
+        self, db: Session, *, task_id: int, tag_ids: List[int], user_id: int
     ) -> List[TaskTag]:
         """Delete multiple task tags.
 
@@ -54,14 +138,22 @@ class CRUDTaskTag(CRUDBase[TaskTag, TaskTagCreate, TaskTagUpdate]):
             db (Session): The database session.
             task_id (int): The id of the task.
             tag_ids (List[int]): The list of tag ids.
+            user_id (int): The id of the user owning the task.
 
         Returns:
             List[TaskTag]: The list of task tags.
         """
-        db.query(TaskTag).filter(
+        if not tag_ids:
+            return []
+        query = db.query(TaskTag).filter(
             TaskTag.task_id == task_id, TaskTag.tag_id.in_(tag_ids)
-        ).delete(synchronize_session=False)
-        db.commit()
+        )
+        # Only count the links that actually exist
+        deleted = [row.tag_id for row in query.with_entities(TaskTag.tag_id)]
+        query.delete(synchronize_session=False)
+        task_stat.adjust(db, user_id=user_id, tags={tag_id: -1 for tag_id in deleted})
+        self.touch_task(db, task_id=task_id, user_id=user_id)
+        self.commit(db)
 
 
 task_tag = CRUDTaskTag(TaskTag)
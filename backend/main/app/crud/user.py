@@ -1,11 +1,15 @@
 """ CRUD Operations for User. """
 
+import secrets
 from copy import deepcopy
 from typing import Any, Dict, Optional, TypeVar, Union
 
 from app.core.security import get_password_hash
 from app.crud.base import CRUDBase
+from app.crud.user_shard import user_shard
+from app.crud.user_version import user_version
 from app.db.base import User
+from app.db.shard import shard_session
 from sqlalchemy.orm import Session
 
 UserCreate = TypeVar("UserCreate", bound=dict)
@@ -14,10 +18,10 @@ UserUpdate = TypeVar("UserUpdate", bound=dict)
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     def create(self, db: Session, *, obj_in: UserCreate) -> User:
-        """Create a new user.
+        """Create a new user on the shard the shard map assigns it.
 
         Args:
-            db (Session): The database session.
+            db (Session): A session on the first shard.
             obj_in (UserCreate): The user object.
 
         Returns:
@@ -25,9 +29,19 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         """
         create_data = deepcopy(obj_in)
         create_data["hashed_password"] = get_password_hash(create_data.pop("password"))
+        create_data["session_secret"] = secrets.token_hex(16)
+        entry = user_shard.allocate(db, email=create_data["email"])
+        create_data["id"] = entry.id
         db_obj = self.model(**create_data)
-        db.add(db_obj)
-        db.commit()
+        with shard_session(entry.shard, db) as shard_db:
+            shard_db.add(db_obj)
+            shard_db.flush()
+            # Replicas serve the user's reads once they have a version
+            user_version.bump(shard_db, user_id=db_obj.id)
+            if shard_db is not db:
+                # The user exists before the shard map points at it
+                self.commit(shard_db, db_obj)
+        self.commit(db)
         return db_obj
 
     def update(
@@ -35,6 +49,10 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     ) -> User:
         """Update a user.
 
+        A new password also replaces the session secret, ending the user's
+        sessions. A new hashed_password alone, e.g. a rehash at login, keeps
+        them.
+
         Args:
             db (Session): The database session.
             db_obj (User): The user object.
@@ -48,6 +66,9 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             update_data["hashed_password"] = get_password_hash(
                 update_data.pop("password")
             )
+            update_data["session_secret"] = secrets.token_hex(16)
+        # Keeps the user's reads off replicas without the change
+        user_version.bump(db, user_id=db_obj.id)
         return super().update(db, db_obj=db_obj, obj_in=update_data)
 
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
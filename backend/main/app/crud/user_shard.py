@@ -0,0 +1,77 @@
+""" CRUD operations for the User Shard map. """
+
+from typing import Optional, TypeVar
+
+from app.crud.base import CRUDBase
+from app.db.base import UserShard
+from app.db.shard import get_shard_urls
+from sqlalchemy.orm import Session
+
+UserShardCreate = TypeVar("UserShardCreate", bound=dict)
+UserShardUpdate = TypeVar("UserShardUpdate", bound=dict)
+
+
+class CRUDUserShard(CRUDBase[UserShard, UserShardCreate, UserShardUpdate]):
+    def get_by_email(self, db: Session, *, email: str) -> Optional[UserShard]:
+        """Get the shard map entry of a user by email
+
+        Args:
+            db (Session): A session on the first shard.
+            email (str): The user's email.
+
+        Returns:
+            Optional[UserShard]: The entry if found, else None.
+        """
+        return db.query(UserShard).filter(UserShard.email == email).first()
+
+    def allocate(self, db: Session, *, email: str) -> UserShard:
+        """Allocate the id of a new user and place it on a shard. Does not
+        commit, the user is created on its shard before the entry commits.
+
+        Args:
+            db (Session): A session on the first shard.
+            email (str): The user's email.
+
+        Returns:
+            UserShard: The entry, whose id is the user's.
+        """
+        db_obj = UserShard(email=email, shard=0)
+        db.add(db_obj)
+        db.flush()
+        shards = len(get_shard_urls())
+        if shards > 1:
+            # New users are spread evenly, move_user rebalances them later
+            db_obj.shard = db_obj.id % shards
+        return db_obj
+
+    def set_target(
+        self, db: Session, *, user_id: int, target_shard: Optional[int]
+    ) -> None:
+        """Start or cancel moving a user to another shard
+
+        Args:
+            db (Session): A session on the first shard.
+            user_id (int): The id of the user.
+            target_shard (Optional[int]): The shard the user moves to, None
+                to cancel the move.
+        """
+        db.query(UserShard).filter(UserShard.id == user_id).update(
+            {UserShard.target_shard: target_shard}, synchronize_session=False
+        )
+        self.commit(db)
+
+    def finish_move(self, db: Session, *, user_id: int) -> None:
+        """Point a user at the shard it was moved to
+
+        Args:
+            db (Session): A session on the first shard.
+            user_id (int): The id of the user.
+        """
+        db.query(UserShard).filter(UserShard.id == user_id).update(
+            {UserShard.shard: UserShard.target_shard, UserShard.target_shard: None},
+            synchronize_session=False,
+        )
+        self.commit(db)
+
+
+user_shard = CRUDUserShard(UserShard)
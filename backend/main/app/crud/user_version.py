@@ -0,0 +1,62 @@
+""" CRUD operations for User Versions. """
+
+from typing import TypeVar
+
+from app.crud.base import UPSERT_DIALECTS, CRUDBase
+from app.db.base import UserVersion
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+UserVersionCreate = TypeVar("UserVersionCreate", bound=dict)
+UserVersionUpdate = TypeVar("UserVersionUpdate", bound=dict)
+
+
+class CRUDUserVersion(CRUDBase[UserVersion, UserVersionCreate, UserVersionUpdate]):
+    def get_version(self, db: Session, *, user_id: int) -> int:
+        """Get the data version of a user
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+
+        Returns:
+            int: The version, 0 if the user never changed anything.
+        """
+        version = (
+            db.query(UserVersion.version)
+            .filter(UserVersion.user_id == user_id)
+            .scalar()
+        )
+        return version or 0
+
+    def bump(self, db: Session, *, user_id: int) -> None:
+        """Increment the data version of a user. Does not commit, so the
+        change is part of the caller's transaction.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The id of the user.
+        """
+        upsert = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+        if upsert is not None:
+            stmt = upsert(UserVersion).values(user_id=user_id, version=1)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"version": UserVersion.version + 1},
+            )
+            db.execute(stmt)
+            return
+
+        updated = (
+            db.query(UserVersion)
+            .filter(UserVersion.user_id == user_id)
+            .update(
+                {UserVersion.version: UserVersion.version + 1},
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            db.execute(insert(UserVersion).values(user_id=user_id, version=1))
+
+
+user_version = CRUDUserVersion(UserVersion)
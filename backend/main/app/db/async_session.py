@@ -0,0 +1,248 @@
+""" SQLAlchemy asyncio session management.
+
+Used when DATABASE_ASYNC is enabled. Each worker process runs one event loop
+in a daemon thread. Views keep running on their request threads and only
+hand their database I/O to the loop: every awaitable of the asyncio driver
+is awaited on the loop while the request thread waits for it, so the I/O of
+every in-flight request is multiplexed over a single asyncpg (or aiosqlite)
+connection pool, while CPU work and other blocking waits, e.g. password
+hashing, never hold up the loop or the other requests.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from typing import Any, Awaitable, Callable, Coroutine, Optional
+
+import greenlet
+from app.core.config import settings
+from app.db.replica import get_replica_urls
+from app.db.session import EngineGroup, SessionLocal, connection_uri
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine.url import URL
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util._concurrency_py3k import _AsyncIoGreenlet
+from sqlalchemy.util.queue import AsyncAdaptedQueue
+
+# asyncio drivers of the supported backends
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def get_async_url(uri: str = connection_uri) -> URL:
+    """Get the asyncio driver URL of a connection URI
+
+    Args:
+        uri (str, optional): The connection URI. Defaults to the configured one.
+
+    Raises:
+        ValueError: If the backend has no supported asyncio driver.
+
+    Returns:
+        URL: The URL using the asyncio driver.
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def create_async_db_engine(uri: str = connection_uri) -> AsyncEngine:
+    """Create an asyncio engine configured from DBSettings
+
+    Args:
+        uri (str, optional): The connection URI. Defaults to the configured one.
+
+    Returns:
+        AsyncEngine: The engine.
+    """
+    url = get_async_url(uri)
+    if url.get_backend_name() != "postgresql":
+        return create_async_engine(url)
+
+    connect_args = {}
+    if settings.db.DATABASE_STATEMENT_TIMEOUT:
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.db.DATABASE_STATEMENT_TIMEOUT)
+        }
+    return create_async_engine(
+        url,
+        poolclass=LoopQueuePool,
+        pool_size=settings.db.DATABASE_POOL_SIZE,
+        max_overflow=settings.db.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.db.DATABASE_POOL_TIMEOUT,
+        pool_pre_ping=settings.db.DATABASE_POOL_PRE_PING,
+        pool_recycle=settings.db.DATABASE_POOL_RECYCLE,
+        connect_args=connect_args,
+    )
+
+
+class EventLoopThread:
+    """Event loop of the current process, running in a daemon thread.
+
+    Created lazily per process, like the engines, so a forked worker never
+    drives the loop, or the connections, of its parent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._engine: Optional[AsyncEngine] = None
+
+    def _start(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name="async-db", daemon=True
+            )
+            self._thread.start()
+            self._engine = create_async_db_engine()
+            self._pid = os.getpid()
+
+    @property
+    def engine(self) -> AsyncEngine:
+        """The asyncio engine of the current process"""
+        self._start()
+        return self._engine
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the loop and wait for its result
+
+        Args:
+            coro (Coroutine): The coroutine.
+
+        Returns:
+            Any: The result of the coroutine.
+        """
+        self._start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Call a function on the loop's thread and wait for its result
+
+        Args:
+            func (Callable[..., Any]): The function.
+            *args (Any): The arguments of the function.
+
+        Returns:
+            Any: The result of the function.
+        """
+        self._start()
+        if threading.current_thread() is self._thread:
+            return func(*args)
+
+        async def call() -> Any:
+            return func(*args)
+
+        return self.run(call())
+
+    def run_bridged(self, func: Callable[[], Any]) -> Any:
+        """Run a synchronous function on the calling thread, doing its I/O on the loop.
+
+        The function runs in a greenlet of the calling thread, with the same
+        context variables, the way AsyncSession.run_sync runs it on the loop.
+        Whenever the asyncio driver awaits something, the greenlet switches
+        back here; the awaitable runs on the loop while this thread waits,
+        and its result, or exception, is sent back into the function.
+
+        This drives SQLAlchemy's greenlet the way its greenlet_spawn does,
+        which is not public API: SQLAlchemy is pinned to an exact version,
+        and tests/test_async_session.py checks the bridge after upgrades.
+
+        Args:
+            func (Callable[[], Any]): The function.
+
+        Returns:
+            Any: The result of the function.
+        """
+        context = _AsyncIoGreenlet(func, greenlet.getcurrent())
+        result = context.switch()
+        while not context.dead:
+            try:
+                value = self.run(wait_for(result))
+            except BaseException:
+                result = context.throw(*sys.exc_info())
+            else:
+                result = context.switch(value)
+        return result
+
+
+async def wait_for(awaitable: Awaitable) -> Any:
+    """Await any awaitable, e.g. a future, from a coroutine
+
+    Args:
+        awaitable (Awaitable): The awaitable.
+
+    Returns:
+        Any: Its result.
+    """
+    return await awaitable
+
+
+event_loop = EventLoopThread()
+
+
+class LoopQueue(AsyncAdaptedQueue):
+    """Connection pool queue changed on the loop's thread only.
+
+    asyncio queues are not thread safe, and request threads check
+    connections out and in: a connection put back by one request must wake
+    a request waiting for it on the loop from the loop's thread.
+    """
+
+    def put_nowait(self, item):
+        return event_loop.call(super().put_nowait, item)
+
+    def get_nowait(self):
+        return event_loop.call(super().get_nowait)
+
+
+class LoopQueuePool(AsyncAdaptedQueuePool):
+    """asyncio queue pool for engines used through EventLoopThread.run_bridged"""
+
+    _queue_class = LoopQueue
+
+
+# Created on first use in each process, like the event loop
+async_replica_engines: EngineGroup[AsyncEngine] = EngineGroup(
+    get_replica_urls, create_async_db_engine
+)
+
+
+def run_in_async_session(
+    func: Callable[[Session], Any], bind: Optional[AsyncEngine] = None
+) -> Any:
+    """Run a synchronous function against a new session over an asyncio engine.
+
+    The function runs on the calling thread, so Flask's request and app
+    context stay available, and only its queries go through the event loop
+    (see EventLoopThread.run_bridged). Anything left uncommitted is rolled
+    back.
+
+    Args:
+        func (Callable[[Session], Any]): The function to run.
+        bind (Optional[AsyncEngine], optional): The engine to run against,
+            e.g. of another shard. Defaults to None, the primary engine.
+
+    Returns:
+        Any: The result of the function.
+    """
+
+    def run() -> Any:
+        with SessionLocal(bind=(bind or event_loop.engine).sync_engine) as db_object:
+            db_object.current_user_id = None
+            try:
+                return func(db_object)
+            finally:
+                db_object.rollback()
+
+    return event_loop.run_bridged(run)
@@ -1,7 +1,12 @@
 """ Database relations """
 
 from app.db.base_class import Base
+from app.models.change_log import ChangeLog
+from app.models.id_block import IdBlock
 from app.models.tag import Tag
 from app.models.task import Task
+from app.models.task_stat import TaskStat
 from app.models.task_tag import TaskTag
 from app.models.user import User
+from app.models.user_shard import UserShard
+from app.models.user_version import UserVersion
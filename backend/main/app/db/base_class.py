@@ -1,17 +1,27 @@
 """ Model Base Class definition """
 
 import re
-from datetime import datetime
+from typing import Any, List, Sequence, Tuple
 
-from sqlalchemy import Column, Integer, inspect
+from sqlalchemy import Column, Integer, event
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 class_registry: dict = {}
 
 
 @as_declarative(class_registry=class_registry)
 class Base:
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # Fetch server generated values with RETURNING when flushing, instead of
+    # expiring them, so flushed objects need no refresh
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Column attribute keys of the model, set when its mapper is configured
+    _column_keys: Tuple[str, ...] = ()
 
     @declared_attr
     def __tablename__(cls) -> str:
@@ -23,10 +33,52 @@ class Base:
         Returns:
             dict: The model as a dictionary
         """
-        ret_dict = {}
-        for c in inspect(self).mapper.column_attrs:
-            ret_dict[c.key] = getattr(self, c.key)
-            # Convert datetime objects to ISO format
-            if isinstance(ret_dict[c.key], datetime):
-                ret_dict[c.key] = ret_dict[c.key].isoformat()
-        return ret_dict
+        # Loaded values are read from the instance state directly, expired
+        # and deferred ones through the attribute so they get loaded
+        state = self.__dict__
+        return {
+            key: state[key] if key in state else getattr(self, key)
+            for key in self._column_keys
+        }
+
+    @classmethod
+    def column_keys(cls) -> Tuple[str, ...]:
+        """Returns the column attribute keys of the model
+
+        Returns:
+            Tuple[str, ...]: The keys, in mapper order.
+        """
+        if "_column_keys" not in cls.__dict__:
+            configure_mappers()
+        return cls._column_keys
+
+    @classmethod
+    def columns(cls) -> List[InstrumentedAttribute]:
+        """Returns the column attributes of the model, for column only
+        queries whose rows can be passed to rows_to_dicts
+
+        Returns:
+            List[InstrumentedAttribute]: The column attributes.
+        """
+        return [getattr(cls, key) for key in cls.column_keys()]
+
+    @staticmethod
+    def rows_to_dicts(rows: Sequence[Row]) -> List[dict]:
+        """Convert the rows of a column only query to dictionaries shaped like
+        dict(), without instantiating models
+
+        Args:
+            rows (Sequence[Row]): The rows.
+
+        Returns:
+            List[dict]: The rows as dictionaries, keyed by column label.
+        """
+        if not rows:
+            return []
+        keys = rows[0]._fields
+        return [dict(zip(keys, row)) for row in rows]
+
+
+@event.listens_for(Base, "mapper_configured", propagate=True)
+def _cache_column_keys(mapper: Any, class_: type) -> None:
+    class_._column_keys = tuple(attr.key for attr in mapper.column_attrs)
@@ -0,0 +1,40 @@
+""" Change Log Compaction """
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from app import crud
+from app.core.config import settings
+from app.db.shard import get_shard_urls, shard_session
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def compact_change_log(
+    retention_days: int = settings.CHANGE_LOG_RETENTION_DAYS,
+) -> None:
+    """Prune superseded and expired entries from the change log.
+
+    Args:
+        retention_days (int, optional): Days of changes kept for incremental
+            sync. Defaults to settings.CHANGE_LOG_RETENTION_DAYS.
+    """
+    logger.info("Compacting change log...")
+    removed = 0
+    for shard in range(len(get_shard_urls())):
+        with shard_session(shard) as db:
+            removed += crud.change_log.compact(
+                db, before=datetime.utcnow() - timedelta(days=retention_days)
+            )
+    logger.info("Removed %d change log entries", removed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--retention-days", type=int, default=settings.CHANGE_LOG_RETENTION_DAYS
+    )
+    args = parser.parse_args()
+    compact_change_log(retention_days=args.retention_days)
@@ -2,7 +2,7 @@
 
 import logging
 
-from app.db.session import SessionLocal
+from app.db.shard import get_shard_urls, shard_session
 from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
 
 logging.basicConfig(level=logging.INFO)
@@ -16,12 +16,12 @@ logger = logging.getLogger(__name__)
     after=after_log(logger, logging.WARN),
 )
 def health_check() -> None:
-    """Check if database is up and running."""
+    """Check if every database shard is up and running."""
     logger.info("Checking database connection...")
     try:
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
+        for shard in range(len(get_shard_urls())):
+            with shard_session(shard) as db:
+                db.execute("SELECT 1")
     except Exception as e:
         logger.error(e)
         logging.error("Failed to connect to database")
@@ -1,9 +1,13 @@
 """ Routine to create the database tables """
 
 from app.db.base import Base
-from app.db.session import engine
+from app.db.search import create_search_index
+from app.db.shard import get_shard_engine, get_shard_urls
 
 
 def init_db():
-    """Create the database tables."""
-    Base.metadata.create_all(bind=engine)
+    """Create the database tables on every shard."""
+    for shard in range(len(get_shard_urls())):
+        engine = get_shard_engine(shard)
+        Base.metadata.create_all(bind=engine)
+        create_search_index(engine)
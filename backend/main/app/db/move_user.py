@@ -0,0 +1,185 @@
+""" Move a user's data to another shard """
+
+import argparse
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from app import crud
+from app.core.config import settings
+from app.db.base import ChangeLog, Tag, Task, TaskStat, TaskTag, User, UserVersion
+from app.db.shard import get_shard_engine, get_shard_urls, shard_session
+from app.models.change_log import ChangeEntity, ChangeOp
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tables holding a user's rows, parents first. Ids of users, tasks and tags
+# are unique across shards and kept, the others are numbered by the target.
+USER_TABLES = [
+    (User.__table__, True),
+    (Tag.__table__, True),
+    (Task.__table__, True),
+    (TaskTag.__table__, False),
+    (TaskStat.__table__, False),
+    (UserVersion.__table__, False),
+]
+
+
+def user_rows(table, user_id: int):
+    """Get the condition selecting a user's rows of one of USER_TABLES"""
+    if table is User.__table__:
+        return table.c.id == user_id
+    if table is TaskTag.__table__:
+        task_ids = select(Task.id).where(Task.user_id == user_id)
+        return table.c.task_id.in_(task_ids.scalar_subquery())
+    return table.c.user_id == user_id
+
+
+def delete_user_rows(connection: Connection, user_id: int) -> None:
+    """Delete a user's rows from a shard, children first
+
+    Args:
+        connection (Connection): A connection to the shard.
+        user_id (int): The id of the user.
+    """
+    connection.execute(delete(ChangeLog).where(ChangeLog.user_id == user_id))
+    for table, _ in reversed(USER_TABLES):
+        connection.execute(delete(table).where(user_rows(table, user_id)))
+
+
+@contextmanager
+def snapshot(engine: Engine) -> Iterator[Connection]:
+    """Open a transaction on a shard whose reads all see the same snapshot
+
+    Args:
+        engine (Engine): The engine of the shard.
+
+    Yields:
+        Iterator[Connection]: A connection in the transaction.
+    """
+    with engine.connect() as connection:
+        if connection.dialect.name != "sqlite":
+            connection.execution_options(isolation_level="REPEATABLE READ")
+        with connection.begin():
+            if connection.dialect.name == "sqlite":
+                # pysqlite only begins a transaction before the first write
+                connection.exec_driver_sql("BEGIN")
+            yield connection
+
+
+def copy_user_rows(source: Connection, target: Connection, user_id: int) -> None:
+    """Copy a user's rows to another shard
+
+    The change log is not copied, its sequence is local to each shard.
+    Instead the target's sync floor is raised above both sequences, so every
+    client fetches a snapshot on its next sync and continues from there.
+
+    Args:
+        source (Connection): A connection to the user's shard.
+        target (Connection): A connection to the target shard.
+        user_id (int): The id of the user.
+    """
+    # Leftovers of an interrupted move
+    delete_user_rows(target, user_id)
+    for table, keep_ids in USER_TABLES:
+        rows = [
+            dict(row._mapping)
+            for row in source.execute(select(table).where(user_rows(table, user_id)))
+        ]
+        if not keep_ids:
+            for row in rows:
+                del row["id"]
+        if rows:
+            target.execute(insert(table), rows)
+        logger.info("Copied %d %s rows", len(rows), table.name)
+
+    floor = 1 + max(
+        connection.execute(select(func.max(ChangeLog.id))).scalar() or 0
+        for connection in (source, target)
+    )
+    # Never sent to clients, it keeps the target's sequence above the floor
+    target.execute(
+        insert(ChangeLog).values(
+            id=floor,
+            user_id=user_id,
+            entity=ChangeEntity.tag,
+            entity_id=0,
+            op=ChangeOp.delete,
+        )
+    )
+    if target.dialect.name == "postgresql":
+        target.execute(
+            select(
+                func.setval(
+                    func.pg_get_serial_sequence("change_log", "id"),
+                    select(func.max(ChangeLog.id)).scalar_subquery(),
+                )
+            )
+        )
+    floored = target.execute(
+        update(UserVersion)
+        .where(UserVersion.user_id == user_id)
+        .values(sync_floor=floor)
+    ).rowcount
+    if not floored:
+        target.execute(
+            insert(UserVersion).values(user_id=user_id, version=0, sync_floor=floor)
+        )
+
+
+def move_user(user_id: int, shard: int) -> None:
+    """Move a user's rows to another shard while the API keeps running
+
+    Writes of the user are refused with 503 from the moment every worker
+    sees the move starting, until they see it finished; reads keep being
+    served from the old shard meanwhile. Both waits last one shard map TTL.
+    Logins skip upgrading the password hash while the user is moving.
+    The rows are copied from one snapshot of the source shard.
+
+    Args:
+        user_id (int): The id of the user.
+        shard (int): The index of the target shard.
+    """
+    shards = len(get_shard_urls())
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} does not exist, there are {shards}")
+    with shard_session(0) as db:
+        entry = crud.user_shard.get(db, id=user_id)
+        if entry is None:
+            raise ValueError(f"User {user_id} does not exist")
+        source = entry.shard
+        if source == shard:
+            logger.info("User %d is already on shard %d", user_id, shard)
+            return
+
+        logger.info("Moving user %d from shard %d to %d...", user_id, source, shard)
+        crud.user_shard.set_target(db, user_id=user_id, target_shard=shard)
+        wait = settings.db.DATABASE_SHARD_MAP_TTL + 1
+        try:
+            # Let in-flight writes finish and every worker see the move
+            time.sleep(wait)
+            with snapshot(get_shard_engine(source)) as source_connection:
+                with get_shard_engine(shard).begin() as target_connection:
+                    copy_user_rows(source_connection, target_connection, user_id)
+        except BaseException:
+            crud.user_shard.set_target(db, user_id=user_id, target_shard=None)
+            raise
+        crud.user_shard.finish_move(db, user_id=user_id)
+
+    # Workers may still read from the source until their shard map expires
+    time.sleep(wait)
+    with get_shard_engine(source).begin() as connection:
+        delete_user_rows(connection, user_id)
+    logger.info("User %d moved to shard %d", user_id, shard)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--shard", type=int, required=True)
+    args = parser.parse_args()
+    move_user(user_id=args.user_id, shard=args.shard)
@@ -0,0 +1,35 @@
+""" Task Stats Reconciliation """
+
+import argparse
+import logging
+
+from app import crud
+from app.db.shard import get_shard_urls, get_user_shard, shard_session
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild_task_stats(user_id: int = None) -> None:
+    """Rebuild the task stats summary from the task and task_tag tables.
+
+    Args:
+        user_id (int, optional): Only rebuild this user's stats. Defaults to
+            None, rebuilding every user.
+    """
+    logger.info("Rebuilding task stats...")
+    if user_id is None:
+        shards = range(len(get_shard_urls()))
+    else:
+        shards = [get_user_shard(user_id)[0]]
+    for shard in shards:
+        with shard_session(shard) as db:
+            crud.task_stat.rebuild(db, user_id=user_id)
+    logger.info("Task stats rebuilt")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    rebuild_task_stats(user_id=args.user_id)
@@ -0,0 +1,77 @@
+""" Read replica routing.
+
+GET requests are served from the replicas in DATABASE_REPLICA_URLS, in turn,
+as long as the replica has every write of the requesting user: replicas may
+lag behind the primary, and a user must see their own writes. The server
+compares the user's data version on the replica and on the primary (see
+route_caught_up_reads in app.api.deps). Clients that send back the
+LAST_WRITE_COOKIE of their last write skip the replica for
+DATABASE_REPLICA_STICKY_SECONDS without the comparison.
+"""
+
+import math
+import time
+from typing import List, Optional
+
+from app.core.config import settings
+from app.db.session import EngineGroup, create_db_engine, split_urls
+from app.utils.constants import LAST_WRITE_COOKIE
+from sqlalchemy.engine import Engine
+from werkzeug.wrappers import Response
+
+
+def get_replica_urls() -> List[str]:
+    """Get the configured read replica URLs
+
+    Returns:
+        List[str]: The URLs, empty if replicas are disabled.
+    """
+    return split_urls(settings.db.DATABASE_REPLICA_URLS)
+
+
+replica_engines: EngineGroup[Engine] = EngineGroup(get_replica_urls, create_db_engine)
+
+
+def record_write(response: Response) -> None:
+    """Keep the client's reads on the primary for DATABASE_REPLICA_STICKY_SECONDS
+
+    Only saves the version comparison for clients that keep cookies.
+
+    Args:
+        response (Response): The response to the writing request, which gets
+            the time of the write as LAST_WRITE_COOKIE.
+    """
+    if get_replica_urls():
+        sticky_seconds = settings.db.DATABASE_REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            f"{time.time():.3f}",
+            max_age=math.ceil(sticky_seconds),
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+def reads_from_replica(last_write: Optional[str]) -> bool:
+    """Check whether a client's reads may be served by a replica
+
+    Args:
+        last_write (Optional[str]): The LAST_WRITE_COOKIE the client sent,
+            None if it sent none.
+
+    Returns:
+        bool: True if replicas are configured and the client did not write
+            within the sticky window, else False. The replica is still
+            skipped if it lags behind the user's writes.
+    """
+    if not get_replica_urls():
+        return False
+    if last_write is None:
+        return True
+    try:
+        written_at = float(last_write)
+    except ValueError:
+        return True
+    # A time in the future is forged or skewed, it does not pin the client
+    age = time.time() - written_at
+    return not 0 <= age < settings.db.DATABASE_REPLICA_STICKY_SECONDS
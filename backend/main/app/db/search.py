@@ -0,0 +1,166 @@
+""" Full-text search over task titles and descriptions """
+
+from app.models.task import Task
+from sqlalchemy import (
+    Float,
+    case,
+    cast,
+    func,
+    inspect,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+)
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Subquery
+
+# Shared by init_db and the task_full_text_search migration
+SEARCH_DDL = {
+    "postgresql": [
+        # Weighted tsvector kept up to date by PostgreSQL itself
+        """
+        ALTER TABLE task ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX ix_task_search_vector ON task USING gin (search_vector)",
+    ],
+    "sqlite": [
+        # External content FTS5 table kept in sync by triggers
+        """
+        CREATE VIRTUAL TABLE task_fts USING fts5(
+            title, description, content='task', content_rowid='id'
+        )
+        """,
+        """
+        CREATE TRIGGER task_fts_ai AFTER INSERT ON task BEGIN
+            INSERT INTO task_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER task_fts_ad AFTER DELETE ON task BEGIN
+            INSERT INTO task_fts(task_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER task_fts_au AFTER UPDATE ON task BEGIN
+            INSERT INTO task_fts(task_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO task_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+        # Index the tasks written before the table existed
+        "INSERT INTO task_fts(task_fts) VALUES ('rebuild')",
+    ],
+}
+
+
+def has_search_index(connection: Connection) -> bool:
+    """Check whether the search column or virtual table exists
+
+    Args:
+        connection (Connection): A connection to the database.
+
+    Returns:
+        bool: True if it exists, else False.
+    """
+    inspector = inspect(connection)
+    if connection.dialect.name == "postgresql":
+        return any(
+            column["name"] == "search_vector"
+            for column in inspector.get_columns("task")
+        )
+    return inspector.has_table("task_fts")
+
+
+def create_search_index(engine: Engine) -> None:
+    """Create the search column or virtual table for the engine's dialect,
+    unless it already exists
+
+    Args:
+        engine (Engine): The engine.
+    """
+    statements = SEARCH_DDL.get(engine.dialect.name, [])
+    with engine.begin() as connection:
+        if not statements or has_search_index(connection):
+            return
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+
+def fts5_query(q: str) -> str:
+    """Quote every term of a search string for an FTS5 MATCH
+
+    Args:
+        q (str): The search string.
+
+    Returns:
+        str: The FTS5 query matching all terms.
+    """
+    return " ".join(['"%s"' % term.replace('"', '""') for term in q.split()])
+
+
+def task_search(dialect: str, q: str, user_id: int) -> Subquery:
+    """Build the ranked matches of a search string
+
+    Args:
+        dialect (str): The name of the database dialect.
+        q (str): The search string.
+        user_id (int): The id of the user.
+
+    Dialects without full-text search support fall back to matching every
+    term anywhere in the title or description, ranked by the number of terms
+    in the title. That scans the user's tasks and ignores word stems.
+
+    Returns:
+        Subquery: The matching task ids with their rank, higher is better.
+    """
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery("english", q)
+        search_vector = literal_column("task.search_vector")
+        # Rank as float8 so it round trips exactly through cursors
+        rank = cast(func.ts_rank_cd(search_vector, tsquery), DOUBLE_PRECISION)
+        return (
+            select(Task.id.label("id"), rank.label("rank"))
+            .where(search_vector.op("@@")(tsquery), Task.user_id == user_id)
+            .subquery()
+        )
+    if dialect == "sqlite":
+        task_fts = table("task_fts")
+        return (
+            select(
+                literal_column("task_fts.rowid").label("id"),
+                (-func.bm25(literal_column("task_fts"))).label("rank"),
+            )
+            .select_from(task_fts)
+            .where(literal_column("task_fts").op("MATCH")(fts5_query(q)))
+            .subquery()
+        )
+    title, description = func.lower(Task.title), func.lower(Task.description)
+    terms = [term.lower() for term in q.split()]
+    rank = sum(
+        [case((title.contains(term, autoescape=True), 1), else_=0) for term in terms],
+        literal(0),
+    )
+    return (
+        select(Task.id.label("id"), cast(rank, Float).label("rank"))
+        .where(
+            Task.user_id == user_id,
+            *[
+                or_(
+                    title.contains(term, autoescape=True),
+                    description.contains(term, autoescape=True),
+                )
+                for term in terms
+            ],
+        )
+        .subquery()
+    )
@@ -1,12 +1,351 @@
 """ SQLAlchemy session management. """
 
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Generic, List, Optional, TypeVar
+
 from app.core.config import settings
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
 
 connection_uri = settings.db.DATABASE_CONNECTION_URL
-engine = create_engine(
-    connection_uri,
+
+EngineType = TypeVar("EngineType")
+
+
+class PoolStats:
+    """Connection pool checkout statistics of the current process
+
+    The wait of a checkout is the time spent in the pool's queue; opening a
+    new connection for it is counted as connect time instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset all counters"""
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.connects = 0
+        self.total_connect = 0.0
+        self.max_connect = 0.0
+
+    def record_checkout(self, wait: float) -> None:
+        """Record a connection checkout
+
+        Args:
+            wait (float): Seconds spent waiting for the connection.
+        """
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def record_connect(self, seconds: float) -> None:
+        """Record a new connection opened by the pool
+
+        Args:
+            seconds (float): Seconds spent opening the connection.
+        """
+        with self._lock:
+            self.connects += 1
+            self.total_connect += seconds
+            self.max_connect = max(self.max_connect, seconds)
+
+    def dict(self) -> dict:
+        """Returns the statistics as a dictionary
+
+        Returns:
+            dict: The statistics as a dictionary
+        """
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds_total": self.total_wait,
+                "wait_seconds_max": self.max_wait,
+                "wait_seconds_avg": (
+                    self.total_wait / self.checkouts if self.checkouts else 0.0
+                ),
+                "connects": self.connects,
+                "connect_seconds_total": self.total_connect,
+                "connect_seconds_max": self.max_connect,
+                "connect_seconds_avg": (
+                    self.total_connect / self.connects if self.connects else 0.0
+                ),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection,
+    and how long it takes to open new ones"""
+
+    _connecting = threading.local()
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - start
+            pool_stats.record_connect(elapsed)
+            connecting = getattr(self._connecting, "seconds", 0.0)
+            self._connecting.seconds = connecting + elapsed
+
+    def _do_get(self):
+        self._connecting.seconds = 0.0
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start - self._connecting.seconds
+            pool_stats.record_checkout(max(wait, 0.0))
+
+
+def create_db_engine(uri: str = connection_uri) -> Engine:
+    """Create an engine configured from DBSettings
+
+    Args:
+        uri (str, optional): The connection URI. Defaults to the configured one.
+
+    Returns:
+        Engine: The engine.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory databases live in a single connection
+        return create_engine(url)
+
+    connect_args = {}
+    if (
+        url.get_backend_name() == "postgresql"
+        and settings.db.DATABASE_STATEMENT_TIMEOUT
+    ):
+        connect_args[
+            "options"
+        ] = f"-c statement_timeout={settings.db.DATABASE_STATEMENT_TIMEOUT}"
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db.DATABASE_POOL_SIZE,
+        max_overflow=settings.db.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.db.DATABASE_POOL_TIMEOUT,
+        pool_pre_ping=settings.db.DATABASE_POOL_PRE_PING,
+        pool_recycle=settings.db.DATABASE_POOL_RECYCLE,
+        connect_args=connect_args,
+    )
+
+
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Get the engine of the current process, creating it on first use.
+
+    Engines are never shared across a fork: a gunicorn worker that inherits
+    the master's engine drops the inherited connections without closing
+    them and opens its own pool.
+
+    Returns:
+        Engine: The engine.
+    """
+    global _engine, _engine_pid
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            if _engine is not None:
+                _engine.dispose(close=False)
+            pool_stats.reset()
+            _engine = create_db_engine()
+            _engine_pid = os.getpid()
+    return _engine
+
+
+def split_urls(value: str) -> List[str]:
+    """Split a comma separated list of connection URLs
+
+    Args:
+        value (str): The list, e.g. from DATABASE_REPLICA_URLS.
+
+    Returns:
+        List[str]: The URLs.
+    """
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+class EngineGroup(Generic[EngineType]):
+    """Engines of a list of connection URLs, e.g. the read replicas.
+
+    Created lazily per process, like the primary engine, so a forked worker
+    never uses the connections of its parent.
+    """
+
+    def __init__(
+        self,
+        urls: Callable[[], List[str]],
+        create: Callable[[str], EngineType],
+    ):
+        self._urls = urls
+        self._create = create
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._engines: List[EngineType] = []
+        self._turn = itertools.count()
+
+    @property
+    def engines(self) -> List[EngineType]:
+        """The engines of the current process, in the order of the URLs"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._engines = [self._create(url) for url in self._urls()]
+                    self._pid = os.getpid()
+        return self._engines
+
+    def next(self) -> Optional[EngineType]:
+        """Get the next engine, round robin
+
+        Returns:
+            Optional[EngineType]: The engine, or None if there are no URLs.
+        """
+        engines = self.engines
+        if not engines:
+            return None
+        return engines[next(self._turn) % len(engines)]
+
+
+def pool_status() -> dict:
+    """Returns the utilization of the current process' connection pool
+
+    Returns:
+        dict: Pool size, checked out connections, utilization and wait times.
+    """
+    pool = get_engine().pool
+    status = {"pool": pool.status(), **pool_stats.dict()}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + settings.db.DATABASE_MAX_OVERFLOW
+        status.update(
+            size=pool.size(),
+            max_overflow=settings.db.DATABASE_MAX_OVERFLOW,
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            utilization=pool.checkedout() / capacity if capacity else 0.0,
+        )
+    return status
+
+
+# Session.info key of the replica engine a session reads from
+READ_REPLICA = "read_replica"
+
+
+class RoutingSession(Session):
+    """Session reading from a replica engine once route_reads was called.
+
+    Flushes and INSERT, UPDATE and DELETE statements always go to the
+    session's own bind, the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get(READ_REPLICA)
+        if (
+            replica is not None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+        ):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+def route_reads(db: Session, replica: Optional[Engine]) -> None:
+    """Send the queries of a session to a read replica
+
+    Args:
+        db (Session): The database session, a RoutingSession.
+        replica (Optional[Engine]): The engine of the replica, None to read
+            from the primary again.
+    """
+    db.info[READ_REPLICA] = replica
+
+
+class LazySessionMaker(sessionmaker):
+    """sessionmaker binding each new session to the current process' engine"""
+
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = LazySessionMaker(
+    class_=RoutingSession, autocommit=False, autoflush=False
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Session.info key of sessions whose commits are deferred to the request
+# boundary, set to whether a CRUD call deferred one
+UNIT_OF_WORK = "unit_of_work"
+
+
+def begin_unit_of_work(db: Session) -> None:
+    """Defer the commits of CRUD calls on a session to its owner.
+
+    CRUD methods then only flush, and whoever opened the unit of work calls
+    commit_unit_of_work once, or lets the session roll everything back.
+
+    Args:
+        db (Session): The database session.
+    """
+    db.info[UNIT_OF_WORK] = False
+
+
+def in_unit_of_work(db: Session) -> bool:
+    """Check whether the commits of a session are deferred to its owner
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        bool: True if CRUD methods should only flush, else False.
+    """
+    return UNIT_OF_WORK in db.info
+
+
+def defer_commit(db: Session) -> None:
+    """Flush the session in place of a commit of its unit of work
+
+    Args:
+        db (Session): The database session.
+    """
+    db.flush()
+    db.info[UNIT_OF_WORK] = True
+
+
+def commit_unit_of_work(db: Session) -> None:
+    """Commit the unit of work of a session if a CRUD call deferred a commit.
+    Read only units of work, and sessions outside of one, are left alone.
+
+    Args:
+        db (Session): The database session.
+    """
+    if db.info.get(UNIT_OF_WORK):
+        db.commit()
+        db.info[UNIT_OF_WORK] = False
+
+
+def __getattr__(name: str):
+    # Keep `from app.db.session import engine` working without creating
+    # the engine at import time
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,238 @@
+""" Horizontal sharding by user.
+
+All rows of a user live on one shard. The first shard, DATABASE_CONNECTION_URL,
+also holds the shard map (user_shard), which allocates user ids and finds
+users by email, and the id blocks of the tables whose ids must stay unique
+across shards so a user's rows can move between them.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.async_session import create_async_db_engine, event_loop
+from app.db.base import IdBlock, UserShard
+from app.db.session import (
+    EngineGroup,
+    SessionLocal,
+    connection_uri,
+    create_db_engine,
+    get_engine,
+    split_urls,
+)
+from app.utils.constants import ID_BLOCK_SIZE, SHARD_MAP_CACHE_SIZE
+from sqlalchemy import Table, func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+
+def get_shard_urls() -> List[str]:
+    """Get the connection URLs of all shards
+
+    Returns:
+        List[str]: The URLs, the first one being DATABASE_CONNECTION_URL.
+    """
+    return [connection_uri] + split_urls(settings.db.DATABASE_SHARD_URLS)
+
+
+def sharding_enabled() -> bool:
+    """Check whether there is more than one shard
+
+    Returns:
+        bool: True if DATABASE_SHARD_URLS is set, else False.
+    """
+    return bool(split_urls(settings.db.DATABASE_SHARD_URLS))
+
+
+# Engines of the shards after the first one, which uses the primary engine
+shard_engines: EngineGroup[Engine] = EngineGroup(
+    lambda: get_shard_urls()[1:], create_db_engine
+)
+async_shard_engines: EngineGroup[AsyncEngine] = EngineGroup(
+    lambda: get_shard_urls()[1:], create_async_db_engine
+)
+
+
+def get_async_shard_engine(shard: int) -> AsyncEngine:
+    """Get the asyncio engine of a shard in the current process
+
+    Args:
+        shard (int): The index of the shard.
+
+    Returns:
+        AsyncEngine: The engine.
+    """
+    if shard == 0:
+        return event_loop.engine
+    return async_shard_engines.engines[shard - 1]
+
+
+def get_shard_engine(shard: int, db: Optional[Session] = None) -> Engine:
+    """Get the engine of a shard in the current process
+
+    Args:
+        shard (int): The index of the shard.
+        db (Optional[Session], optional): The session of the current request.
+            If it runs in run_in_async_session, the synchronous facade of the
+            shard's asyncio engine is returned, so its queries keep going
+            through the event loop. Defaults to None.
+
+    Returns:
+        Engine: The engine.
+    """
+    if db is not None and db.get_bind().dialect.is_async:
+        return get_async_shard_engine(shard).sync_engine
+    if shard == 0:
+        return get_engine()
+    return shard_engines.engines[shard - 1]
+
+
+@contextmanager
+def shard_session(shard: int, db: Optional[Session] = None) -> Iterator[Session]:
+    """Open a session on a shard, closed on exit
+
+    Args:
+        shard (int): The index of the shard.
+        db (Optional[Session], optional): The request's session on the first
+            shard, used instead of a new one when shard is 0. Defaults to
+            None.
+
+    Yields:
+        Iterator[Session]: The session.
+    """
+    if shard == 0 and db is not None:
+        yield db
+        return
+    db_object = SessionLocal(bind=get_shard_engine(shard, db))
+    db_object.current_user_id = None
+    try:
+        yield db_object
+    finally:
+        db_object.close()
+
+
+# Shard and target shard of each user, a move waits for these to expire
+shard_map_cache = TTLCache(
+    maxsize=SHARD_MAP_CACHE_SIZE, ttl=settings.db.DATABASE_SHARD_MAP_TTL
+)
+
+
+def get_user_shard(user_id: Optional[int]) -> Tuple[int, bool]:
+    """Get the shard of a user from the shard map
+
+    Args:
+        user_id (Optional[int]): The id of the user, None for anonymous
+            requests.
+
+    Returns:
+        Tuple[int, bool]: The index of the shard, and whether the user's
+            rows are being moved to another one.
+    """
+    if user_id is None or not sharding_enabled():
+        return 0, False
+    location = shard_map_cache.get(user_id)
+    if location is None:
+        with shard_session(0) as db:
+            row = (
+                db.query(UserShard.shard, UserShard.target_shard)
+                .filter(UserShard.id == user_id)
+                .first()
+            )
+        location = (row.shard, row.target_shard is not None) if row else (0, False)
+        shard_map_cache.set(user_id, location)
+    return location
+
+
+class IdAllocator:
+    """Hands out ids unique across shards from blocks reserved in the
+    id_block table, ID_BLOCK_SIZE at a time per process"""
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+
+    def _seed(self, table: Table, db: Optional[Session]) -> int:
+        """Get the first id no shard uses yet"""
+        start = 1
+        for shard in range(len(get_shard_urls())):
+            with get_shard_engine(shard, db).connect() as connection:
+                last = connection.execute(select(func.max(table.c.id))).scalar()
+            start = max(start, (last or 0) + 1)
+        return start
+
+    def _reserve(self, table: Table, size: int, db: Optional[Session]) -> int:
+        """Reserve the next size ids of a table
+
+        Args:
+            table (Table): The table.
+            size (int): The number of ids.
+            db (Optional[Session]): The session of the current request.
+
+        Returns:
+            int: The first reserved id.
+        """
+        while True:
+            try:
+                with get_shard_engine(0, db).begin() as connection:
+                    # Incrementing first locks the row until the commit
+                    reserved = connection.execute(
+                        update(IdBlock)
+                        .where(IdBlock.name == table.name)
+                        .values(next_id=IdBlock.next_id + size)
+                    ).rowcount
+                    if not reserved:
+                        start = self._seed(table, db)
+                        connection.execute(
+                            insert(IdBlock).values(
+                                name=table.name, next_id=start + size
+                            )
+                        )
+                        return start
+                    end = connection.execute(
+                        select(IdBlock.next_id).where(IdBlock.name == table.name)
+                    ).scalar()
+                    return end - size
+            except IntegrityError:
+                # Another process seeded the table first
+                continue
+
+    def allocate(
+        self, table: Table, count: int, db: Optional[Session] = None
+    ) -> List[int]:
+        """Allocate ids of a table
+
+        Args:
+            table (Table): The table.
+            count (int): The number of ids.
+            db (Optional[Session], optional): The session of the current
+                request, see get_shard_engine. Defaults to None.
+
+        Returns:
+            List[int]: The ids.
+        """
+        ids = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # Blocks of the parent are never shared with a forked worker
+                self._blocks = {}
+                self._pid = os.getpid()
+            while len(ids) < count:
+                start, end = self._blocks.get(table.name, (0, 0))
+                if start == end:
+                    size = max(self.block_size, count - len(ids))
+                    start = self._reserve(table, size, db)
+                    end = start + size
+                taken = min(end - start, count - len(ids))
+                ids.extend(range(start, start + taken))
+                self._blocks[table.name] = (start + taken, end)
+        return ids
+
+
+id_allocator = IdAllocator(ID_BLOCK_SIZE)
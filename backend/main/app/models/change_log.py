@@ -0,0 +1,36 @@
+""" Change Log relation """
+
+from datetime import datetime
+
+from app.db.base_class import Base
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from strenum import StrEnum
+
+
+class ChangeEntity(StrEnum):
+    """Change log entity enum"""
+
+    task = "task"
+    tag = "tag"
+    # The tag set of a task, entity_id is the task id
+    task_tags = "task_tags"
+
+
+class ChangeOp(StrEnum):
+    """Change log operation enum"""
+
+    upsert = "upsert"
+    delete = "delete"
+
+
+class ChangeLog(Base):
+    """Change Log model, one append-only row per changed task, tag or task
+    tag set. The id is the change sequence clients sync from."""
+
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    entity = Column(String(16), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(16), nullable=False)
+    date_created = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (Index("ix_change_log_user_id_id", "user_id", "id"),)
@@ -0,0 +1,12 @@
+""" Id Block relation """
+
+from app.db.base_class import Base
+from sqlalchemy import Column, Integer, String
+
+
+class IdBlock(Base):
+    """Id Block model, the next unallocated id of a table whose ids are
+    unique across shards. Kept on the first shard."""
+
+    name = Column(String(64), nullable=False, unique=True)
+    next_id = Column(Integer, nullable=False)
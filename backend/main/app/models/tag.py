@@ -10,7 +10,7 @@ from sqlalchemy.orm import relationship
 class Tag(Base):
     """Tag model"""
 
-    name = Column(String(24), nullable=False, index=True)
+    name = Column(String(24), nullable=False)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
 
     date_created = Column(DateTime, default=datetime.utcnow)
@@ -18,4 +18,5 @@ class Tag(Base):
 
     task_tags = relationship("TaskTag", backref="tag", cascade="all, delete-orphan")
 
+    # tag_unique serves lookups by name
     __table_args__ = (UniqueConstraint("name", "user_id", name="tag_unique"),)
@@ -3,7 +3,7 @@
 from datetime import datetime
 
 from app.db.base_class import Base
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, String
 from sqlalchemy.dialects.postgresql import TEXT
 from sqlalchemy.orm import relationship
 from strenum import StrEnum
@@ -22,10 +22,36 @@ class Task(Base):
 
     title = Column(String(256), nullable=False, index=True)
     description = Column(TEXT, nullable=False)
-    status = Column(Enum(TaskStatus), default="pending", index=True)
-    user_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
+    status = Column(Enum(TaskStatus), default="pending")
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
 
     date_created = Column(DateTime, default=datetime.utcnow)
     date_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     task_tags = relationship("TaskTag", backref="task", cascade="all, delete-orphan")
+    tags = relationship("Tag", secondary="task_tag", order_by="Tag.id", viewonly=True)
+
+    # Match the listing filters and their (date_created, id) keyset order
+    __table_args__ = (
+        Index("ix_task_user_id_date_created_id", "user_id", "date_created", "id"),
+        Index(
+            "ix_task_user_id_status_date_created_id",
+            "user_id",
+            "status",
+            "date_created",
+            "id",
+        ),
+        Index("ix_task_user_id_id", "user_id", "id"),
+    )
+
+    def dict(self) -> dict:
+        """Returns the task as a dictionary, including its tags if they
+        have already been loaded
+
+        Returns:
+            dict: The task as a dictionary
+        """
+        ret_dict = super().dict()
+        if "tags" in self.__dict__:
+            ret_dict["tags"] = [tag.dict() for tag in self.tags]
+        return ret_dict
@@ -0,0 +1,19 @@
+""" Task Stat relation """
+
+from app.db.base_class import Base
+from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint
+
+
+class TaskStat(Base):
+    """Task Stat model, the number of a user's tasks per status or per tag"""
+
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    # Either "status" or "tag"
+    dimension = Column(String(16), nullable=False)
+    # The status name or the tag id
+    value = Column(String(64), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "dimension", "value", name="task_stat_unique"),
+    )
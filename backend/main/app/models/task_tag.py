@@ -3,15 +3,19 @@
 from datetime import datetime
 
 from app.db.base_class import Base
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, UniqueConstraint
 
 
 class TaskTag(Base):
     """Task Tag model"""
 
-    task_id = Column(Integer, ForeignKey("task.id"), nullable=False, index=True)
-    tag_id = Column(Integer, ForeignKey("tag.id"), nullable=False, index=True)
+    task_id = Column(Integer, ForeignKey("task.id"), nullable=False)
+    tag_id = Column(Integer, ForeignKey("tag.id"), nullable=False)
 
     date_created = Column(DateTime, default=datetime.utcnow)
 
-    __table_args__ = (UniqueConstraint("task_id", "tag_id", name="task_tag_unique"),)
+    # task_tag_unique serves lookups by task_id, the index lookups by tag_id
+    __table_args__ = (
+        UniqueConstraint("task_id", "tag_id", name="task_tag_unique"),
+        Index("ix_task_tag_tag_id_task_id", "tag_id", "task_id"),
+    )
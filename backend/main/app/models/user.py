@@ -15,6 +15,8 @@ class User(Base):
     last_name = Column(String(256), nullable=False, index=True)
     email = Column(EmailType, nullable=False, unique=True, index=True)
     hashed_password = Column(String(256), nullable=False)
+    # Session keys derive from it, so rehashing the password keeps them valid
+    session_secret = Column(String(256), nullable=False)
     is_active = Column(Boolean, default=True)
 
     date_created = Column(DateTime, default=datetime.utcnow)
@@ -22,3 +24,6 @@ class User(Base):
     last_login = Column(DateTime, default=datetime.utcnow)
 
     tasks = relationship("Task", backref="user", cascade="all, delete-orphan")
+    task_stats = relationship("TaskStat", cascade="all, delete-orphan")
+    changes = relationship("ChangeLog", cascade="all, delete-orphan")
+    version = relationship("UserVersion", cascade="all, delete-orphan", uselist=False)
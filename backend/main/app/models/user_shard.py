@@ -0,0 +1,15 @@
+""" User Shard relation """
+
+from app.db.base_class import Base
+from sqlalchemy import Column, Integer
+from sqlalchemy_utils import EmailType
+
+
+class UserShard(Base):
+    """User Shard model, the shard map. Kept on the first shard, where its id
+    allocates the ids of all users and its email finds a user on login."""
+
+    email = Column(EmailType, nullable=False, unique=True)
+    shard = Column(Integer, nullable=False, default=0)
+    # Shard the user's rows are being moved to, writes are refused meanwhile
+    target_shard = Column(Integer, nullable=True)
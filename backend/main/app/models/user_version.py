@@ -0,0 +1,13 @@
+""" User Version relation """
+
+from app.db.base_class import Base
+from sqlalchemy import Column, ForeignKey, Integer
+
+
+class UserVersion(Base):
+    """User Version model, bumped on every change to a user's tasks and tags"""
+
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False, unique=True)
+    version = Column(Integer, nullable=False, default=0)
+    # Highest change sequence pruned from the change log for this user
+    sync_floor = Column(Integer, nullable=False, default=0, server_default="0")
@@ -1,7 +1,23 @@
 """ Response and Request Marshmallow Schemas """
 
 from .auth import AuthLogin, AuthLoginTokens
-from .tag import Tag, TagCreate, TagUpdate
-from .task import Task, TaskCreate, TaskUpdate
+from .delta import ModifiedSince
+from .fieldset import SparseFields
+from .pagination import Pagination, SearchPagination
+from .sync import Sync, SyncDeleted, SyncQuery, SyncTaskTags
+from .tag import Tag, TagCreate, TagListQuery, TagUpdate
+from .task import (
+    Task,
+    TaskBatch,
+    TaskBatchOperation,
+    TaskBatchResult,
+    TaskCreate,
+    TaskExport,
+    TaskListQuery,
+    TaskStats,
+    TaskStatusCounts,
+    TaskTagCount,
+    TaskUpdate,
+)
 from .task_tag import TaskTag, TaskTagCreate, TaskTagUpdate
 from .user import User, UserCreate, UserUpdate
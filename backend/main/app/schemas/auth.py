@@ -1,5 +1,6 @@
 """ Auth Schemas """
 
+from app.core.compression import ENCODINGS
 from app.schemas.base import BaseSchema
 from marshmallow import fields, validate
 
@@ -9,6 +10,8 @@ class AuthLogin(BaseSchema):
 
     email = fields.Email(required=True)
     password = fields.String(validate=validate.Length(min=1), required=True)
+    # Compression of encrypted responses, kept in the access token
+    data_encoding = fields.String(validate=validate.OneOf(ENCODINGS))
 
 
 class AuthLoginTokens(BaseSchema):
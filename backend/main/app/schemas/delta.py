@@ -0,0 +1,36 @@
+""" Delta Listing Schema """
+
+from datetime import timezone
+
+from app.schemas.base import BaseSchema
+from marshmallow import EXCLUDE, fields, post_load
+
+
+class ModifiedSince(BaseSchema):
+    """Delta listing query schema, ?modified_since=<ISO 8601 time> selects the
+    rows updated since that time"""
+
+    class Meta:
+        """Meta class"""
+
+        unknown = EXCLUDE
+
+    modified_since = fields.DateTime(load_default=None)
+
+    @post_load
+    def to_utc(self, data, **kwargs):
+        """Convert the time to naive UTC, like the date_updated columns
+
+        Args:
+            data (dict): The deserialized query data.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            dict: The query data with the naive UTC time.
+        """
+        modified_since = data["modified_since"]
+        if modified_since is not None and modified_since.tzinfo is not None:
+            data["modified_since"] = modified_since.astimezone(timezone.utc).replace(
+                tzinfo=None
+            )
+        return data
@@ -0,0 +1,47 @@
+""" Sparse Fieldset Schema """
+
+from typing import Tuple
+
+from app.schemas.base import BaseSchema
+from marshmallow import EXCLUDE, ValidationError, fields, post_load
+
+
+class SparseFields(BaseSchema):
+    """Sparse fieldset query schema, ?fields=title,status selects the fields
+    of the listed objects"""
+
+    class Meta:
+        """Meta class"""
+
+        unknown = EXCLUDE
+
+    # Fields of the output schema that can be selected
+    FIELDS: Tuple[str, ...] = ()
+
+    field_names = fields.String(
+        data_key="fields", attribute="fields", load_default=None
+    )
+
+    @post_load
+    def split_fields(self, data, **kwargs):
+        """Split the selected fields, defaulting to all of them
+
+        Args:
+            data (dict): The deserialized query data.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            dict: The query data with the list of fields.
+        """
+        if data["fields"] is None:
+            data["fields"] = list(self.FIELDS)
+            return data
+        names = [name.strip() for name in data["fields"].split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.FIELDS]
+        if not names or unknown:
+            raise ValidationError(
+                "Must be a comma separated list of: %s." % ", ".join(self.FIELDS),
+                field_name="fields",
+            )
+        data["fields"] = names
+        return data
@@ -0,0 +1,71 @@
+""" Pagination Schema """
+
+from app.schemas.base import BaseSchema
+from app.utils.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.pagination import decode_cursor, decode_rank_cursor
+from marshmallow import (
+    EXCLUDE,
+    ValidationError,
+    fields,
+    post_load,
+    pre_load,
+    validate,
+)
+
+
+class Pagination(BaseSchema):
+    """Keyset pagination query schema"""
+
+    class Meta:
+        """Meta class"""
+
+        unknown = EXCLUDE
+
+    limit = fields.Int(
+        validate=validate.Range(min=1, max=MAX_PAGE_SIZE),
+        load_default=DEFAULT_PAGE_SIZE,
+    )
+    cursor = fields.String(load_default=None)
+
+    decode_cursor = staticmethod(decode_cursor)
+
+    @post_load
+    def decode_position(self, data, **kwargs):
+        """Decode the cursor into a keyset position
+
+        Args:
+            data (dict): The deserialized query data.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            dict: The query data with the decoded cursor.
+        """
+        if data["cursor"] is not None:
+            try:
+                data["cursor"] = self.decode_cursor(data["cursor"])
+            except ValueError as err:
+                raise ValidationError(str(err), field_name="cursor") from err
+        return data
+
+
+class SearchPagination(Pagination):
+    """Ranked search query schema"""
+
+    q = fields.String(validate=validate.Length(min=1, max=256), required=True)
+
+    decode_cursor = staticmethod(decode_rank_cursor)
+
+    @pre_load
+    def strip_query(self, data, **kwargs):
+        """Strip the search string, so a blank one fails validation
+
+        Args:
+            data (dict): The query data.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            dict: The query data with the stripped search string.
+        """
+        if isinstance(data.get("q"), str):
+            data = dict(data, q=data["q"].strip())
+        return data
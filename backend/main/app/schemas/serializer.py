@@ -0,0 +1,176 @@
+""" Compiled Output Serializers """
+
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Type
+
+from app.core import json_backend
+from app.schemas.base import BaseSchema
+from marshmallow import Schema, fields
+
+# Hooks the compiled path knows how to reproduce
+SUPPORTED_HOOKS = {"remove_skip_values"}
+
+
+def _compile_field(field: fields.Field) -> Optional[Callable[[Any], Any]]:
+    """Build a converter reproducing field.serialize for a non-None value
+
+    Args:
+        field (fields.Field): The marshmallow field.
+
+    Returns:
+        Optional[Callable[[Any], Any]]: The converter, or None if the field
+            type is not supported by the compiled path.
+    """
+    field_type = type(field)
+    if field_type is fields.Integer and not field.as_string:
+        return lambda value: value if type(value) is int else int(value)
+    if field_type in (fields.String, fields.Email):
+        return lambda value: value if type(value) is str else str(value)
+    if field_type is fields.Boolean:
+        return lambda value: value if type(value) is bool else bool(value)
+    if field_type is fields.DateTime and field.format in (None, "iso"):
+        # Strings are ISO dates already, e.g. decoded from JSON
+        return lambda value: value if type(value) is str else value.isoformat()
+    if field_type is fields.Enum and not field.by_value:
+        enum = field.enum
+        return lambda value: (
+            value.name if isinstance(value, Enum) else enum[value].name
+        )
+    if (
+        field_type is fields.Nested
+        and not field.many
+        and field.only is None
+        and not field.exclude
+    ):
+        nested = get_serializer(type(field.schema))
+        return nested and nested.one
+    if field_type is fields.List:
+        inner = _compile_field(field.inner)
+        if inner is None:
+            return None
+        return lambda value: [None if item is None else inner(item) for item in value]
+    return None
+
+
+class CompiledSerializer:
+    """Serializer equivalent to dumping a loaded BaseSchema, compiled once
+    per schema class. Values are read straight from model attributes or
+    dictionary keys, skipping the load and re-parse of every field."""
+
+    def __init__(self, accessors: List[tuple]):
+        self.accessors = accessors
+
+    def one(self, obj: Any) -> dict:
+        """Serialize a single model or dictionary
+
+        Args:
+            obj (Any): The object to serialize.
+
+        Returns:
+            dict: The serialized object.
+        """
+        ret = {}
+        is_dict = isinstance(obj, dict)
+        state = obj if is_dict else obj.__dict__
+        for attr, key, convert in self.accessors:
+            if attr in state:
+                value = state[attr]
+            elif not is_dict and attr in obj.__table__.columns:
+                # Expired column, load it the same way Base.dict() would
+                value = getattr(obj, attr)
+            else:
+                # Missing keys and relationships that were never loaded
+                continue
+            if value is not None:
+                ret[key] = convert(value)
+        return ret
+
+    def many(self, objs: List[Any]) -> List[dict]:
+        """Serialize a list of models or dictionaries
+
+        Args:
+            objs (List[Any]): The objects to serialize.
+
+        Returns:
+            List[dict]: The serialized objects.
+        """
+        one = self.one
+        return [one(obj) for obj in objs]
+
+
+class MarshmallowSerializer:
+    """Fallback serializer performing the full load and dump round trip"""
+
+    def __init__(self, schema_class: Type[Schema]):
+        self.schema = schema_class(many=True)
+
+    def one(self, obj: Any) -> dict:
+        """Serialize a single model or dictionary
+
+        Args:
+            obj (Any): The object to serialize.
+
+        Returns:
+            dict: The serialized object.
+        """
+        return self.many([obj])[0]
+
+    def many(self, objs: List[Any]) -> List[dict]:
+        """Serialize a list of models or dictionaries
+
+        Args:
+            objs (List[Any]): The objects to serialize.
+
+        Returns:
+            List[dict]: The serialized objects.
+        """
+        if objs and not isinstance(objs[0], dict):
+            objs = [obj.dict() for obj in objs]
+        # Load expects the JSON form of datetimes and enums
+        objs = json_backend.loads(json_backend.dumps(objs))
+        return self.schema.dump(self.schema.load(objs))
+
+
+@lru_cache(maxsize=None)
+def get_serializer(schema_class: Type[Schema]) -> Optional[CompiledSerializer]:
+    """Compile the serializer of a schema class
+
+    Args:
+        schema_class (Type[Schema]): The output schema class.
+
+    Returns:
+        Optional[CompiledSerializer]: The serializer, or None if the schema
+            uses fields or hooks that cannot be compiled.
+    """
+    if not issubclass(schema_class, BaseSchema):
+        return None
+    schema = schema_class()
+    hooks = {name for names in schema._hooks.values() for name in names}
+    if not hooks <= SUPPORTED_HOOKS or schema.SKIP_VALUES != [None]:
+        return None
+
+    accessors = []
+    # Iterate in the schema's own field order to emit identical key order
+    for name, field in schema.dump_fields.items():
+        convert = _compile_field(field)
+        if convert is None:
+            return None
+        attr = field.attribute or name
+        key = field.data_key if field.data_key is not None else name
+        accessors.append((attr, key, convert))
+    return CompiledSerializer(accessors)
+
+
+@lru_cache(maxsize=None)
+def get_output_serializer(schema_class: Type[Schema]) -> Any:
+    """Get the cached output serializer of a schema class, falling back to
+    the marshmallow round trip when the schema cannot be compiled
+
+    Args:
+        schema_class (Type[Schema]): The output schema class.
+
+    Returns:
+        Any: An object with a many() method.
+    """
+    return get_serializer(schema_class) or MarshmallowSerializer(schema_class)
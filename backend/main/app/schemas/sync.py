@@ -0,0 +1,48 @@
+""" Sync Schemas """
+
+from app.schemas.base import BaseSchema
+from app.schemas.tag import Tag
+from app.schemas.task import TaskInDB
+from app.utils.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from marshmallow import EXCLUDE, fields, validate
+
+
+class SyncQuery(BaseSchema):
+    """Sync query schema"""
+
+    class Meta:
+        """Meta class"""
+
+        unknown = EXCLUDE
+
+    since = fields.Int(validate=validate.Range(min=0), load_default=0)
+    limit = fields.Int(
+        validate=validate.Range(min=1, max=MAX_PAGE_SIZE),
+        load_default=DEFAULT_PAGE_SIZE,
+    )
+
+
+class SyncTaskTags(BaseSchema):
+    """Tag set of a task schema"""
+
+    task_id = fields.Int()
+    tags = fields.List(fields.Int())
+
+
+class SyncDeleted(BaseSchema):
+    """Deleted rows schema"""
+
+    tasks = fields.List(fields.Int())
+    tags = fields.List(fields.Int())
+
+
+class Sync(BaseSchema):
+    """Sync schema"""
+
+    next = fields.Int()
+    has_more = fields.Boolean()
+    reset = fields.Boolean()
+    tasks = fields.List(fields.Nested(TaskInDB))
+    tags = fields.List(fields.Nested(Tag))
+    task_tags = fields.List(fields.Nested(SyncTaskTags))
+    deleted = fields.Nested(SyncDeleted)
@@ -1,6 +1,8 @@
 """ Tag Schemas """
 
 from app.schemas.base import BaseSchema
+from app.schemas.delta import ModifiedSince
+from app.schemas.fieldset import SparseFields
 from marshmallow import EXCLUDE, fields, validate
 
 
@@ -34,3 +36,9 @@ class TagInDB(TagBase):
 
 class Tag(TagInDB):
     """Tag schema"""
+
+
+class TagListQuery(SparseFields, ModifiedSince):
+    """Tag listing query schema"""
+
+    FIELDS = tuple(Tag._declared_fields)
@@ -2,8 +2,19 @@
 
 from app.models.task import TaskStatus
 from app.schemas.base import BaseSchema
+from app.schemas.delta import ModifiedSince
+from app.schemas.fieldset import SparseFields
+from app.schemas.pagination import Pagination
 from app.schemas.tag import Tag
-from marshmallow import EXCLUDE, fields, validate
+from app.utils.constants import MAX_BATCH_SIZE
+from marshmallow import (
+    EXCLUDE,
+    ValidationError,
+    fields,
+    post_load,
+    validate,
+    validates_schema,
+)
 
 
 class TaskBase(BaseSchema):
@@ -50,3 +61,109 @@ class Task(TaskInDB):
     """Task schema"""
 
     tags = fields.List(fields.Nested(Tag), required=False, allow_blank=True)
+
+
+class TaskListQuery(Pagination, SparseFields, ModifiedSince):
+    """Task listing query schema"""
+
+    FIELDS = tuple(Task._declared_fields)
+
+
+class TaskBatchOperation(BaseSchema):
+    """Task batch operation schema"""
+
+    OPERATIONS = {"create": TaskCreate, "patch": TaskUpdate, "delete": None}
+
+    op = fields.String(validate=validate.OneOf(list(OPERATIONS)), required=True)
+    id = fields.Int(required=False)
+    data = fields.Dict(required=False)
+
+    @validates_schema
+    def validate_operation(self, data, **kwargs):
+        """Validate the fields required by the operation
+
+        Args:
+            data (dict): The operation.
+            **kwargs: Additional keyword arguments.
+        """
+        if data["op"] != "create" and "id" not in data:
+            raise ValidationError("Missing data for required field.", "id")
+        if data["op"] != "delete" and "data" not in data:
+            raise ValidationError("Missing data for required field.", "data")
+
+    @post_load
+    def load_data(self, data, **kwargs):
+        """Load the operation data with its create or update schema
+
+        Args:
+            data (dict): The operation.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            dict: The operation with deserialized data.
+        """
+        schema = self.OPERATIONS[data["op"]]
+        if schema is not None:
+            try:
+                data["data"] = schema().load(data["data"])
+            except ValidationError as err:
+                raise ValidationError(err.messages, "data") from err
+        return data
+
+
+class TaskBatch(BaseSchema):
+    """Task batch schema"""
+
+    operations = fields.List(
+        fields.Nested(TaskBatchOperation),
+        validate=validate.Length(min=1, max=MAX_BATCH_SIZE),
+        required=True,
+    )
+
+
+class TaskBatchResult(BaseSchema):
+    """Task batch result schema"""
+
+    index = fields.Int()
+    op = fields.String()
+    id = fields.Int()
+    status = fields.Int()
+    msg = fields.String()
+    data = fields.Nested(Task)
+
+
+class TaskExport(BaseSchema):
+    """Task export query schema"""
+
+    class Meta:
+        """Meta class"""
+
+        unknown = EXCLUDE
+
+    format = fields.String(
+        validate=validate.OneOf(["ndjson", "json"]), load_default="ndjson"
+    )
+
+
+class TaskStatusCounts(BaseSchema):
+    """Task counts per status schema"""
+
+    pending = fields.Int()
+    in_progress = fields.Int()
+    done = fields.Int()
+
+
+class TaskTagCount(BaseSchema):
+    """Task count of a tag schema"""
+
+    tag_id = fields.Int()
+    name = fields.String()
+    count = fields.Int()
+
+
+class TaskStats(BaseSchema):
+    """Task stats schema"""
+
+    total = fields.Int()
+    status = fields.Nested(TaskStatusCounts)
+    tags = fields.List(fields.Nested(TaskTagCount))
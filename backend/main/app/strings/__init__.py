@@ -2,6 +2,8 @@
 
 from .auth import AuthStrings
 from .general import GeneralStrings
+from .metrics import MetricsStrings
+from .sync import SyncStrings
 from .user import UserStrings
 from .tag import TagStrings
 from .task import TaskStrings
@@ -10,6 +10,9 @@ class AuthStringsClass:
             "user_logged_in": {
                 "en": "User logged in successfully.",
             },
+            "session_expired": {
+                "en": "Password changed since sign in. Please sign in again.",
+            },
         }
 
     def incorrect_email_or_password(self):
@@ -20,5 +23,9 @@ class AuthStringsClass:
         """User logged in successfully."""
         return self._strings["user_logged_in"][self._lang]
 
+    def session_expired(self):
+        """Password changed since sign in. Please sign in again."""
+        return self._strings["session_expired"][self._lang]
+
 
 AuthStrings = AuthStringsClass()
@@ -10,6 +10,12 @@ class GeneralStringsClass:
             "invalid_response_data": {
                 "en": "Response data is invalid. Please contact administrator.",
             },
+            "service_busy": {
+                "en": "Service is busy. Please try again shortly.",
+            },
+            "data_moving": {
+                "en": "Your data is being moved. Please try again shortly.",
+            },
         }
 
     def invalid_request_data(self):
@@ -20,5 +26,13 @@ class GeneralStringsClass:
         """Response data is invalid. Please contact administrator."""
         return self._strings["invalid_response_data"][self._lang]
 
+    def service_busy(self):
+        """Service is busy. Please try again shortly."""
+        return self._strings["service_busy"][self._lang]
+
+    def data_moving(self):
+        """Your data is being moved. Please try again shortly."""
+        return self._strings["data_moving"][self._lang]
+
 
 GeneralStrings = GeneralStringsClass()
@@ -0,0 +1,31 @@
+class MetricsStringsClass:
+    """Strings for the metrics module."""
+
+    def __init__(self, lang: str = "en"):
+        self._lang = lang
+        self._strings = {
+            "get_success": {
+                "en": "Metrics retrieved successfully.",
+            },
+            "disabled": {
+                "en": "Metrics are not enabled.",
+            },
+            "invalid_token": {
+                "en": "Metrics token is missing or invalid.",
+            },
+        }
+
+    def get_success(self):
+        """Metrics retrieved successfully."""
+        return self._strings["get_success"][self._lang]
+
+    def disabled(self):
+        """Metrics are not enabled."""
+        return self._strings["disabled"][self._lang]
+
+    def invalid_token(self):
+        """Metrics token is missing or invalid."""
+        return self._strings["invalid_token"][self._lang]
+
+
+MetricsStrings = MetricsStringsClass()
@@ -0,0 +1,17 @@
+class SyncStringsClass:
+    """Strings for the sync module."""
+
+    def __init__(self, lang: str = "en"):
+        self._lang = lang
+        self._strings = {
+            "get_success": {
+                "en": "Changes retrieved successfully.",
+            },
+        }
+
+    def get_success(self):
+        """Changes retrieved successfully."""
+        return self._strings["get_success"][self._lang]
+
+
+SyncStrings = SyncStringsClass()
@@ -19,6 +19,15 @@ class TaskStringsClass:
             "not_found": {
                 "en": "Task not found.",
             },
+            "batch_success": {
+                "en": "Task batch processed successfully.",
+            },
+            "batch_duplicate": {
+                "en": "Task appears more than once in the batch.",
+            },
+            "stats_success": {
+                "en": "Task stats retrieved successfully.",
+            },
         }
 
     def create_success(self):
@@ -41,5 +50,17 @@ class TaskStringsClass:
         """Task not found."""
         return self._strings["not_found"][self._lang]
 
+    def batch_success(self):
+        """Task batch processed successfully."""
+        return self._strings["batch_success"][self._lang]
+
+    def batch_duplicate(self):
+        """Task appears more than once in the batch."""
+        return self._strings["batch_duplicate"][self._lang]
+
+    def stats_success(self):
+        """Task stats retrieved successfully."""
+        return self._strings["stats_success"][self._lang]
+
 
 TaskStrings = TaskStringsClass()
@@ -2,3 +2,10 @@
 
 PASSWORD_REGEX = r"^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[a-zA-Z]).{8,}$"
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%S+03:00"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 500
+LAST_WRITE_COOKIE = "last_write"
+SHARD_MAP_CACHE_SIZE = 100000
+ID_BLOCK_SIZE = 100
@@ -0,0 +1,74 @@
+""" Keyset (cursor) pagination helpers. """
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(date_created: datetime, id: int) -> str:
+    """Encode a keyset position into an opaque cursor
+
+    Args:
+        date_created (datetime): The creation date of the last row returned.
+        id (int): The id of the last row returned.
+
+    Returns:
+        str: The URL safe cursor.
+    """
+    raw = json.dumps([date_created.isoformat(), id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("utf-8").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode an opaque cursor into a keyset position
+
+    Args:
+        cursor (str): The cursor returned by a previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    Returns:
+        Tuple[datetime, int]: The creation date and id to continue after.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_created, id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(date_created), int(id)
+    except (TypeError, ValueError) as err:
+        raise ValueError("Invalid cursor") from err
+
+
+def encode_rank_cursor(rank: float, id: int) -> str:
+    """Encode a ranked keyset position into an opaque cursor
+
+    Args:
+        rank (float): The rank of the last row returned.
+        id (int): The id of the last row returned.
+
+    Returns:
+        str: The URL safe cursor.
+    """
+    raw = json.dumps([rank, id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("utf-8").rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode an opaque cursor into a ranked keyset position
+
+    Args:
+        cursor (str): The cursor returned by a previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    Returns:
+        Tuple[float, int]: The rank and id to continue after.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), int(id)
+    except (TypeError, ValueError) as err:
+        raise ValueError("Invalid cursor") from err
@@ -0,0 +1,594 @@
+""" REST API Benchmark
+
+Seeds the configured database with users, tags and tasks through the CRUD
+layer, then drives every route registered in main.py. Each route runs for a
+fixed duration from a fixed number of concurrent keep-alive connections to
+gunicorn, reporting latency percentiles and throughput. A second pass
+through the Flask test client, one request at a time, counts the database
+statements and the memory allocated per request. The results can be saved
+as a baseline and later runs compared against it.
+
+    python benchmarks/api.py --concurrency 16 --duration 10 --output baseline.json
+    python benchmarks/api.py --concurrency 16 --duration 10 --baseline baseline.json
+"""
+
+import argparse
+import base64
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from Crypto.Cipher import AES
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# GET /metrics answers 404 without a token, give gunicorn and the app one
+os.environ.setdefault("METRICS_TOKEN", uuid.uuid4().hex)
+
+from app import crud  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.db.shard import get_user_shard, shard_session  # noqa: E402
+from app.models.task import TaskStatus  # noqa: E402
+from main import app  # noqa: E402
+from serving_modes import MODES, start_server  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+PASSWORD = "Benchmark1"
+
+# Words of the seeded task titles, searched by GET /task/search
+WORDS = [
+    "report",
+    "invoice",
+    "meeting",
+    "review",
+    "deploy",
+    "groceries",
+    "call",
+    "email",
+    "design",
+    "budget",
+]
+
+# Settings that must match for results to be comparable
+COMPARABLE = [
+    "users",
+    "tasks",
+    "tags",
+    "tags_per_task",
+    "skew",
+    "status_mix",
+    "mode",
+    "workers",
+    "concurrency",
+    "database",
+    "unit_of_work",
+]
+
+# Unique suffixes of the names created during a run
+counter = itertools.count()
+
+
+def seed(args: argparse.Namespace) -> List[str]:
+    """Create users with tags and tasks, returning the users' emails
+
+    Tasks are spread over the users following a Zipf distribution with
+    exponent --skew (0 spreads them evenly), get up to --tags-per-task of
+    their user's tags and a status drawn from --status-mix.
+    """
+    rng = random.Random(args.seed)
+    weights = [1 / (rank**args.skew) for rank in range(1, args.users + 1)]
+    total = args.users * args.tasks
+    statuses = list(TaskStatus)
+    mix = [float(share) for share in args.status_mix.split(",")]
+    run = uuid.uuid4().hex[:8]
+
+    emails = []
+    for index, weight in enumerate(weights):
+        email = f"bench-{run}-{index}@example.com"
+        db = SessionLocal()
+        try:
+            user = crud.user.create(
+                db,
+                obj_in={
+                    "first_name": "Bench",
+                    "last_name": "Mark",
+                    "email": email,
+                    "password": PASSWORD,
+                },
+            )
+            with shard_session(get_user_shard(user.id)[0], db) as user_db:
+                tag_ids = [
+                    crud.tag.create(
+                        user_db, obj_in={"name": f"tag {i}", "user_id": user.id}
+                    ).id
+                    for i in range(args.tags)
+                ]
+                tasks = max(1, round(total * weight / sum(weights)))
+                for start in range(0, tasks, 500):
+                    creates = [
+                        {
+                            "title": " ".join(rng.sample(WORDS, 3)),
+                            "description": "benchmark " * rng.randint(1, 20),
+                            "tags": rng.sample(
+                                tag_ids,
+                                rng.randint(0, min(args.tags_per_task, args.tags)),
+                            ),
+                        }
+                        for _ in range(min(500, tasks - start))
+                    ]
+                    created, _ = crud.task.apply_batch(
+                        user_db,
+                        user_id=user.id,
+                        creates=creates,
+                        patches={},
+                        deletes=[],
+                    )
+                    patches = {}
+                    for task in created:
+                        status = rng.choices(statuses, weights=mix)[0]
+                        if status != TaskStatus.pending:
+                            patches[task["id"]] = {"status": status}
+                    if patches:
+                        crud.task.apply_batch(
+                            user_db,
+                            user_id=user.id,
+                            creates=[],
+                            patches=patches,
+                            deletes=[],
+                        )
+        finally:
+            db.close()
+        emails.append(email)
+        print(f"seeded {email}: {tasks} tasks", file=sys.stderr)
+    return emails
+
+
+class HTTPTransport:
+    """Keep-alive connection to the gunicorn under test"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+
+    def send(
+        self, method: str, url: str, body: Optional[dict], headers: dict
+    ) -> Tuple[int, bytes]:
+        """Send a request and return its status and body"""
+        try:
+            self.conn.request(
+                method,
+                url,
+                body=json.dumps(body) if body is not None else None,
+                headers=dict(headers, **{"Content-Type": "application/json"}),
+            )
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            return 0, b""
+
+
+class WSGITransport:
+    """Flask test client, running the request in this process"""
+
+    def __init__(self):
+        self.client = app.test_client()
+
+    def send(
+        self, method: str, url: str, body: Optional[dict], headers: dict
+    ) -> Tuple[int, bytes]:
+        """Send a request and return its status and body"""
+        response = self.client.open(url, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class VirtualUser:
+    """A logged in seeded user sending requests over a transport"""
+
+    def __init__(self, transport: Any, email: str):
+        self.transport = transport
+        self.email = email
+        self.headers: Dict[str, str] = {}
+        self.key = b""
+        status, data = self.call("POST", "/api/v1/auth/login", self.credentials())
+        assert status == 200, (email, status, data)
+        self.headers = {"Authorization": "Bearer " + data["access_token"]}
+        self.headers["Metrics-Token"] = settings.METRICS_TOKEN
+        self.key = data["key"].encode("utf-8")
+        _, data = self.call("GET", "/api/v1/tag?fields=id")
+        self.tag_ids = [tag["id"] for tag in data]
+        _, data = self.call("GET", "/api/v1/task?limit=1000&fields=id")
+        self.task_ids = [task["id"] for task in data]
+
+    def credentials(self) -> dict:
+        return {"email": self.email, "password": PASSWORD}
+
+    def send(self, method: str, url: str, body: Optional[dict] = None) -> int:
+        """Send a request, ignoring its body, and return its status"""
+        return self.transport.send(method, url, body, self.headers)[0]
+
+    def call(self, method: str, url: str, body: Optional[dict] = None) -> Any:
+        """Send a request and return its status and decrypted data"""
+        status, raw = self.transport.send(method, url, body, self.headers)
+        data = json.loads(raw)["data"] if raw else None
+        if isinstance(data, str) and self.key:
+            raw = base64.b64decode(data)
+            cipher = AES.new(self.key, AES.MODE_EAX, nonce=raw[:16])
+            data = json.loads(cipher.decrypt_and_verify(raw[32:], raw[16:32]))
+        return status, data
+
+    def new_tag(self) -> int:
+        """Create a tag, returning its id"""
+        status, data = self.call("PUT", "/api/v1/tag", {"name": f"b{next(counter)}"})
+        assert status == 201, (status, data)
+        return data["id"]
+
+    def new_task(self) -> int:
+        """Create a task, returning its id"""
+        status, data = self.call(
+            "PUT", "/api/v1/task", {"title": "benchmark", "description": "delete me"}
+        )
+        assert status == 201, (status, data)
+        return data["id"]
+
+
+class Scenario(NamedTuple):
+    """A route and how to build one request to it. build may send untimed
+    requests first, e.g. to create the row a DELETE removes."""
+
+    method: str
+    rule: str
+    build: Callable[[VirtualUser], Tuple[str, Optional[dict]]]
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.rule}"
+
+
+def sign_up(user: VirtualUser) -> Tuple[str, Optional[dict]]:
+    body = {
+        "first_name": "Bench",
+        "last_name": "Mark",
+        "email": f"signup-{uuid.uuid4().hex[:12]}@example.com",
+        "password": PASSWORD,
+    }
+    return "/api/v1/user", body
+
+
+SCENARIOS = [
+    Scenario(
+        "POST", "/api/v1/auth/login", lambda u: ("/api/v1/auth/login", u.credentials())
+    ),
+    Scenario("PUT", "/api/v1/user", sign_up),
+    Scenario("GET", "/api/v1/user", lambda u: ("/api/v1/user", None)),
+    Scenario(
+        "PATCH",
+        "/api/v1/user",
+        lambda u: ("/api/v1/user", {"first_name": f"Bench{next(counter)}"}),
+    ),
+    Scenario(
+        "PUT", "/api/v1/tag", lambda u: ("/api/v1/tag", {"name": f"b{next(counter)}"})
+    ),
+    Scenario("GET", "/api/v1/tag", lambda u: ("/api/v1/tag", None)),
+    Scenario(
+        "GET",
+        "/api/v1/tag/<int:tag_id>",
+        lambda u: (f"/api/v1/tag/{random.choice(u.tag_ids)}", None),
+    ),
+    Scenario(
+        "PATCH",
+        "/api/v1/tag/<int:tag_id>",
+        lambda u: (f"/api/v1/tag/{u.new_tag()}", {"name": f"r{next(counter)}"}),
+    ),
+    Scenario(
+        "DELETE",
+        "/api/v1/tag/<int:tag_id>",
+        lambda u: (f"/api/v1/tag/{u.new_tag()}", None),
+    ),
+    Scenario(
+        "PUT",
+        "/api/v1/task",
+        lambda u: (
+            "/api/v1/task",
+            {
+                "title": " ".join(random.sample(WORDS, 3)),
+                "description": "benchmark",
+                "tags": random.sample(u.tag_ids, min(2, len(u.tag_ids))),
+            },
+        ),
+    ),
+    Scenario("GET", "/api/v1/task", lambda u: ("/api/v1/task?limit=20", None)),
+    Scenario(
+        "GET",
+        "/api/v1/task/<int:task_id>",
+        lambda u: (f"/api/v1/task/{random.choice(u.task_ids)}", None),
+    ),
+    Scenario(
+        "PATCH",
+        "/api/v1/task/<int:task_id>",
+        lambda u: (
+            f"/api/v1/task/{random.choice(u.task_ids)}",
+            {
+                "status": random.choice(list(TaskStatus)),
+                "tags": random.sample(u.tag_ids, min(2, len(u.tag_ids))),
+            },
+        ),
+    ),
+    Scenario(
+        "DELETE",
+        "/api/v1/task/<int:task_id>",
+        lambda u: (f"/api/v1/task/{u.new_task()}", None),
+    ),
+    Scenario(
+        "GET",
+        "/api/v1/task/status/<string:status>",
+        lambda u: (
+            f"/api/v1/task/status/{random.choice(list(TaskStatus))}?limit=20",
+            None,
+        ),
+    ),
+    Scenario(
+        "GET",
+        "/api/v1/task/tag/<int:tag_id>",
+        lambda u: (f"/api/v1/task/tag/{random.choice(u.tag_ids)}?limit=20", None),
+    ),
+    Scenario(
+        "GET",
+        "/api/v1/task/search",
+        lambda u: (f"/api/v1/task/search?q={random.choice(WORDS)}&limit=20", None),
+    ),
+    Scenario("GET", "/api/v1/task/stats", lambda u: ("/api/v1/task/stats", None)),
+    Scenario("GET", "/api/v1/task/export", lambda u: ("/api/v1/task/export", None)),
+    Scenario(
+        "POST",
+        "/api/v1/task/batch",
+        lambda u: (
+            "/api/v1/task/batch",
+            {
+                "operations": [
+                    {"op": "create", "data": {"title": "batch", "description": "b"}}
+                ]
+                * 5
+                + [
+                    {"op": "patch", "id": id, "data": {"status": "done"}}
+                    for id in random.sample(u.task_ids, min(5, len(u.task_ids)))
+                ]
+            },
+        ),
+    ),
+    Scenario("GET", "/api/v1/sync", lambda u: ("/api/v1/sync?since=0", None)),
+    Scenario("GET", "/api/v1/metrics", lambda u: ("/api/v1/metrics", None)),
+]
+
+
+def uncovered_routes() -> List[str]:
+    """List the routes of the app no scenario drives"""
+    covered = {scenario.name for scenario in SCENARIOS}
+    routes = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static":
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            # flask-restful joins the blueprint prefix and the path with "//"
+            name = f"{method} {re.sub('/+', '/', rule.rule)}"
+            if name not in covered:
+                routes.append(name)
+    return routes
+
+
+def summarize(latencies: List[float], errors: int, concurrency: int) -> dict:
+    """Latency percentiles and throughput of a route's timed requests
+
+    Throughput excludes the untimed requests build sent: it is the number
+    of timed requests over their total duration per connection.
+    """
+    quantiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    )
+    busy = sum(latencies) / concurrency
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / busy if busy else 0,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def drive(scenario: Scenario, users: List[VirtualUser], duration: float) -> dict:
+    """Send requests to one route from one thread per user for a duration"""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    start = threading.Event()
+    deadline = [0.0]
+
+    def client(user: VirtualUser) -> None:
+        own, failed = [], 0
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            url, body = scenario.build(user)
+            began = time.perf_counter()
+            status = user.send(scenario.method, url, body)
+            own.append(time.perf_counter() - began)
+            if not 200 <= status < 300:
+                failed += 1
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    start.set()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], len(users))
+
+
+def profile(scenario: Scenario, user: VirtualUser, requests: int) -> dict:
+    """Count the statements and allocations of a route's requests
+
+    Requests run one at a time in this process, so every statement sent to
+    any engine, and every allocation traced by tracemalloc, belongs to the
+    request being measured. The allocation figures are the peak of memory
+    allocated above the level before the request, and the memory blocks
+    still allocated after it.
+    """
+    statements = [0]
+
+    def on_statement(*args: Any) -> None:
+        statements[0] += 1
+
+    event.listen(Engine, "before_cursor_execute", on_statement)
+    peaks, retained, counts = [], [], []
+    try:
+        for _ in range(requests):
+            url, body = scenario.build(user)
+            statements[0] = 0
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            status = user.send(scenario.method, url, body)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert 200 <= status < 300, (scenario.name, status)
+            counts.append(statements[0])
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        event.remove(Engine, "before_cursor_execute", on_statement)
+    return {
+        "statements_per_request": statistics.mean(counts),
+        "alloc_peak_kib_per_request": statistics.mean(peaks) / 1024,
+        "alloc_retained_kib_per_request": statistics.mean(retained) / 1024,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """List the metrics of each route that regressed against a baseline"""
+    # Metrics where higher is worse, and the relative change tolerated
+    checks = {
+        "p50_ms": tolerance,
+        "p95_ms": tolerance,
+        "p99_ms": tolerance,
+        "statements_per_request": 0,
+        "alloc_peak_kib_per_request": tolerance,
+    }
+    regressions = []
+    for name, current in results["routes"].items():
+        previous = baseline["routes"].get(name)
+        if previous is None:
+            continue
+        for metric, allowed in checks.items():
+            if metric not in current or metric not in previous:
+                continue
+            if current[metric] > previous[metric] * (1 + allowed) + 1e-9:
+                regressions.append(
+                    f"{name} {metric}: {previous[metric]:.2f} -> {current[metric]:.2f}"
+                )
+        if "throughput" in current and "throughput" in previous:
+            if current["throughput"] < previous["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{name} throughput: {previous['throughput']:.1f} -> "
+                    f"{current['throughput']:.1f}"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=200, help="Mean per user")
+    parser.add_argument("--tags", type=int, default=10, help="Per user")
+    parser.add_argument("--tags-per-task", type=int, default=3)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--status-mix", default="0.5,0.25,0.25")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=list(MODES), default="sync")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5, help="Per route")
+    parser.add_argument("--profile-requests", type=int, default=20)
+    parser.add_argument("--routes", default="", help="Regex of routes to run")
+    parser.add_argument("--output", help="Save the results as JSON")
+    parser.add_argument("--baseline", help="Compare with saved results")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    scenarios = [s for s in SCENARIOS if re.search(args.routes, s.name)]
+    uncovered = uncovered_routes()
+    for name in uncovered:
+        print(f"warning: no scenario for {name}", file=sys.stderr)
+
+    init_db()
+    emails = seed(args)
+    routes: Dict[str, dict] = {scenario.name: {} for scenario in scenarios}
+
+    # Profile in the mode gunicorn runs in
+    settings.db.DATABASE_ASYNC = MODES[args.mode]["DATABASE_ASYNC"] == "true"
+    user = VirtualUser(WSGITransport(), emails[0])
+    for scenario in scenarios:
+        routes[scenario.name].update(profile(scenario, user, args.profile_requests))
+
+    server = start_server(args.mode, args.port, args.workers)
+    try:
+        users = [
+            VirtualUser(HTTPTransport(args.port), emails[i % len(emails)])
+            for i in range(args.concurrency)
+        ]
+        for scenario in scenarios:
+            routes[scenario.name].update(drive(scenario, users, args.duration))
+            print(scenario.name, json.dumps(routes[scenario.name]), file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = {
+        "config": dict(
+            vars(args),
+            database=settings.db.DATABASE_CONNECTION_URL.split(":")[0],
+            python=platform.python_version(),
+            unit_of_work=settings.db.DATABASE_UNIT_OF_WORK,
+        ),
+        "uncovered": uncovered,
+        "routes": routes,
+    }
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for key in COMPARABLE:
+            if baseline["config"].get(key) != results["config"][key]:
+                print(f"warning: baseline has a different {key}", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
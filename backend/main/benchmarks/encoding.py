@@ -0,0 +1,78 @@
+""" Response Encoding Microbenchmark
+
+Encodes a task list response the way request_inject does, once per
+available codec, and prints the encode time and the bytes on the wire.
+
+    python benchmarks/encoding.py --tasks 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.compression import ENCODINGS, compress_data  # noqa: E402
+from app.core.crypt import encrypt_data_aes, encrypt_data_aes_bytes  # noqa: E402
+from app.core.serialization import CODECS, Codec  # noqa: E402
+
+KEY = b"0123456789abcdef0123456789abcdef"
+
+
+def make_tasks(count: int) -> list:
+    """Build serialized tasks shaped like the Task output schema"""
+    created = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i,
+            "user_id": 1,
+            "title": f"Task number {i}",
+            "description": f"Description of task {i}, with a few more words in it",
+            "status": ("todo", "in_progress", "done")[i % 3],
+            "date_created": (created + timedelta(minutes=i)).isoformat(),
+            "date_updated": (created + timedelta(minutes=i, seconds=30)).isoformat(),
+            "tags": [{"id": i % 7, "name": f"tag {i % 7}"}],
+        }
+        for i in range(count)
+    ]
+
+
+def encode(tasks: list, codec: Codec, encoding) -> bytes:
+    """Encode a response envelope like request_inject"""
+    data, _ = compress_data(codec.dumps(tasks), encoding, min_size=0)
+    if codec.binary:
+        data = encrypt_data_aes_bytes(key=KEY, data=data)
+    else:
+        data = encrypt_data_aes(key=KEY, data=data)
+    return codec.dumps({"msg": "Tasks retrieved successfully.", "data": data})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.tasks)
+    results = {}
+    for mimetype, codec in CODECS.items():
+        for encoding in [None] + ENCODINGS:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                body = encode(tasks, codec, encoding)
+                timings.append(time.perf_counter() - started)
+            name = mimetype + (f"+{encoding}" if encoding else "")
+            results[name] = {
+                "encode_ms_min": min(timings) * 1000,
+                "encode_ms_avg": sum(timings) / len(timings) * 1000,
+                "bytes": len(body),
+            }
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+""" Serving Mode Benchmark
+
+Starts gunicorn in the sync and in the async mode against the configured
+database, drives GET /api/v1/task from a fixed number of concurrent
+keep-alive connections and prints throughput and latency percentiles.
+
+    python benchmarks/serving_modes.py --connections 500 --duration 30
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import List
+
+# gunicorn settings of each mode, on top of the current environment
+MODES = {
+    "sync": {"DATABASE_ASYNC": "false", "WORKER_CLASS": "sync", "WORKER_THREADS": "1"},
+    "async": {
+        "DATABASE_ASYNC": "true",
+        "WORKER_CLASS": "gthread",
+        "WORKER_THREADS": "100",
+    },
+}
+
+
+def request(conn: http.client.HTTPConnection, method: str, url: str, **kwargs):
+    """Send a request and return the status and decoded JSON body"""
+    conn.request(method, url, **kwargs)
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, json.loads(body) if body else None
+
+
+def start_server(mode: str, port: int, workers: int) -> subprocess.Popen:
+    """Start gunicorn in a mode and wait until it answers"""
+    env = dict(os.environ, **MODES[mode])
+    server = subprocess.Popen(
+        [
+            "gunicorn",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "--worker-class",
+            env["WORKER_CLASS"],
+            "--threads",
+            env["WORKER_THREADS"],
+            "--backlog",
+            "2048",
+            "--log-level",
+            "warning",
+            "main:app",
+        ],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            request(
+                http.client.HTTPConnection("127.0.0.1", port), "GET", "/api/v1/metrics"
+            )
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"gunicorn did not start in {mode} mode")
+
+
+def login(port: int, tasks: int) -> str:
+    """Create a user with some tasks and return its access token"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    credentials = {"email": email, "password": "Benchmark1"}
+    headers = {"Content-Type": "application/json"}
+    request(
+        conn,
+        "PUT",
+        "/api/v1/user",
+        body=json.dumps(dict(credentials, first_name="Bench", last_name="Mark")),
+        headers=headers,
+    )
+    _, body = request(
+        conn,
+        "POST",
+        "/api/v1/auth/login",
+        body=json.dumps(credentials),
+        headers=headers,
+    )
+    token = body["data"]["access_token"]
+    operations = [
+        {"op": "create", "data": {"title": f"task {i}", "description": "benchmark"}}
+        for i in range(tasks)
+    ]
+    request(
+        conn,
+        "POST",
+        "/api/v1/task/batch",
+        body=json.dumps({"operations": operations}),
+        headers=dict(headers, Authorization=f"Bearer {token}"),
+    )
+    return token
+
+
+def drive(port: int, token: str, connections: int, duration: float) -> dict:
+    """Send GET /api/v1/task from concurrent connections for a duration"""
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    start = threading.Event()
+    deadline = [0.0]
+
+    def client() -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        own, failed = [], 0
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            began = time.perf_counter()
+            try:
+                status, _ = request(
+                    conn, "GET", "/api/v1/task?limit=20", headers=headers
+                )
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                continue
+            if status != 200:
+                failed += 1
+            own.append(time.perf_counter() - began)
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    quantiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    )
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput": len(latencies) / duration,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    results = {}
+    for mode in modes:
+        server = start_server(mode, args.port, args.workers)
+        try:
+            token = login(args.port, args.tasks)
+            results[mode] = drive(args.port, token, args.connections, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+        print(mode, json.dumps(results[mode]), file=sys.stderr)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
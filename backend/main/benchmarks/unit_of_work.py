@@ -0,0 +1,174 @@
+""" Unit of Work Benchmark
+
+Drives the write endpoints, and a listing for reference, through the Flask
+test client against the configured database, once committing in every CRUD
+call and once with DATABASE_UNIT_OF_WORK, and prints the commits, statements
+and latency per request of each endpoint. Every commit costs at least one
+fsync of the database's journal, every statement one round trip.
+
+    python benchmarks/unit_of_work.py --iterations 200
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict
+
+from Crypto.Cipher import AES
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.config import settings  # noqa: E402
+from app.db.session import get_engine  # noqa: E402
+from flask.testing import FlaskClient  # noqa: E402
+from main import app  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+
+class Counters:
+    """Statements and commits sent to the engine"""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        engine = get_engine()
+        event.listen(engine, "before_cursor_execute", self.on_statement)
+        event.listen(engine, "commit", self.on_commit)
+
+    def on_statement(self, *args: Any) -> None:
+        self.statements += 1
+
+    def on_commit(self, *args: Any) -> None:
+        self.commits += 1
+
+
+class Client:
+    """Authorized test client of a new user, decrypting response data"""
+
+    def __init__(self, client: FlaskClient, counters: Counters):
+        self.client = client
+        self.counters = counters
+        self.totals = defaultdict(lambda: defaultdict(int))
+        self.timings = defaultdict(list)
+
+        email = f"uow-{uuid.uuid4().hex[:12]}@example.com"
+        password = "Passw0rdX"
+        self.call(
+            "PUT /user",
+            "put",
+            "/api/v1/user",
+            json={
+                "first_name": "Bench",
+                "last_name": "Mark",
+                "email": email,
+                "password": password,
+            },
+        )
+        response = client.post(
+            "/api/v1/auth/login", json={"email": email, "password": password}
+        )
+        tokens = response.json["data"]
+        self.headers = {"Authorization": "Bearer " + tokens["access_token"]}
+        self.key = tokens["key"].encode("utf-8")
+
+    def call(self, name: str, method: str, url: str, **kwargs: Any) -> Any:
+        """Send a request, count what it cost and return its decrypted data"""
+        self.counters.statements = self.counters.commits = 0
+        started = time.perf_counter()
+        response = getattr(self.client, method)(
+            url, headers=getattr(self, "headers", None), **kwargs
+        )
+        self.timings[name].append(time.perf_counter() - started)
+        assert response.status_code < 300, (name, response.status_code, response.json)
+        self.totals[name]["commits"] += self.counters.commits
+        self.totals[name]["statements"] += self.counters.statements
+
+        data = response.json["data"]
+        if not isinstance(data, str) or not hasattr(self, "key"):
+            return data
+        raw = base64.b64decode(data)
+        cipher = AES.new(self.key, AES.MODE_EAX, nonce=raw[:16])
+        return json.loads(cipher.decrypt_and_verify(raw[32:], raw[16:32]))
+
+    def results(self) -> Dict[str, dict]:
+        """Average the totals and timings per request"""
+        results = {}
+        for name, total in self.totals.items():
+            samples = sorted(self.timings[name])
+            results[name] = {
+                "requests": len(samples),
+                "commits_per_request": total["commits"] / len(samples),
+                "statements_per_request": total["statements"] / len(samples),
+                "latency_ms_p50": samples[len(samples) // 2] * 1000,
+                "latency_ms_avg": sum(samples) / len(samples) * 1000,
+            }
+        return results
+
+
+def run(client: Client, iterations: int) -> None:
+    """Create, change and delete tags, tasks and batches"""
+    tags = [
+        client.call("PUT /tag", "put", "/api/v1/tag", json={"name": f"tag {i}"})["id"]
+        for i in range(2)
+    ]
+    for i in range(iterations):
+        tag = client.call("PUT /tag", "put", "/api/v1/tag", json={"name": f"t{i}"})
+        client.call(
+            "PATCH /tag/<id>",
+            "patch",
+            f"/api/v1/tag/{tag['id']}",
+            json={"name": f"r{i}"},
+        )
+        client.call("DELETE /tag/<id>", "delete", f"/api/v1/tag/{tag['id']}")
+
+        task = client.call(
+            "PUT /task",
+            "put",
+            "/api/v1/task",
+            json={"title": f"Task {i}", "description": "Benchmark", "tags": tags},
+        )
+        client.call(
+            "PATCH /task/<id>",
+            "patch",
+            f"/api/v1/task/{task['id']}",
+            json={"status": "done", "tags": tags[:1]},
+        )
+        client.call("DELETE /task/<id>", "delete", f"/api/v1/task/{task['id']}")
+
+        operations = [
+            {"op": "create", "data": {"title": f"Batch {i}", "description": "b"}}
+        ] * 5
+        client.call(
+            "POST /task/batch",
+            "post",
+            "/api/v1/task/batch",
+            json={"operations": operations},
+        )
+        client.call(
+            "PATCH /user", "patch", "/api/v1/user", json={"first_name": f"Bench{i}"}
+        )
+        client.call("GET /task", "get", "/api/v1/task?limit=20")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    counters = Counters()
+    results = {}
+    for mode, unit_of_work in (("commit_per_call", False), ("unit_of_work", True)):
+        settings.db.DATABASE_UNIT_OF_WORK = unit_of_work
+        client = Client(app.test_client(), counters)
+        run(client, args.iterations)
+        results[mode] = client.results()
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
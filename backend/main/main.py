@@ -3,17 +3,31 @@
 from flask import Flask
 from flask_jwt_extended import JWTManager
 
+from app.api.deps import close_request_db, password_hasher_busy
 from app.api.v1.auth import auth_blueprint
+from app.api.v1.metrics import metrics_blueprint
+from app.api.v1.sync import sync_blueprint
 from app.api.v1.tag import tag_blueprint
 from app.api.v1.task import task_blueprint
 from app.api.v1.user import user_blueprint
 from app.core.config import settings
+from app.core.json_backend import JSONProvider
+from app.core.security import PasswordHasherBusy
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.register_blueprint(auth_blueprint, url_prefix="/api/v1/auth")
 app.register_blueprint(user_blueprint, url_prefix="/api/v1/")
 app.register_blueprint(tag_blueprint, url_prefix="/api/v1/")
 app.register_blueprint(task_blueprint, url_prefix="/api/v1/")
+app.register_blueprint(sync_blueprint, url_prefix="/api/v1/")
+app.register_blueprint(metrics_blueprint, url_prefix="/api/v1/")
+
+# Release the request's database session on every exit path
+app.teardown_appcontext(close_request_db)
+# Fail fast with 503 when password hashing is saturated, flask-restful routes
+# get the same answer from request_inject
+app.register_error_handler(PasswordHasherBusy, password_hasher_busy)
 
 # Configure JWT
 app.config["JWT_SECRET_KEY"] = settings.jwt.JWT_SECRET_KEY
@@ -6,6 +6,9 @@
 export APP_MODULE=${APP_MODULE-main:app}
 export HOST=${HOST:-0.0.0.0}
 export PORT=${PORT:-5000}
+# sync workers by default, DATABASE_ASYNC=true pairs with gthread workers
+export WORKER_CLASS=${WORKER_CLASS:-sync}
+export WORKER_THREADS=${WORKER_THREADS:-1}
 
 # run gunicorn
-exec gunicorn --bind $HOST:$PORT "$APP_MODULE" --log-level DEBUG
\ No newline at end of file
+exec gunicorn --bind $HOST:$PORT --worker-class $WORKER_CLASS --threads $WORKER_THREADS "$APP_MODULE" --log-level DEBUG
\ No newline at end of file
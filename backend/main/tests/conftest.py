@@ -0,0 +1,97 @@
+""" Test fixtures
+
+The settings are read on import, so the test database and a fast password
+hashing setup are configured before the app is imported. Set
+DATABASE_CONNECTION_URL to run the tests against another database.
+"""
+
+import base64
+import json
+import os
+import tempfile
+import uuid
+
+os.environ.setdefault(
+    "DATABASE_CONNECTION_URL",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"),
+)
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-of-at-least-32-bytes")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+
+import pytest  # noqa: E402
+from Crypto.Cipher import AES  # noqa: E402
+
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+
+init_db()
+
+from main import app as flask_app  # noqa: E402
+
+PASSWORD = "Passw0rdX"
+
+
+class ApiUser:
+    """A signed in user sending requests through the Flask test client"""
+
+    def __init__(self, client, email: str):
+        self.client = client
+        self.email = email
+        response = client.put(
+            "/api/v1/user",
+            json={
+                "first_name": "Test",
+                "last_name": "User",
+                "email": email,
+                "password": PASSWORD,
+            },
+        )
+        assert response.status_code == 201, response.json
+        self.id = response.json["data"]["id"]
+        response = client.post(
+            "/api/v1/auth/login", json={"email": email, "password": PASSWORD}
+        )
+        assert response.status_code == 200, response.json
+        self.headers = {
+            "Authorization": "Bearer " + response.json["data"]["access_token"]
+        }
+        self.key = response.json["data"]["key"].encode("utf-8")
+
+    def decrypt(self, data: str) -> object:
+        """Decrypt the data of an encrypted JSON response"""
+        raw = base64.b64decode(data)
+        cipher = AES.new(self.key, AES.MODE_EAX, nonce=raw[:16])
+        return json.loads(cipher.decrypt_and_verify(raw[32:], raw[16:32]))
+
+    def call(self, method: str, url: str, **kwargs):
+        """Send a request, returning the response and its decrypted data"""
+        response = self.client.open(url, method=method, headers=self.headers, **kwargs)
+        data = response.json["data"] if response.is_json else None
+        if isinstance(data, str) and data:
+            data = self.decrypt(data)
+        return response, data
+
+
+@pytest.fixture
+def app():
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def api_user(client):
+    return ApiUser(client, f"{uuid.uuid4().hex[:12]}@example.com")
@@ -0,0 +1,140 @@
+""" DATABASE_ASYNC requests only hand their queries to the event loop """
+
+import asyncio
+import tempfile
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import await_only
+
+from app import crud
+from app.core.config import settings
+from app.db.async_session import LoopQueuePool, event_loop, run_in_async_session
+
+STEP_SECONDS = 1
+CONCURRENT_REQUESTS = 3
+
+
+@pytest.fixture
+def async_mode(monkeypatch):
+    monkeypatch.setattr(settings.db, "DATABASE_ASYNC", True)
+
+
+@pytest.fixture
+def slow_stats(monkeypatch):
+    """Make GET /task/stats block its thread for a step, recording the dialects"""
+    dialects = []
+    get_counts = crud.task_stat.get_counts
+
+    def slow_get_counts(db, **kwargs):
+        time.sleep(STEP_SECONDS)
+        dialects.append(db.get_bind().dialect)
+        return get_counts(db, **kwargs)
+
+    monkeypatch.setattr(crud.task_stat, "get_counts", slow_get_counts)
+    return dialects
+
+
+def test_blocking_steps_overlap(api_user, async_mode, slow_stats):
+    app = api_user.client.application
+    statuses = []
+
+    def get_stats():
+        response = app.test_client().get("/api/v1/task/stats", headers=api_user.headers)
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=get_stats) for _ in range(CONCURRENT_REQUESTS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert statuses == [200] * CONCURRENT_REQUESTS
+    assert len(slow_stats) == CONCURRENT_REQUESTS
+    assert all(dialect.is_async for dialect in slow_stats)
+    assert elapsed < 2 * STEP_SECONDS
+
+
+def test_views_read_and_write(api_user, async_mode):
+    _, task = api_user.call(
+        "PUT", "/api/v1/task", json={"title": "Async", "description": "text"}
+    )
+    response, data = api_user.call(
+        "PATCH", f"/api/v1/task/{task['id']}", json={"status": "done"}
+    )
+    assert response.status_code == 200
+    assert data["status"] == "done"
+
+    _, data = api_user.call("GET", f"/api/v1/task/{task['id']}")
+    assert data["status"] == "done"
+    response, _ = api_user.call("GET", "/api/v1/task/0")
+    assert response.status_code == 404
+
+
+# The bridge drives SQLAlchemy's greenlet like its greenlet_spawn does, so
+# these fail first when an upgrade changes how await_only switches
+
+
+def test_bridge_awaits_on_the_loop():
+    async def loop_thread(value):
+        await asyncio.sleep(0)
+        return value, threading.current_thread().name
+
+    def func():
+        return threading.current_thread(), await_only(loop_thread("done"))
+
+    caller, (value, awaited_on) = event_loop.run_bridged(func)
+
+    assert caller is threading.current_thread()
+    assert (value, awaited_on) == ("done", "async-db")
+
+
+def test_bridge_raises_into_the_function():
+    async def fail():
+        raise LookupError("awaited")
+
+    def func():
+        try:
+            await_only(fail())
+        except LookupError as err:
+            return str(err)
+
+    assert event_loop.run_bridged(func) == "awaited"
+    with pytest.raises(LookupError):
+        event_loop.run_bridged(lambda: await_only(fail()))
+
+
+def test_loop_queue_pool_hands_connections_over():
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tempfile.mktemp(suffix='.db')}",
+        poolclass=LoopQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=10,
+    )
+    results = []
+
+    def query(db_object):
+        # Hold the only connection while the other threads wait for it
+        db_object.execute(text("SELECT 1"))
+        time.sleep(0.05)
+        return db_object.execute(text("SELECT 2")).scalar()
+
+    def run():
+        results.append(run_in_async_session(query, bind=engine))
+
+    threads = [threading.Thread(target=run) for _ in range(CONCURRENT_REQUESTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert results == [2] * CONCURRENT_REQUESTS
+        assert engine.sync_engine.pool.checkedout() == 0
+    finally:
+        event_loop.run(engine.dispose())
@@ -0,0 +1,43 @@
+""" Pool checkouts report queue waits apart from connect times """
+
+import sqlite3
+import threading
+import time
+
+from app.db.session import InstrumentedQueuePool, pool_stats
+
+CONNECT_SECONDS = 0.2
+
+
+def slow_connect():
+    time.sleep(CONNECT_SECONDS)
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def test_connect_time_is_not_a_wait():
+    pool = InstrumentedQueuePool(slow_connect, pool_size=1, max_overflow=0)
+    pool_stats.reset()
+    try:
+        pool.connect().close()
+        stats = pool_stats.dict()
+        assert stats["connects"] == 1
+        assert stats["connect_seconds_max"] >= CONNECT_SECONDS
+        assert stats["wait_seconds_max"] < CONNECT_SECONDS
+    finally:
+        pool.dispose()
+        pool_stats.reset()
+
+
+def test_queue_wait_is_a_wait():
+    pool = InstrumentedQueuePool(slow_connect, pool_size=1, max_overflow=0)
+    held = pool.connect()
+    pool_stats.reset()
+    threading.Timer(CONNECT_SECONDS, held.close).start()
+    try:
+        pool.connect().close()
+        stats = pool_stats.dict()
+        assert stats["connects"] == 0
+        assert stats["wait_seconds_max"] >= CONNECT_SECONDS * 0.9
+    finally:
+        pool.dispose()
+        pool_stats.reset()
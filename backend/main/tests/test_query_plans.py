@@ -0,0 +1,172 @@
+""" Task and tag read queries are served by indexes
+
+Every statement a query issues is EXPLAINed, and the test fails if it scans
+a whole task, tag or task_tag table. On PostgreSQL sequential scans are
+disabled for the check, so it verifies that an index can serve each query
+even while the tables are small.
+"""
+
+import random
+import re
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from app import crud
+from app.db.base import Tag, Task
+from app.db.session import SessionLocal
+from app.models.task import TaskStatus
+
+CHECKED_TABLES = ("task", "tag", "task_tag")
+
+# Plan lines reading a whole table, by dialect
+FULL_SCANS = {
+    "postgresql": re.compile(r"Seq Scan on (%s)\b" % "|".join(CHECKED_TABLES)),
+    "sqlite": re.compile(r"^SCAN (%s)$" % "|".join(CHECKED_TABLES)),
+}
+
+FIELDS = ["title", "status", "tags"]
+
+# Name and callable of every checked query, given the session and seed
+QUERIES = [
+    (
+        "task.get_by_id",
+        lambda db, s: crud.task.get_by_id(db, id=s["task_id"], user_id=s["user_id"]),
+    ),
+    ("task.get_multi", lambda db, s: crud.task.get_multi(db, user_id=s["user_id"])),
+    (
+        "task.get_multi fields",
+        lambda db, s: crud.task.get_multi(db, user_id=s["user_id"], fields=FIELDS),
+    ),
+    (
+        "task.get_multi_by_status",
+        lambda db, s: crud.task.get_multi_by_status(
+            db, status="pending", user_id=s["user_id"], fields=FIELDS
+        ),
+    ),
+    (
+        "task.get_multi_by_tag",
+        lambda db, s: crud.task.get_multi_by_tag(
+            db, tag_id=s["tag_id"], user_id=s["user_id"], fields=FIELDS
+        ),
+    ),
+    (
+        "task.get_owned_ids",
+        lambda db, s: crud.task.get_owned_ids(
+            db, ids=[s["task_id"]], user_id=s["user_id"]
+        ),
+    ),
+    ("tag.get", lambda db, s: crud.tag.get(db, id=s["tag_id"], user_id=s["user_id"])),
+    (
+        "tag.get_by_name",
+        lambda db, s: crud.tag.get_by_name(
+            db, name=s["tag_name"], user_id=s["user_id"]
+        ),
+    ),
+    ("tag.get_multi", lambda db, s: crud.tag.get_multi(db, user_id=s["user_id"])),
+    (
+        "tag.get_multi_id",
+        lambda db, s: crud.tag.get_multi_id(
+            db, ids=[s["tag_id"]], user_id=s["user_id"]
+        ),
+    ),
+    (
+        "change_log.get_task_tags",
+        lambda db, s: crud.change_log.get_task_tags(
+            db, task_ids=[s["task_id"]], user_id=s["user_id"]
+        ),
+    ),
+]
+
+
+@pytest.fixture(scope="module")
+def seed():
+    """Create users with tagged tasks in a mix of statuses"""
+    rng = random.Random(0)
+    db = SessionLocal()
+    try:
+        for _ in range(3):
+            user = crud.user.create(
+                db,
+                obj_in={
+                    "first_name": "Query",
+                    "last_name": "Plan",
+                    "email": f"{uuid.uuid4().hex[:12]}@example.com",
+                    "password": "Passw0rdX",
+                },
+            )
+            tag_ids = [
+                crud.tag.create(db, obj_in={"name": f"tag {i}", "user_id": user.id}).id
+                for i in range(10)
+            ]
+            created, _ = crud.task.apply_batch(
+                db,
+                user_id=user.id,
+                creates=[
+                    {
+                        "title": f"task {i}",
+                        "description": "query plan",
+                        "tags": rng.sample(tag_ids, rng.randint(0, 3)),
+                    }
+                    for i in range(300)
+                ],
+                patches={},
+                deletes=[],
+            )
+            crud.task.apply_batch(
+                db,
+                user_id=user.id,
+                creates=[],
+                patches={
+                    task["id"]: {"status": rng.choice(list(TaskStatus))}
+                    for task in created
+                },
+                deletes=[],
+            )
+        task = db.query(Task).filter(Task.user_id == user.id).first()
+        tag = db.query(Tag).filter(Tag.user_id == user.id).first()
+        return {
+            "user_id": user.id,
+            "task_id": task.id,
+            "tag_id": tag.id,
+            "tag_name": tag.name,
+        }
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize(
+    "run", [run for _, run in QUERIES], ids=[n for n, _ in QUERIES]
+)
+def test_query_uses_an_index(db, seed, run):
+    connection = db.connection()
+    dialect = connection.dialect.name
+    if dialect not in FULL_SCANS:
+        pytest.skip(f"Query plans of {dialect} are not supported")
+    if dialect == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        run(db, seed)
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+    assert statements
+
+    for statement, parameters in statements:
+        if dialect == "postgresql":
+            rows = connection.exec_driver_sql("EXPLAIN " + statement, parameters)
+            plan = [row[0].strip() for row in rows]
+        else:
+            rows = connection.exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + statement, parameters
+            )
+            plan = [row[-1] for row in rows]
+        scans = [line for line in plan if FULL_SCANS[dialect].search(line)]
+        assert not scans, f"{statement} scans a whole table: {'; '.join(plan)}"
@@ -0,0 +1,142 @@
+""" Read replica routing, with a copy of the SQLite test database as replica """
+
+import sqlite3
+import time
+from http.cookies import SimpleCookie
+
+import pytest
+
+from app.api import deps
+from app.core.config import settings
+from app.db.async_session import create_async_db_engine
+from app.db.base import Task
+from app.db.replica import get_replica_urls
+from app.db.session import EngineGroup, create_db_engine, get_engine
+from app.utils.constants import LAST_WRITE_COOKIE
+
+pytestmark = pytest.mark.skipif(
+    get_engine().dialect.name != "sqlite", reason="The replica is a SQLite copy"
+)
+
+
+@pytest.fixture(params=[False, True], ids=["sync", "async"])
+def replica(request, api_user, tmp_path, monkeypatch):
+    """A task, then a replica snapshot that later writes do not reach"""
+    _, task = api_user.call(
+        "PUT", "/api/v1/task", json={"title": "Before", "description": "text"}
+    )
+    path = tmp_path / "replica.db"
+    primary = sqlite3.connect(get_engine().url.database)
+    with sqlite3.connect(path) as copy:
+        primary.backup(copy)
+    primary.close()
+    monkeypatch.setattr(settings.db, "DATABASE_ASYNC", request.param)
+    monkeypatch.setattr(settings.db, "DATABASE_REPLICA_URLS", f"sqlite:///{path}")
+    monkeypatch.setattr(
+        deps, "replica_engines", EngineGroup(get_replica_urls, create_db_engine)
+    )
+    monkeypatch.setattr(
+        deps,
+        "async_replica_engines",
+        EngineGroup(get_replica_urls, create_async_db_engine),
+    )
+    return api_user, task, path
+
+
+def mark_replica(path, task_id: int) -> None:
+    """Change a title on the replica only, leaving the user's version as is"""
+    with sqlite3.connect(path) as copy:
+        copy.execute("UPDATE task SET title = 'Replica' WHERE id = ?", (task_id,))
+
+
+def read_title(user, task_id: int, last_write: str = None) -> str:
+    """Read a task's title from a new client, which keeps no cookies"""
+    headers = dict(user.headers)
+    if last_write is not None:
+        headers["Cookie"] = f"{LAST_WRITE_COOKIE}={last_write}"
+    response = user.client.application.test_client(use_cookies=False).get(
+        f"/api/v1/task/{task_id}", headers=headers
+    )
+    assert response.status_code == 200, response.json
+    return user.decrypt(response.json["data"])["title"]
+
+
+def test_reads_go_to_an_up_to_date_replica(replica):
+    user, task, path = replica
+    mark_replica(path, task["id"])
+
+    assert read_title(user, task["id"]) == "Replica"
+
+
+def test_reads_skip_a_lagging_replica(replica):
+    user, task, path = replica
+    user.client.application.test_client(use_cookies=False).patch(
+        f"/api/v1/task/{task['id']}", headers=user.headers, json={"title": "After"}
+    )
+    mark_replica(path, task["id"])
+
+    assert read_title(user, task["id"]) == "After"
+
+
+def test_profile_writes_skip_a_lagging_replica(replica):
+    user, _, _ = replica
+    client = user.client.application.test_client(use_cookies=False)
+    client.patch("/api/v1/user", headers=user.headers, json={"first_name": "After"})
+
+    response = client.get("/api/v1/user", headers=user.headers)
+    assert user.decrypt(response.json["data"])["first_name"] == "After"
+
+
+def test_last_write_cookie_reads_the_primary(replica):
+    user, task, path = replica
+    response, _ = user.call(
+        "PATCH", f"/api/v1/task/{task['id']}", json={"title": "After"}
+    )
+    cookie = SimpleCookie(response.headers["Set-Cookie"])[LAST_WRITE_COOKIE]
+    # Even once the replica has the user's version
+    primary = sqlite3.connect(get_engine().url.database)
+    with sqlite3.connect(path) as copy:
+        primary.backup(copy)
+    primary.close()
+    mark_replica(path, task["id"])
+
+    assert cookie["httponly"]
+    _, data = user.call("GET", f"/api/v1/task/{task['id']}")
+    assert data["title"] == "After"
+    assert read_title(user, task["id"], cookie.value) == "After"
+
+
+@pytest.mark.parametrize(
+    "last_write",
+    [
+        lambda: f"{time.time() - settings.db.DATABASE_REPLICA_STICKY_SECONDS:.3f}",
+        lambda: f"{time.time() + 60:.3f}",
+        lambda: "yesterday",
+    ],
+    ids=["expired", "future", "invalid"],
+)
+def test_cookies_outside_the_window_read_the_replica(replica, last_write):
+    user, task, path = replica
+    mark_replica(path, task["id"])
+
+    assert read_title(user, task["id"], last_write()) == "Replica"
+
+
+def test_writes_go_to_the_primary(replica, db):
+    user, task, path = replica
+    user.client.application.test_client(use_cookies=False).patch(
+        f"/api/v1/task/{task['id']}", headers=user.headers, json={"title": "After"}
+    )
+
+    assert db.get(Task, task["id"]).title == "After"
+    with sqlite3.connect(path) as copy:
+        query = "SELECT title FROM task WHERE id = ?"
+        assert copy.execute(query, (task["id"],)).fetchone() == ("Before",)
+
+
+def test_no_cookie_without_replicas(api_user):
+    response, _ = api_user.call(
+        "PUT", "/api/v1/task", json={"title": "Task", "description": "text"}
+    )
+
+    assert "Set-Cookie" not in response.headers
@@ -0,0 +1,56 @@
+""" Every request returns its connection to the pool, whichever way it ends """
+
+import itertools
+
+import pytest
+from werkzeug.exceptions import abort
+
+from app import crud
+from app.db.session import pool_status
+
+SOAK_REQUESTS = 10_000
+
+
+@pytest.fixture
+def failing_stats(monkeypatch):
+    """Make GET /task/stats fail with an error or abort, in turns"""
+    turns = itertools.cycle(["error", "abort"])
+
+    def get_counts(*args, **kwargs):
+        if next(turns) == "error":
+            raise RuntimeError("view failed")
+        abort(409)
+
+    monkeypatch.setattr(crud.task_stat, "get_counts", get_counts)
+
+
+def test_pool_checkouts_after_soak(api_user, failing_stats):
+    _, task = api_user.call(
+        "PUT", "/api/v1/task", json={"title": "Soak", "description": "test"}
+    )
+    requests = [
+        # Reads, writes and streaming
+        ("GET", "/api/v1/task?limit=5", None, 200),
+        ("GET", f"/api/v1/task/{task['id']}", None, 200),
+        ("PATCH", f"/api/v1/task/{task['id']}", {"status": "done"}, 200),
+        ("GET", "/api/v1/tag", None, 200),
+        ("GET", "/api/v1/task/export", None, 200),
+        # Errors returned by the view and by request validation
+        ("GET", "/api/v1/task/0", None, 404),
+        ("PATCH", f"/api/v1/task/{task['id']}", {"status": "lost"}, 400),
+        ("GET", "/api/v1/task?limit=0", None, 400),
+        # Unhandled exception and abort inside the view
+        ("GET", "/api/v1/task/stats", None, 500),
+        ("GET", "/api/v1/task/stats", None, 409),
+    ]
+    for index in range(SOAK_REQUESTS):
+        method, url, body, status = requests[index % len(requests)]
+        response = api_user.client.open(
+            url, method=method, headers=api_user.headers, json=body
+        )
+        response.get_data()
+        assert response.status_code == status, (method, url, response.json)
+        if index % 1000 == 0:
+            assert pool_status()["checked_out"] == 0
+
+    assert pool_status()["checked_out"] == 0
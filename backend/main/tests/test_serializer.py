@@ -0,0 +1,63 @@
+""" Compiled serializers produce the bytes of the marshmallow round trip """
+
+import pytest
+
+from app import crud, schemas
+from app.core import json_backend
+from app.db.base import Tag, Task, User
+from app.schemas.serializer import MarshmallowSerializer, get_serializer
+
+
+def assert_identical(schema_class, objs):
+    compiled = get_serializer(schema_class)
+    assert compiled is not None, f"{schema_class.__name__} is not compiled"
+    expected = json_backend.dumps(MarshmallowSerializer(schema_class).many(objs))
+    assert json_backend.dumps(compiled.many(objs)) == expected
+
+
+@pytest.fixture
+def user_data(api_user):
+    _, work = api_user.call("PUT", "/api/v1/tag", json={"name": "work"})
+    _, home = api_user.call("PUT", "/api/v1/tag", json={"name": "home"})
+    for tags in ([work["id"], home["id"]], [home["id"]], []):
+        response, _ = api_user.call(
+            "PUT",
+            "/api/v1/task",
+            json={"title": "A task", "description": "Some text", "tags": tags},
+        )
+        assert response.status_code == 201
+    # One task with a status set and no tags at all
+    response, task = api_user.call(
+        "PUT", "/api/v1/task", json={"title": "Done", "description": ""}
+    )
+    api_user.call("PATCH", f"/api/v1/task/{task['id']}", json={"status": "done"})
+    return api_user
+
+
+def test_task_with_tags(db, user_data):
+    tasks = crud.task.query_with_tags(db).filter(Task.user_id == user_data.id).all()
+    assert any(task.tags for task in tasks) and not all(task.tags for task in tasks)
+    assert_identical(schemas.Task, tasks)
+
+
+def test_task_without_tags(db, user_data):
+    tasks = db.query(Task).filter(Task.user_id == user_data.id).all()
+    assert_identical(schemas.Task, tasks)
+
+
+def test_tag(db, user_data):
+    tags = db.query(Tag).filter(Tag.user_id == user_data.id).all()
+    assert_identical(schemas.Tag, tags)
+
+
+def test_user(db, user_data):
+    users = db.query(User).filter(User.id == user_data.id).all()
+    assert_identical(schemas.User, users)
+
+
+def test_auth_login_tokens():
+    tokens = [
+        {"access_token": "a.b.c", "refresh_token": "d.e.f", "key": "0" * 32},
+        {"access_token": "", "refresh_token": "x", "key": "f" * 32},
+    ]
+    assert_identical(schemas.AuthLoginTokens, tokens)
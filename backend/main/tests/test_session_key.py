@@ -0,0 +1,46 @@
+""" Sessions survive a rehash of the password, not a password change """
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core import security
+from app.core.session_key import aes_key_cache
+from app.db.base import User
+from conftest import PASSWORD
+
+
+@pytest.fixture
+def more_rounds(monkeypatch):
+    monkeypatch.setattr(
+        security,
+        "PWD_CONTEXT",
+        CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5),
+    )
+
+
+def test_rehash_keeps_other_sessions(api_user, more_rounds, db):
+    _, task = api_user.call(
+        "PUT", "/api/v1/task", json={"title": "Task", "description": "text"}
+    )
+    old_hash = db.get(User, api_user.id).hashed_password
+
+    response = api_user.client.post(
+        "/api/v1/auth/login", json={"email": api_user.email, "password": PASSWORD}
+    )
+    assert response.status_code == 200, response.json
+    db.expire_all()
+    assert db.get(User, api_user.id).hashed_password != old_hash
+
+    aes_key_cache.clear()
+    response, data = api_user.call("GET", f"/api/v1/task/{task['id']}")
+    assert response.status_code == 200
+    assert data["title"] == "Task"
+
+
+def test_password_change_ends_sessions(api_user):
+    response, _ = api_user.call("PATCH", "/api/v1/user", json={"password": "Passw0rdY"})
+    assert response.status_code == 200
+
+    aes_key_cache.clear()
+    response, _ = api_user.call("GET", "/api/v1/task/stats")
+    assert response.status_code == 401
@@ -0,0 +1,32 @@
+""" Tasks created by a batch keep their own data and tags """
+
+CREATES = 30
+
+
+def test_batch_creates_match_their_operations(api_user):
+    tag_ids = []
+    for name in ("work", "home", "urgent"):
+        _, tag = api_user.call("PUT", "/api/v1/tag", json={"name": name})
+        tag_ids.append(tag["id"])
+    operations = [
+        {
+            "op": "create",
+            "data": {
+                "title": f"task {index}",
+                "description": str(index),
+                "tags": tag_ids[: index % 3 + 1],
+            },
+        }
+        for index in range(CREATES)
+    ]
+
+    response, data = api_user.call(
+        "POST", "/api/v1/task/batch", json={"operations": operations}
+    )
+
+    assert response.status_code == 200, data
+    assert len(set([result["id"] for result in data])) == CREATES
+    for result, operation in zip(data, operations):
+        _, task = api_user.call("GET", f"/api/v1/task/{result['id']}")
+        assert result["data"]["title"] == task["title"] == operation["data"]["title"]
+        assert sorted([tag["id"] for tag in task["tags"]]) == operation["data"]["tags"]
@@ -0,0 +1,123 @@
+""" Statements run by each kind of task patch """
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import crud
+from app.db.base import Task
+
+
+@contextmanager
+def count_statements():
+    """Collect the statements and commits of every engine"""
+    executed = {"statements": [], "commits": 0}
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        executed["statements"].append(statement)
+
+    def commit(conn):
+        executed["commits"] += 1
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "commit", commit)
+    try:
+        yield executed
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(Engine, "commit", commit)
+
+
+@pytest.fixture
+def tagged_task(api_user):
+    tag_ids = []
+    for name in ("work", "home", "urgent"):
+        _, tag = api_user.call("PUT", "/api/v1/tag", json={"name": name})
+        tag_ids.append(tag["id"])
+    _, task = api_user.call(
+        "PUT",
+        "/api/v1/task",
+        json={"title": "Patch me", "description": "text", "tags": tag_ids[:2]},
+    )
+    # Cache the session key and shard, so only the patch itself is counted
+    api_user.call("GET", f"/api/v1/task/{task['id']}")
+    return api_user, task, tag_ids
+
+
+# Every patch reads the task and its tags. A change then writes the task
+# row, the change log and the user version, plus the stats of a new status
+# or of changed tags, and the tag links; tags the task does not have yet
+# are looked up first.
+@pytest.mark.parametrize(
+    "patch, statements, commits",
+    [
+        ({"title": "Patched"}, 5, 1),
+        ({"status": "done"}, 6, 1),
+        ({"description": ""}, 5, 1),
+        ({"tags": "swap"}, 9, 1),
+        ({"tags": "add"}, 8, 1),
+        ({"tags": "same"}, 2, 0),
+        ({"title": "Patched", "status": "done", "tags": "swap"}, 9, 1),
+        ({"title": "Patch me"}, 2, 0),
+    ],
+    ids=[
+        "title",
+        "status",
+        "blank description",
+        "swap a tag",
+        "add a tag",
+        "same tags reordered",
+        "fields and tags",
+        "unchanged",
+    ],
+)
+def test_patch_statements(tagged_task, patch, statements, commits):
+    api_user, task, tag_ids = tagged_task
+    tags = {
+        "swap": [tag_ids[0], tag_ids[2]],
+        "add": tag_ids,
+        "same": tag_ids[1::-1],
+    }
+    body = dict(patch)
+    if "tags" in body:
+        body["tags"] = tags[body["tags"]]
+
+    with count_statements() as executed:
+        response, data = api_user.call("PATCH", f"/api/v1/task/{task['id']}", json=body)
+
+    assert response.status_code == 200, data
+    assert len(executed["statements"]) == statements, executed["statements"]
+    assert executed["commits"] == commits
+    _, fresh = api_user.call("GET", f"/api/v1/task/{task['id']}")
+    assert data == fresh
+
+
+@pytest.mark.parametrize(
+    "patch",
+    [
+        {"description": ""},
+        {"title": "Patched", "status": "done"},
+        {"status": "pending"},
+    ],
+)
+def test_batch_patch_sets_the_same_fields(db, tagged_task, patch):
+    api_user, task, _ = tagged_task
+    _, other = api_user.call(
+        "PUT", "/api/v1/task", json={"title": "Patch me", "description": "text"}
+    )
+    api_user.call("PATCH", f"/api/v1/task/{task['id']}", json=patch)
+    response, data = api_user.call(
+        "POST",
+        "/api/v1/task/batch",
+        json={"operations": [{"op": "patch", "id": other["id"], "data": patch}]},
+    )
+    assert response.status_code == 200, data
+
+    patched, batched = (
+        db.query(Task).filter(Task.id == task["id"]).one(),
+        db.query(Task).filter(Task.id == other["id"]).one(),
+    )
+    for key in crud.task.patch_fields:
+        assert getattr(batched, key) == getattr(patched, key)
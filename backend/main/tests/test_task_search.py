@@ -0,0 +1,46 @@
+""" Task search, including the fallback of dialects without full-text search """
+
+import sys
+
+import pytest
+
+from app.db.search import task_search
+
+# app.crud.task is also the name of the CRUDTask instance
+crud_task = sys.modules["app.crud.task"]
+
+
+@pytest.fixture(params=[False, True], ids=["full_text", "fallback"])
+def search(request, api_user, monkeypatch):
+    if request.param:
+        monkeypatch.setattr(
+            crud_task,
+            "task_search",
+            lambda dialect, **kwargs: task_search("unsupported", **kwargs),
+        )
+    for title, description in [
+        ("Buy milk", "two litres of milk"),
+        ("Call mum", "about the milk"),
+        ("Write report", "for work"),
+    ]:
+        api_user.call(
+            "PUT", "/api/v1/task", json={"title": title, "description": description}
+        )
+
+    def titles(q: str, **params):
+        response, data = api_user.call(
+            "GET", "/api/v1/task/search", query_string={"q": q, **params}
+        )
+        assert response.status_code == 200, data
+        return [task["title"] for task in data]
+
+    return titles
+
+
+def test_search_ranks_title_matches_first(search):
+    assert search("milk") == ["Buy milk", "Call mum"]
+
+
+def test_search_matches_every_term(search):
+    assert search("milk mum") == ["Call mum"]
+    assert search("report milk") == []